@@ -6,6 +6,13 @@ import sys
 # Добавьте текущую рабочую директорию в sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../TERMINAL')))
 
+# GOOGLE_CLOUD_LOCAL_DRIVE=1: прогон без сети и учетных данных на локальном заменителе Drive.
+# Адрес API читается при импорте терминала, поэтому сервер поднимается до него
+if os.getenv("GOOGLE_CLOUD_LOCAL_DRIVE") == "1":
+    from LocalDrive import LocalDrive
+    local_drive, os.environ["GOOGLE_CLOUD_API_URL"] = LocalDrive.serve()
+    os.environ["GOOGLE_CLOUD_OFFLINE"] = "1"
+
 from TERMINAL.GoogleCloudTerminal import GoogleCloudTerminal
 from TERMINAL.PathNavigator import PathNavigator
 
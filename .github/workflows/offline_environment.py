@@ -0,0 +1,32 @@
+import os
+import sys
+import json
+import tempfile
+
+# Модули терминала импортируются по имени, как внутри TERMINAL
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../TERMINAL')))
+
+from LocalDrive import LocalDrive
+
+# Общее окружение модульных тестов: запросы идут в LocalDrive, журналы и индекс - во временную папку.
+# Адрес API и пути читаются при импорте модулей терминала, поэтому этот модуль
+# импортируется в тестах первым, до Transport и остальных
+local_drive, api_url = LocalDrive.serve()
+directory = tempfile.mkdtemp(prefix='google-cloud-tests-')
+
+os.environ["GOOGLE_CLOUD_API_URL"] = api_url
+os.environ["GOOGLE_CLOUD_OFFLINE"] = "1"
+os.environ["GOOGLE_CLOUD_UPLOAD_JOURNAL"] = os.path.join(directory, 'uploads.sqlite')
+os.environ["GOOGLE_CLOUD_INDEX_PATH"] = os.path.join(directory, 'index.sqlite')
+
+from Transport import Transport
+
+os.environ["GOOGLE_CLOUD_CREDS"] = json.dumps(Transport.OFFLINE_CREDS)
+
+
+def local_file(name, content):
+    """ Локальный файл с содержимым content во временной папке, возвращает путь """
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
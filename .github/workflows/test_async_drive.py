@@ -0,0 +1,63 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import os
+import unittest
+
+import requests
+
+from AsyncDrive import AsyncDrive
+from Concurrency import Concurrency
+
+KIB = 1024
+
+
+@unittest.skipUnless(AsyncDrive.available(), "aiohttp не установлен")
+class AsyncDriveTest(unittest.TestCase):
+    """ AsyncDrive.run и download на LocalDrive """
+
+    def upload(self, content):
+        return requests.post(f'{offline_environment.api_url}/upload/drive/v3/files?uploadType=media',
+                             data=content, headers={'Content-Type': 'application/octet-stream'}).json()['id']
+
+    def test_download(self):
+        contents = [os.urandom(size) for size in (0, 1, 200 * KIB, 3 * 1024 * KIB)]
+        ids = [self.upload(content) for index, content in enumerate(contents)]
+        paths = [os.path.join(offline_environment.directory, f'async-{index}.bin') for index in range(len(ids))]
+        in_flight = Concurrency._in_flight
+
+        responses = AsyncDrive.run(AsyncDrive.gather(
+            AsyncDrive.download(file_id, path) for file_id, path in zip(ids, paths)))
+
+        self.assertEqual([response.status_code for response in responses], [200] * len(ids))
+        for path, content in zip(paths, contents):
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), content)
+        # все слоты регулятора возвращены
+        self.assertEqual((Concurrency._in_flight, AsyncDrive.in_flight()), (in_flight, 0))
+
+    def test_download_failed(self):
+        path = os.path.join(offline_environment.directory, 'async-missing.bin')
+        file_id = self.upload(b'data')
+        in_flight = Concurrency._in_flight
+
+        missing, unwritable = AsyncDrive.run(AsyncDrive.gather([
+            AsyncDrive.download('missing', path),
+            AsyncDrive.download(file_id, os.path.join(offline_environment.directory, 'no-such-dir', 'file.bin')),
+        ]))
+
+        # ошибка сервера - ответ без записи файла, ошибка записи - исключение на своем месте
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(missing.json()['error']['code'], 404)
+        self.assertFalse(os.path.exists(path))
+        self.assertIsInstance(unwritable, OSError)
+        self.assertEqual((Concurrency._in_flight, AsyncDrive.in_flight()), (in_flight, 0))
+
+    def test_run_raises(self):
+        async def failing():
+            raise ValueError('inside the loop')
+
+        with self.assertRaises(ValueError):
+            AsyncDrive.run(failing())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from Batch import Batch
+from LocalDrive import LocalDrive
+from RetryPolicy import RetryPolicy
+from Transport import Transport
+
+
+def batch_response(parts, content_type='multipart/mixed; boundary=batch_test', boundary='batch_test'):
+    """ requests.Response с multipart/mixed телом: parts - список (Content-ID, код, тело) """
+    body = ''
+    for content_id, status_code, text in parts:
+        body += (f'--{boundary}\r\n'
+                 'Content-Type: application/http\r\n'
+                 f'Content-ID: <response-{content_id}>\r\n'
+                 '\r\n'
+                 f'HTTP/1.1 {status_code} Status\r\n'
+                 'Content-Type: application/json; charset=UTF-8\r\n'
+                 '\r\n'
+                 f'{text}\r\n')
+    body += f'--{boundary}--\r\n'
+
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = content_type
+    response._content = body.encode('utf-8')
+    return response
+
+
+class BatchParseTest(unittest.TestCase):
+    """ Batch._parse и Batch._send: разбор ответа по частям """
+
+    def test_parse(self):
+        results = Batch._parse(batch_response([('item-0', 200, '{"id": "a"}'), ('item-1', 404, '{}')]))
+        self.assertEqual(sorted(results), [0, 1])
+        self.assertEqual(results[0].status_code, 200)
+        self.assertEqual(results[0].json(), {'id': 'a'})
+        self.assertEqual(results[0].headers['Content-Type'], 'application/json; charset=UTF-8')
+        self.assertEqual(results[1].status_code, 404)
+
+    def test_quoted_boundary(self):
+        for content_type in ('multipart/mixed; boundary="batch_test"',
+                             'multipart/mixed; boundary="batch_test"; charset=UTF-8',
+                             'multipart/mixed; boundary=batch_test; charset=UTF-8'):
+            results = Batch._parse(batch_response([('item-0', 200, '{"id": "a"}')], content_type))
+            self.assertEqual(results[0].json(), {'id': 'a'}, content_type)
+        # не multipart: частей нет, _send отметит все вызовы как упавшие
+        self.assertEqual(Batch._parse(batch_response([('item-0', 200, '{}')], 'application/json')), {})
+
+    def test_order(self):
+        # части могут прийти в любом порядке, номер берется из Content-ID
+        results = Batch._parse(batch_response([('item-2', 200, '{"id": "c"}'), ('item-0', 200, '{"id": "a"}')]))
+        self.assertEqual({index: response.json()['id'] for index, response in results.items()}, {0: 'a', 2: 'c'})
+
+    def test_missing_parts(self):
+        calls = {index: {'method': 'PATCH', 'url': f'{Transport.BASE_URL}/drive/v3/files/{index}'}
+                 for index in range(3)}
+        response = batch_response([('item-1', 200, '{"id": "1"}')])
+        with mock.patch.object(Transport, 'post', return_value=response) as post:
+            results = Batch._send(calls)
+        self.assertEqual(post.call_args.kwargs['retry_network'], True)
+        self.assertEqual(results[1].status_code, 200)
+        self.assertEqual((results[0].status_code, results[2].status_code), (500, 500))
+
+    def test_rejected(self):
+        rejected = requests.Response()
+        rejected.status_code = 400
+        rejected._content = b'{"error": "batchSizeTooLarge"}'
+        calls = {0: {'method': 'POST', 'url': f'{Transport.BASE_URL}/drive/v3/files', 'json': {'name': 'x'}}}
+        with mock.patch.object(Transport, 'post', return_value=rejected) as post:
+            results = Batch._send(calls)
+        # создающий вызов после обрыва не повторяется
+        self.assertEqual(post.call_args.kwargs['retry_network'], False)
+        self.assertEqual((results[0].status_code, results[0].text), (400, '{"error": "batchSizeTooLarge"}'))
+
+    def test_retry_failed_parts(self):
+        # повторяются только части с временными ошибками
+        calls = [{'method': 'PATCH', 'url': f'{Transport.BASE_URL}/drive/v3/files/{index}'} for index in range(3)]
+        responses = [batch_response([('item-0', 200, '{"id": "0"}'), ('item-1', 503, '{}'), ('item-2', 404, '{}')]),
+                     batch_response([('item-1', 200, '{"id": "1"}')])]
+        with mock.patch.object(Transport, 'post', side_effect=responses) as post, \
+                mock.patch.object(RetryPolicy, 'BASE_DELAY', 0.001):
+            results = Batch._execute_chunk(calls, 0)
+        self.assertEqual([response.status_code for response in results], [200, 200, 404])
+        self.assertIn('/drive/v3/files/1 ', post.call_args.kwargs['data'].decode())
+        self.assertNotIn('/drive/v3/files/0 ', post.call_args.kwargs['data'].decode())
+
+
+class BatchLocalDriveTest(unittest.TestCase):
+    """ Batch.execute целиком на LocalDrive """
+
+    def test_execute(self):
+        files_url = f'{Transport.BASE_URL}/drive/v3/files'
+        count = Batch.MAX_CALLS + 5
+        created = Batch.execute([{'method': 'POST', 'url': files_url,
+                                  'json': {'name': f'batch-{index}', 'parents': [LocalDrive.ROOT_ID]}}
+                                 for index in range(count)])
+        self.assertEqual([response.status_code for response in created], [200] * count)
+        self.assertEqual([response.json()['name'] for response in created], [f'batch-{index}' for index in range(count)])
+
+        files_id = [response.json()['id'] for response in created]
+        calls = [{'method': 'PATCH', 'url': f'{files_url}/{file_id}', 'params': {'fields': 'id, name'},
+                  'json': {'name': f'renamed-{index}'}} for index, file_id in enumerate(files_id)]
+        calls.append({'method': 'DELETE', 'url': f'{files_url}/missing'})
+        results = Batch.execute(calls)
+        self.assertEqual([response.json()['name'] for response in results[:-1]],
+                         [f'renamed-{index}' for index in range(count)])
+        self.assertEqual(results[-1].status_code, 404)
+        self.assertEqual(json.loads(results[-1].text)['error']['code'], 404)
+
+        drive = offline_environment.local_drive.drive
+        self.assertEqual({drive.files[file_id]['name'] for file_id in files_id},
+                         {f'renamed-{index}' for index in range(count)})
+
+
+if __name__ == '__main__':
+    unittest.main()
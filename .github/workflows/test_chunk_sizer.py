@@ -0,0 +1,143 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import re
+import unittest
+from unittest import mock
+
+from ChunkSizer import ChunkSizer
+from LocalDrive import LocalDrive
+from Transport import Transport
+from UploadEngine import UploadEngine
+from UploadJournal import UploadJournal
+
+KIB = 1024
+MIB = 1024 * KIB
+GRANULARITY = ChunkSizer.GRANULARITY
+
+
+class ChunkSizerTest(unittest.TestCase):
+    """ ChunkSizer: размер куска кратен 256 КиБ и подстраивается под канал """
+
+    def setUp(self):
+        # без запомненного для сети размера
+        patcher = mock.patch.object(UploadJournal, 'chunk_size', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertGranular(self, size):
+        self.assertEqual(size % GRANULARITY, 0, size)
+        self.assertGreaterEqual(size, ChunkSizer.MIN_SIZE)
+        self.assertLessEqual(size, ChunkSizer.MAX_SIZE)
+
+    def test_round(self):
+        self.assertEqual(GRANULARITY, 256 * KIB)
+        self.assertEqual(ChunkSizer._round(GRANULARITY * 3), GRANULARITY * 3)
+        self.assertEqual(ChunkSizer._round(GRANULARITY * 3 + 1), GRANULARITY * 3)
+        self.assertEqual(ChunkSizer._round(GRANULARITY * 3.6), GRANULARITY * 4)
+        self.assertEqual(ChunkSizer._round(0), ChunkSizer.MIN_SIZE)
+        self.assertEqual(ChunkSizer._round(1), ChunkSizer.MIN_SIZE)
+        self.assertEqual(ChunkSizer._round(ChunkSizer.MAX_SIZE * 10), ChunkSizer.MAX_SIZE)
+        for size in range(1, 100 * MIB, 777 * KIB + 13):
+            self.assertGranular(ChunkSizer._round(size))
+
+    def test_initial(self):
+        self.assertEqual(ChunkSizer(10 * MIB, 0.05).size, 1 * MIB)
+        self.assertEqual(ChunkSizer(100 * MIB, 0.05).size, 5 * MIB)
+        self.assertEqual(ChunkSizer(500 * MIB, 0.05).size, 10 * MIB)
+        self.assertEqual(ChunkSizer(5 * 1024 * MIB, 0.05).size, 20 * MIB)
+
+    def test_remembered(self):
+        UploadJournal.chunk_size.return_value = 3 * MIB + 100
+        self.assertEqual(ChunkSizer(10 * MIB, 0.05).size, 3 * MIB)
+
+    def test_grows_on_fast_link(self):
+        # 100 МБ/с при RTT 50 мс: кусок растет не больше чем вдвое за шаг
+        sizer = ChunkSizer(1024 * MIB, 0.05)
+        sizes = [sizer.size]
+        for _ in range(10):
+            sizer.record(sizer.size, 0.05 + sizer.size / 100e6)
+            sizes.append(sizer.size)
+        for previous, size in zip(sizes, sizes[1:]):
+            self.assertGranular(size)
+            self.assertGreaterEqual(size, previous)
+            self.assertLessEqual(size, previous * 2)
+        # на RTT уходит не больше OVERHEAD времени куска
+        self.assertGreaterEqual(sizes[-1] / 100e6, 0.05 * (1 - ChunkSizer.OVERHEAD) / ChunkSizer.OVERHEAD * 0.9)
+
+    def test_shrinks_on_slow_link(self):
+        # 100 КБ/с: кусок идет не дольше MAX_SECONDS
+        sizer = ChunkSizer(1024 * MIB, 0.05)
+        for _ in range(10):
+            previous = sizer.size
+            sizer.record(sizer.size, 0.05 + sizer.size / 100e3)
+            self.assertGranular(sizer.size)
+            self.assertGreaterEqual(sizer.size, ChunkSizer._round(previous / 2))
+        self.assertLessEqual(sizer.size / 100e3, ChunkSizer.MAX_SECONDS)
+
+    def test_latency_only(self):
+        sizer = ChunkSizer(10 * MIB, 0.5)
+        sizer.record(sizer.size, 0.1)
+        self.assertEqual(sizer.size, 2 * MIB)
+
+    def test_short_chunk_ignored(self):
+        sizer = ChunkSizer(10 * MIB, 0.05)
+        sizer.record(sizer.size - 1, 100)
+        self.assertEqual((sizer.size, sizer.bandwidth, sizer.best_size), (1 * MIB, None, None))
+
+    def test_failed(self):
+        sizer = ChunkSizer(5 * 1024 * MIB, 0.05)
+        sizes = []
+        for _ in range(10):
+            sizer.failed()
+            sizes.append(sizer.size)
+        self.assertEqual(sizes[:4], [10 * MIB, 5 * MIB, 5 * MIB // 2, 5 * MIB // 4])
+        self.assertEqual(sizes[-1], ChunkSizer.MIN_SIZE)
+        for size in sizes:
+            self.assertGranular(size)
+
+    def test_save(self):
+        sizer = ChunkSizer(1024 * MIB, 0.05)
+        with mock.patch.object(UploadJournal, 'remember_chunk_size') as remember:
+            sizer.save()
+            remember.assert_not_called()
+            sizer.record(sizer.size, 0.1 + sizer.size / 10e6)
+            best = sizer.best_size
+            sizer.record(sizer.size, 10)
+            sizer.save()
+        self.assertEqual(remember.call_args.args[:2], (sizer.network, best))
+
+
+class ChunkSizerLocalDriveTest(unittest.TestCase):
+    """ Куски настоящей resumable-загрузки на LocalDrive """
+
+    def test_upload(self):
+        content = bytes(range(256)) * (9 * MIB // 256 + 1000)
+        path = offline_environment.local_file('chunks.bin', content)
+        network = ChunkSizer.network()
+        UploadJournal.remember_chunk_size(network, GRANULARITY, 0)
+
+        ranges = []
+        put = Transport.put
+
+        def record(url, headers=None, **kwargs):
+            match = re.match(r'bytes (\d+)-(\d+)/', headers['Content-Range'])
+            if match:
+                ranges.append((int(match.group(1)), int(match.group(2)) + 1))
+            return put(url, headers=headers, **kwargs)
+
+        with mock.patch.object(Transport, 'put', side_effect=record):
+            result = UploadEngine.resumable(LocalDrive.ROOT_ID, UploadJournal.identity(path), 'chunks.bin', quiet=True)
+
+        self.assertEqual(offline_environment.local_drive.drive.contents[result['id']], content)
+        # куски идут подряд, все кроме последнего кратны 256 КиБ, и начинают с запомненного размера
+        self.assertEqual(ranges[0], (0, GRANULARITY))
+        self.assertEqual([start for start, _ in ranges[1:]], [end for _, end in ranges[:-1]])
+        self.assertEqual(ranges[-1][1], len(content))
+        for start, end in ranges[:-1]:
+            self.assertEqual((end - start) % GRANULARITY, 0)
+        # на быстром локальном канале кусок растет, лучший размер запомнен для сети
+        self.assertGreater(max(end - start for start, end in ranges), GRANULARITY)
+        self.assertGreaterEqual(UploadJournal.chunk_size(network), GRANULARITY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import threading
+import unittest
+from unittest import mock
+
+import Concurrency as concurrency_module
+from Concurrency import Concurrency
+from WorkerPool import WorkerPool
+
+
+class ConcurrencyTest(unittest.TestCase):
+    """ Concurrency: рост и уменьшение limit (AIMD) и возврат слотов """
+
+    STATE = ('_limit', '_in_flight', '_successes', '_latency', '_baseline', '_error_rate', '_last_decrease')
+
+    def setUp(self):
+        saved = {name: getattr(Concurrency, name) for name in self.STATE}
+        self.addCleanup(lambda: [setattr(Concurrency, name, value) for name, value in saved.items()])
+        Concurrency._limit = 4
+        Concurrency._in_flight = 0
+        Concurrency._successes = 0
+        Concurrency._latency = Concurrency._baseline = None
+        Concurrency._error_rate = 0.0
+        Concurrency._last_decrease = 0.0
+
+    def saturate(self):
+        """ Все слоты заняты, как во время массовой операции """
+        Concurrency._in_flight = Concurrency._limit
+
+    def test_increase(self):
+        # +1 после каждых limit успешных ответов
+        for limit in (4, 5, 6):
+            self.saturate()
+            for _ in range(limit - 1):
+                Concurrency.observe(0.1)
+            self.assertEqual(Concurrency.limit(), limit)
+            Concurrency.observe(0.1)
+            self.assertEqual(Concurrency.limit(), limit + 1)
+
+    def test_increase_bounded(self):
+        with mock.patch.object(Concurrency, 'MAX_LIMIT', 5):
+            for _ in range(100):
+                self.saturate()
+                Concurrency.observe(0.1)
+        self.assertEqual(Concurrency.limit(), 5)
+
+    def test_no_increase(self):
+        # слоты не заняты: одиночная команда не поднимает limit
+        for _ in range(100):
+            Concurrency.observe(0.1)
+        self.assertEqual(Concurrency.limit(), 4)
+
+        # задержка выросла больше чем в LATENCY_FACTOR раз от лучшей
+        # (пока база не подтянулась к новой задержке)
+        self.saturate()
+        for _ in range(10):
+            Concurrency.observe(1.0)
+        self.assertEqual(Concurrency.limit(), 4)
+
+    def test_no_increase_on_errors(self):
+        self.saturate()
+        Concurrency.observe(0.1, 'server')
+        Concurrency.observe(0.1, 'network')
+        for _ in range(4):
+            Concurrency.observe(0.1)
+        self.assertGreater(Concurrency._error_rate, Concurrency.ERROR_THRESHOLD)
+        self.assertEqual(Concurrency.limit(), 4)
+
+    def test_decrease(self):
+        now = [100.0]
+        Concurrency._limit = 16
+        with mock.patch.object(concurrency_module.time, 'monotonic', side_effect=lambda: now[0]):
+            Concurrency.observe(0.1, 'rate_limit')
+            self.assertEqual(Concurrency.limit(), 8)
+            # тот же всплеск 429: второе уменьшение не раньше DECREASE_INTERVAL
+            Concurrency.observe(0.1, 'rate_limit')
+            self.assertEqual(Concurrency.limit(), 8)
+            for _ in range(5):
+                now[0] += Concurrency.DECREASE_INTERVAL
+                Concurrency.throttled()
+        self.assertEqual(Concurrency.limit(), Concurrency.MIN_LIMIT)
+
+    def test_slot_released_on_error(self):
+        with self.assertRaises(ValueError):
+            with Concurrency.slot():
+                self.assertTrue(Concurrency.in_slot())
+                raise ValueError('task failed')
+        self.assertEqual(Concurrency._in_flight, 0)
+        self.assertFalse(Concurrency.in_slot())
+
+    def test_waiting_slot(self):
+        # поток, ждущий слот, получает его, когда задача в другом потоке падает
+        Concurrency._limit = 1
+        failed = threading.Event()
+        entered = threading.Event()
+
+        def failing():
+            with self.assertRaises(ValueError):
+                with Concurrency.slot():
+                    failed.wait(5)
+                    raise ValueError('task failed')
+
+        def waiting():
+            with Concurrency.slot():
+                entered.set()
+
+        threads = [threading.Thread(target=failing), threading.Thread(target=waiting)]
+        threads[0].start()
+        threads[1].start()
+        self.assertFalse(entered.wait(0.1))
+        failed.set()
+        self.assertTrue(entered.wait(5))
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(Concurrency._in_flight, 0)
+
+    def test_worker_pool_errors(self):
+        def task(item):
+            if item % 3 == 0:
+                raise ValueError(item)
+            return item
+
+        with self.assertRaises(ValueError):
+            WorkerPool.map(task, range(20))
+        self.assertEqual(Concurrency._in_flight, 0)
+        self.assertEqual(WorkerPool.map(task, [1, 2, 4]), [1, 2, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
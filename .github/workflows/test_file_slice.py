@@ -0,0 +1,98 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import io
+import unittest
+
+from FileSlice import FileSlice
+
+CONTENT = bytes(range(256)) * 40
+
+
+class FileSliceTest(unittest.TestCase):
+    """ FileSlice: участок файла с prefix и suffix как тело запроса """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.path = offline_environment.local_file('slice.bin', CONTENT)
+
+    def read(self, body, block):
+        """ Все тело, прочитанное блоками по block байт (как читают requests и aiohttp) """
+        data = b''
+        while True:
+            chunk = body.read(block)
+            if not chunk:
+                return data
+            data += chunk
+
+    def test_whole_file(self):
+        with FileSlice(self.path) as body:
+            self.assertEqual(len(body), len(CONTENT))
+            self.assertEqual(body.read(), CONTENT)
+
+    def test_slice(self):
+        with FileSlice(self.path, 1000, 3000) as body:
+            self.assertEqual(len(body), 3000)
+            for block in (1, 7, 1000, 5000):
+                body.seek(0)
+                self.assertEqual(self.read(body, block), CONTENT[1000:4000])
+
+    def test_slice_past_end(self):
+        with FileSlice(self.path, len(CONTENT) - 10, 100) as body:
+            self.assertEqual(body.read(), CONTENT[-10:])
+        with FileSlice(self.path, len(CONTENT) + 10) as body:
+            self.assertEqual((len(body), body.read()), (0, b''))
+
+    def test_prefix_suffix(self):
+        prefix, suffix = b'--boundary\r\n\r\n', b'\r\n--boundary--'
+        expected = prefix + CONTENT[500:2500] + suffix
+        with FileSlice(self.path, 500, 2000, prefix=prefix, suffix=suffix) as body:
+            self.assertEqual(len(body), len(expected))
+            # границы блоков попадают и внутрь prefix/suffix, и на их края
+            for block in (1, 3, len(prefix), len(prefix) + 1, 2000, 10000):
+                body.seek(0)
+                self.assertEqual(self.read(body, block), expected, block)
+
+    def test_empty_slice(self):
+        with FileSlice(self.path, 0, 0, prefix=b'head', suffix=b'tail') as body:
+            self.assertEqual((len(body), body.read()), (8, b'headtail'))
+
+    def test_seek(self):
+        prefix, suffix = b'abc', b'xyz'
+        expected = prefix + CONTENT[:100] + suffix
+        with FileSlice(self.path, 0, 100, prefix=prefix, suffix=suffix) as body:
+            # сырой поток может вернуть меньше запрошенного на границе prefix/участка/suffix,
+            # поэтому после каждого seek дочитываем до конца
+            self.assertEqual(body.seek(2), 2)
+            self.assertEqual(self.read(body, 3), expected[2:])
+            self.assertEqual(body.seek(15), 15)
+            self.assertEqual(body.seek(-10, io.SEEK_CUR), 5)
+            self.assertEqual(self.read(body, 5), expected[5:])
+            self.assertEqual(body.seek(-4, io.SEEK_END), len(expected) - 4)
+            self.assertEqual(body.read(), expected[-4:])
+            self.assertEqual(body.tell(), len(expected))
+            # за пределы тела seek не уходит
+            self.assertEqual(body.seek(1000), len(expected))
+            self.assertEqual(body.read(), b'')
+            self.assertEqual(body.seek(-1000, io.SEEK_CUR), 0)
+            self.assertEqual(body.read(), expected)
+
+    def test_retry(self):
+        # повтор запроса: seek(0) и то же тело заново
+        with FileSlice(self.path, 10, 50, prefix=b'p') as body:
+            first = body.read()
+            body.seek(0)
+            self.assertEqual(body.read(), first)
+
+    def test_prefetch(self):
+        with FileSlice(self.path, 0, 100) as body:
+            body.prefetch(1000)
+            body.prefetch(0)
+            self.assertEqual(body.read(), CONTENT[:100])
+
+    def test_close(self):
+        body = FileSlice(self.path)
+        body.close()
+        self.assertTrue(body.file.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import io
+import os
+import unittest
+from unittest import mock
+
+import requests
+
+from FileManagerProxy import FileManagerProxy
+from LocalDrive import LocalDrive
+from MetadataIndex import MetadataIndex
+from PathCache import PathCache
+from Transport import Transport
+
+FOLDER = 'application/vnd.google-apps.folder'
+
+
+def folder(file_id, parent, trashed=False):
+    return {'id': file_id, 'name': file_id, 'mimeType': FOLDER, 'parents': [parent], 'trashed': trashed}
+
+
+def file(file_id, parent, name=None, trashed=False):
+    return {'id': file_id, 'name': name or file_id, 'mimeType': 'text/plain', 'parents': [parent],
+            'size': '10', 'md5Checksum': f'md5-{file_id}', 'modifiedTime': '2024-01-01T00:00:00.000Z',
+            'trashed': trashed}
+
+
+TREE = [
+    folder('docs', 'drive'),
+    folder('nested', 'docs'),
+    file('report', 'docs', 'report.txt'),
+    file('deep', 'nested', 'deep.txt'),
+    file('old', 'docs', 'report.txt', trashed=True),
+    # то же имя в другой папке
+    file('top', 'drive', 'report.txt'),
+]
+
+
+class IndexTestCase(unittest.TestCase):
+    """ Индекс, построенный из TREE для диска 'drive', и пути этих файлов в PathCache """
+
+    PATHS = {'docs': 'docs', 'docs/nested': 'nested', 'docs/report.txt': 'report',
+             'docs/nested/deep.txt': 'deep', 'report.txt': 'top'}
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"GOOGLE_CLOUD_MY_DRIVE_ID": 'drive'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.assertEqual(MetadataIndex.build('drive', iter(TREE), 'token-1'), len(TREE))
+        self.addCleanup(MetadataIndex.invalidate)
+        for path, file_id in self.PATHS.items():
+            PathCache.put(path, 'any', file_id)
+
+    def cached(self):
+        return {path for path in self.PATHS if PathCache.get_id(path, 'any', count=False)}
+
+    def names(self, parent_id, with_trashed=False):
+        return sorted(child['name'] for child in MetadataIndex.children(parent_id, with_trashed))
+
+
+class MetadataIndexTest(IndexTestCase):
+    """ MetadataIndex: построение, поиск по родителю и имени, изменения командами терминала """
+
+    def test_build(self):
+        self.assertTrue(MetadataIndex.ready())
+        self.assertEqual(MetadataIndex.page_token(), 'token-1')
+        self.assertEqual(MetadataIndex.get('deep'), file('deep', 'nested', 'deep.txt'))
+        self.assertEqual(MetadataIndex.get('drive')['mimeType'], FOLDER)
+        self.assertIsNone(MetadataIndex.get('missing'))
+        # построение заново сбрасывает PathCache
+        MetadataIndex.build('drive', TREE[:1], 'token-2')
+        self.assertEqual(self.cached(), set())
+        self.assertEqual((MetadataIndex.page_token(), self.names('drive')), ('token-2', ['docs']))
+
+    def test_children_by_name(self):
+        self.assertEqual(MetadataIndex.children_by_name('docs', 'report.txt'), ['report'])
+        self.assertEqual(sorted(MetadataIndex.children_by_name('docs', 'report.txt', with_trashed=True)),
+                         ['old', 'report'])
+        self.assertEqual(MetadataIndex.children_by_name('docs', 'nested', mime_type=FOLDER), ['nested'])
+        self.assertEqual(MetadataIndex.children_by_name('docs', 'nested', mime_type='text/plain'), [])
+        self.assertEqual(MetadataIndex.children_by_name('drive', 'report.txt'), ['top'])
+        self.assertEqual(sorted(MetadataIndex.find_by_name('report.txt')), ['old', 'report', 'top'])
+        self.assertEqual(self.names('docs'), ['nested', 'report.txt'])
+
+    def test_put(self):
+        # перемещение папки: ее ветка выброшена из PathCache, остальные пути остались
+        MetadataIndex.put(folder('nested', 'drive'))
+        self.assertEqual(MetadataIndex.children_by_name('drive', 'nested'), ['nested'])
+        self.assertEqual(MetadataIndex.children_by_name('docs', 'nested'), [])
+        self.assertEqual(self.cached(), {'docs', 'docs/report.txt', 'report.txt'})
+        self.assertEqual(MetadataIndex.store().get('nested')['parents'], ['drive'])
+
+        # без имени (неполный ответ) в индекс не пишется, но из кэша путей выбрасывается
+        MetadataIndex.put({'id': 'top', 'trashed': True})
+        self.assertFalse(MetadataIndex.get('top')['trashed'])
+        self.assertNotIn('report.txt', self.cached())
+
+    def test_remove_branch(self):
+        MetadataIndex.remove('docs')
+        for file_id in ('docs', 'nested', 'report', 'deep', 'old'):
+            self.assertIsNone(MetadataIndex.get(file_id), file_id)
+        self.assertEqual(self.names('drive', with_trashed=True), ['report.txt'])
+        self.assertEqual(self.cached(), {'report.txt'})
+        self.assertIsNone(MetadataIndex.store().get('deep'))
+
+    def test_remove_trashed(self):
+        MetadataIndex.remove_trashed()
+        self.assertIsNone(MetadataIndex.get('old'))
+        self.assertEqual(self.names('docs', with_trashed=True), ['nested', 'report.txt'])
+
+    def test_other_drive(self):
+        # индекс построен для другого пользователя: им не пользуются и не дополняют
+        with mock.patch.dict(os.environ, {"GOOGLE_CLOUD_MY_DRIVE_ID": 'other'}):
+            self.assertFalse(MetadataIndex.ready())
+            MetadataIndex.put(file('late', 'drive'))
+        self.assertIsNone(MetadataIndex.get('late'))
+
+
+class ChangesTest(IndexTestCase):
+    """ Лента изменений: apply_changes, invalidate и FileManagerProxy.sync_index """
+
+    def test_apply_changes(self):
+        MetadataIndex.apply_changes([
+            {'fileId': 'deep', 'removed': True},
+            {'fileId': 'report', 'removed': False, 'file': file('report', 'docs', 'report.txt', trashed=True)},
+            # перемещение с переименованием
+            {'fileId': 'top', 'removed': False, 'file': file('top', 'nested', 'moved.txt')},
+            {'fileId': 'new', 'removed': False, 'file': file('new', 'drive', 'report.txt')},
+            # файл без метаданных (например, потерян доступ) - тоже удаление
+            {'fileId': 'old'},
+        ], 'token-2')
+
+        self.assertEqual(MetadataIndex.page_token(), 'token-2')
+        self.assertIsNone(MetadataIndex.get('deep'))
+        self.assertIsNone(MetadataIndex.get('old'))
+        self.assertEqual(MetadataIndex.children_by_name('docs', 'report.txt'), [])
+        self.assertEqual(MetadataIndex.children_by_name('docs', 'report.txt', with_trashed=True), ['report'])
+        self.assertEqual(MetadataIndex.children_by_name('nested', 'moved.txt'), ['top'])
+        self.assertEqual(MetadataIndex.children_by_name('drive', 'report.txt'), ['new'])
+        # пути измененных файлов выброшены, папки остались
+        self.assertEqual(self.cached(), {'docs', 'docs/nested'})
+        store = MetadataIndex.store()
+        self.assertEqual(sorted(record['id'] for record in store.children('nested')), ['top'])
+
+    def test_invalidate(self):
+        MetadataIndex.invalidate()
+        self.assertFalse(MetadataIndex.ready())
+        self.assertIsNone(MetadataIndex.page_token())
+        self.assertEqual(self.cached(), set())
+
+    def test_sync_local_drive(self):
+        token = Transport.get(f'{Transport.BASE_URL}/drive/v3/changes/startPageToken').json()['startPageToken']
+        MetadataIndex.apply_changes([], token)
+        created = Transport.post(f'{Transport.BASE_URL}/drive/v3/files',
+                                 json={'name': 'synced', 'mimeType': FOLDER, 'parents': [LocalDrive.ROOT_ID]}).json()
+
+        self.assertTrue(FileManagerProxy.sync_index())
+        self.assertEqual(MetadataIndex.children_by_name(LocalDrive.ROOT_ID, 'synced'), [created['id']])
+        self.assertNotEqual(MetadataIndex.page_token(), token)
+
+        Transport.delete(f"{Transport.BASE_URL}/drive/v3/files/{created['id']}")
+        self.assertTrue(FileManagerProxy.sync_index())
+        self.assertIsNone(MetadataIndex.get(created['id']))
+
+    def test_sync_expired_token(self):
+        # курсор, которого LocalDrive не знает (404): индекс строится заново
+        MetadataIndex.apply_changes([], '1000000')
+        self.assertFalse(FileManagerProxy.sync_index())
+        self.assertFalse(MetadataIndex.ready())
+        self.assertEqual(self.cached(), set())
+
+    def sync(self, status_code):
+        """ sync_index, на который changes.list отвечает status_code """
+        result = requests.Response()
+        result.status_code = status_code
+        result._content = b'{}'
+        result.raw = io.BytesIO()
+        with mock.patch.object(Transport, 'get', return_value=result), \
+                mock.patch('FileManagerProxy.UserInterface.show_error') as show_error:
+            synced = FileManagerProxy.sync_index()
+        return synced, show_error.called
+
+    def test_sync_invalid_token(self):
+        for status_code in (400, 404, 410):
+            MetadataIndex.build('drive', iter(TREE), 'token-1')
+            self.assertEqual(self.sync(status_code), (False, False), status_code)
+            self.assertFalse(MetadataIndex.ready(), status_code)
+
+    def test_sync_failed(self):
+        # ошибка сервера или сети - индекс остается, синхронизация будет при следующей команде
+        self.assertEqual(self.sync(500), (False, True))
+        self.assertTrue(MetadataIndex.ready())
+        self.assertEqual(MetadataIndex.page_token(), 'token-1')
+
+        with mock.patch.object(Transport, 'get', side_effect=requests.exceptions.ConnectionError('offline')), \
+                mock.patch('FileManagerProxy.UserInterface.show_error') as show_error:
+            self.assertFalse(FileManagerProxy.sync_index())
+        show_error.assert_called_once()
+        self.assertTrue(MetadataIndex.ready())
+
+
+if __name__ == '__main__':
+    unittest.main()
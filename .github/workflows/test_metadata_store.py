@@ -0,0 +1,186 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import random
+import unittest
+
+import MetadataStore as metadata_store_module
+from MetadataStore import MetadataStore
+
+FOLDER = 'application/vnd.google-apps.folder'
+
+
+def folder(file_id, parent=None, trashed=False):
+    return {'id': file_id, 'name': file_id, 'mimeType': FOLDER,
+            'parents': [parent] if parent else [], 'trashed': trashed}
+
+
+def file(file_id, parent, size=None, trashed=False, mimeType='text/plain'):
+    record = {'id': file_id, 'name': file_id, 'mimeType': mimeType, 'parents': [parent], 'trashed': trashed}
+    if size is not None:
+        # Drive отдает размер строкой
+        record['size'] = str(size)
+    return record
+
+
+class MetadataStoreTest(unittest.TestCase):
+    """ MetadataStore: колонки отдают те же поля, что и ответы Drive v3 """
+
+    def setUp(self):
+        MetadataStore.load([
+            folder('root'),
+            folder('docs', 'root'),
+            file('report', 'docs', 1234),
+            file('old', 'docs', 10, trashed=True),
+            folder('nested', 'docs'),
+            file('deep', 'nested', 5),
+            file('таблица', 'root', mimeType='application/vnd.google-apps.spreadsheet'),
+        ])
+
+    def tearDown(self):
+        MetadataStore.clear()
+
+    def names(self, parent_id, with_trashed=True):
+        return sorted(record['name'] for record in MetadataStore.children(parent_id, with_trashed))
+
+    def test_record(self):
+        record = MetadataStore.get('report')
+        self.assertEqual(record.to_dict(), file('report', 'docs', 1234))
+        self.assertEqual(record['size'], '1234')
+        self.assertNotIn('size', MetadataStore.get('таблица'))
+        self.assertEqual(MetadataStore.get('таблица').get('size', 0), 0)
+        self.assertEqual(MetadataStore.get('таблица')['name'], 'таблица')
+        with self.assertRaises(KeyError):
+            MetadataStore.get('root')['parents']
+        self.assertIsNone(MetadataStore.get('missing'))
+        self.assertEqual(MetadataStore.count(), 7)
+
+    def test_children(self):
+        self.assertEqual(self.names('docs'), ['nested', 'old', 'report'])
+        self.assertEqual(self.names('docs', with_trashed=False), ['nested', 'report'])
+        self.assertEqual(self.names('missing'), [])
+
+    def test_put(self):
+        # перемещение и переименование
+        MetadataStore.put(dict(file('report', 'root', 1234), name='report-2024'))
+        self.assertEqual(self.names('docs'), ['nested', 'old'])
+        self.assertIn('report-2024', self.names('root'))
+        # неполная запись игнорируется
+        MetadataStore.put({'id': 'broken'})
+        self.assertIsNone(MetadataStore.get('broken'))
+
+    def test_remove(self):
+        MetadataStore.remove('nested', branch=False)
+        self.assertIsNone(MetadataStore.get('nested'))
+        # лента изменений присылает потомков отдельно
+        self.assertIsNotNone(MetadataStore.get('deep'))
+
+        MetadataStore.remove('docs')
+        for file_id in ('docs', 'report', 'old'):
+            self.assertIsNone(MetadataStore.get(file_id))
+        self.assertEqual(self.names('root'), ['таблица'])
+
+    def test_remove_trashed(self):
+        MetadataStore.remove_trashed()
+        self.assertEqual(self.names('docs'), ['nested', 'report'])
+        self.assertEqual(MetadataStore.count(), 6)
+
+    def test_not_loaded(self):
+        MetadataStore.clear()
+        MetadataStore.put(file('late', 'root', 1))
+        MetadataStore.remove('report')
+        self.assertIsNone(MetadataStore.get('late'))
+        self.assertEqual(MetadataStore.count(), 0)
+
+
+class FolderSizeTest(unittest.TestCase):
+    """ MetadataStore.folder_size: numpy и чистый Python дают одни и те же суммы веток """
+
+    TREE = [
+        folder('root'),
+        folder('a', 'root'),
+        file('a-x', 'a', 100),
+        file('a-y', 'a', 50),
+        folder('b', 'root'),
+        folder('b-c', 'b'),
+        file('b-c-z', 'b-c', 7),
+        # в корзине: не учитывается ни в своей папке, ни выше
+        file('b-big', 'b', 1000, trashed=True),
+        # папка в корзине считает своих детей, но родителю ничего не передает
+        folder('t', 'root', trashed=True),
+        file('t-w', 't', 30),
+        # у документов Google размера нет
+        file('doc', 'root', mimeType='application/vnd.google-apps.document'),
+        # родитель не загружен (общий диск, чужая папка)
+        file('orphan', 'elsewhere', 5),
+    ]
+    EXPECTED = {'root': 157, 'a': 150, 'a-x': 100, 'b': 7, 'b-c': 7, 'b-c-z': 7,
+                't': 30, 'doc': 0, 'orphan': 5}
+
+    def setUp(self):
+        self.numpy = metadata_store_module.np
+        MetadataStore.load(self.TREE)
+
+    def tearDown(self):
+        metadata_store_module.np = self.numpy
+        MetadataStore.clear()
+
+    def sizes(self, use_numpy, ids):
+        """ folder_size всех ids, посчитанные заново нужной реализацией """
+        metadata_store_module.np = self.numpy if use_numpy else None
+        MetadataStore._totals_version = -1
+        return {file_id: MetadataStore.folder_size(file_id) for file_id in ids}
+
+    def test_python(self):
+        self.assertEqual(self.sizes(False, self.EXPECTED), self.EXPECTED)
+
+    @unittest.skipIf(metadata_store_module.np is None, "numpy не установлен")
+    def test_numpy(self):
+        self.assertEqual(self.sizes(True, self.EXPECTED), self.EXPECTED)
+
+    def test_unknown(self):
+        self.assertIsNone(MetadataStore.folder_size('missing'))
+
+    def test_changes(self):
+        # итоги пересчитываются после каждого изменения хранилища
+        self.assertEqual(MetadataStore.folder_size('root'), 157)
+
+        MetadataStore.put(file('a-new', 'a', 3))
+        self.assertEqual(MetadataStore.folder_size('a'), 153)
+        self.assertEqual(MetadataStore.folder_size('root'), 160)
+
+        # перемещение в корзину
+        MetadataStore.put(file('a-x', 'a', 100, trashed=True))
+        self.assertEqual(MetadataStore.folder_size('root'), 60)
+
+        # перемещение папки
+        MetadataStore.put(folder('b-c', 'a'))
+        self.assertEqual(MetadataStore.folder_size('a'), 60)
+        self.assertEqual(MetadataStore.folder_size('b'), 0)
+
+        # удаление ветки
+        MetadataStore.remove('a')
+        self.assertEqual(MetadataStore.folder_size('root'), 0)
+        self.assertEqual(MetadataStore.folder_size('b-c-z'), 0)
+
+    @unittest.skipIf(metadata_store_module.np is None, "numpy не установлен")
+    def test_random_tree(self):
+        generator = random.Random(1)
+        tree = [folder('n0')]
+        folders = ['n0']
+        for index in range(1, 3000):
+            parent = generator.choice(folders)
+            trashed = generator.random() < 0.05
+            if generator.random() < 0.3:
+                tree.append(folder(f'n{index}', parent, trashed))
+                folders.append(f'n{index}')
+            else:
+                tree.append(file(f'n{index}', parent, generator.randrange(10 ** 6), trashed))
+        MetadataStore.load(tree)
+        for file_id in generator.sample(folders, 50):
+            MetadataStore.remove(file_id, branch=generator.random() < 0.5)
+
+        ids = [record['id'] for record in tree]
+        self.assertEqual(self.sizes(True, ids), self.sizes(False, ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
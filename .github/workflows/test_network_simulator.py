@@ -0,0 +1,116 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import json
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+import NetworkSimulator as network_simulator_module
+from LocalDrive import LocalDrive
+from NetworkSimulator import NetworkSimulator
+
+KIB = 1024
+
+
+class NetworkSimulatorTest(unittest.TestCase):
+    """ NetworkSimulator: задержки, всплески 429 и обрывы с заданной частотой """
+
+    def serve(self, **conditions):
+        server, url = NetworkSimulator.serve(offline_environment.api_url, seed=1, **conditions)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server.simulator, url
+
+    def test_latency(self):
+        for distribution in ('constant', 'uniform', 'normal', 'exponential', 'pareto'):
+            simulator = NetworkSimulator('http://upstream', seed=1, latency_ms=200, jitter_ms=50,
+                                         latency_dist=distribution)
+            values = [simulator.latency() for _ in range(20000)]
+            self.assertAlmostEqual(sum(values) / len(values), 0.2, delta=0.01, msg=distribution)
+            self.assertGreaterEqual(min(values), 0)
+
+    def test_latency_proxy(self):
+        simulator, url = self.serve(latency_ms=50)
+        started = time.monotonic()
+        for _ in range(5):
+            response = requests.get(f'{url}/drive/v3/files/root', params={'fields': 'id'})
+            self.assertEqual(response.json(), {'id': LocalDrive.ROOT_ID})
+        self.assertGreaterEqual(time.monotonic() - started, 5 * 0.05)
+
+    def test_bursts(self):
+        # всплеск duration секунд в среднем раз в every секунд: под 429 примерно duration / (every + duration) времени
+        every, duration = 10, 2
+        now = [0.0]
+        with mock.patch.object(network_simulator_module.time, 'monotonic', side_effect=lambda: now[0]):
+            simulator = NetworkSimulator('http://upstream', seed=1, burst_every=every, burst_duration=duration)
+            limited = 0
+            steps = 100000
+            for _ in range(steps):
+                now[0] += 0.1
+                limited += simulator.rate_limited()
+        self.assertAlmostEqual(limited / steps, duration / (every + duration), delta=0.03)
+
+    def test_burst_proxy(self):
+        simulator, url = self.serve(burst_every=3600, burst_duration=60, retry_after=7)
+        # всплеск начинается сейчас
+        simulator.next_burst = time.monotonic()
+        response = requests.get(f'{url}/drive/v3/files/root')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '7')
+        self.assertEqual(response.json()['error']['errors'][0]['reason'], 'rateLimitExceeded')
+        self.assertEqual(simulator.stats['rate_limited'], 1)
+
+    def test_drop_download(self):
+        file = requests.post(f'{offline_environment.api_url}/upload/drive/v3/files?uploadType=media',
+                             data=b'x' * 64 * KIB).json()['id']
+        simulator, url = self.serve(drop_rate=0.2)
+        failed = 0
+        attempts = 300
+        for _ in range(attempts):
+            try:
+                requests.get(f'{url}/drive/v3/files/{file}', params={'alt': 'media'}).content
+            except requests.RequestException:
+                failed += 1
+        self.assertEqual(failed, simulator.stats['dropped'])
+        self.assertAlmostEqual(failed / attempts, 0.2, delta=0.07)
+
+    def test_drop_upload(self):
+        # куски resumable-загрузки обрываются по дороге к серверу и до него не доходят
+        session = requests.post(f'{offline_environment.api_url}/upload/drive/v3/files?uploadType=resumable',
+                                data=json.dumps({'name': 'drop-upload.bin'}),
+                                headers={'Content-Type': 'application/json'}).headers['Location']
+        upload_id = session.rsplit('upload_id=', 1)[1]
+        simulator, url = self.serve(drop_rate=0.2)
+        session = session.replace(offline_environment.api_url, url, 1)
+
+        chunk = b'y' * 64 * KIB
+        offset = failed = attempts = 0
+        while offset < 150 * len(chunk):
+            attempts += 1
+            try:
+                response = requests.put(session, data=chunk,
+                                        headers={'Content-Range': f'bytes {offset}-{offset + len(chunk) - 1}/*'})
+            except requests.RequestException:
+                failed += 1
+                continue
+            self.assertEqual(response.status_code, 308)
+            offset += len(chunk)
+
+        self.assertEqual(failed, simulator.stats['dropped'])
+        self.assertAlmostEqual(failed / attempts, 0.2, delta=0.07)
+        # на сервере ровно принятые куски, без обрывков
+        self.assertEqual(len(offline_environment.local_drive.drive.uploads[upload_id]['data']), offset)
+
+    def test_stall_upload(self):
+        simulator, url = self.serve(stall_rate=1, stall_ms=200)
+        started = time.monotonic()
+        response = requests.post(f'{url}/upload/drive/v3/files?uploadType=media', data=b'z' * 64 * KIB)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        # и тело запроса, и тело ответа
+        self.assertEqual(simulator.stats['stalled'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
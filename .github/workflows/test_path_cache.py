@@ -0,0 +1,104 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import unittest
+from unittest import mock
+
+import PathCache as path_cache_module
+from CommandParser import CommandParser
+from FileManager import FileManager
+from PathCache import PathCache
+
+
+class PathCacheTest(unittest.TestCase):
+    """ PathCache: выбрасывание веток при изменениях и устаревание записей """
+
+    PATHS = {
+        'a': 'id-a',
+        'a/b': 'id-b',
+        'a/b/c': 'id-c',
+        # похожее имя, но не ветка a
+        'ab': 'id-ab',
+        'd': 'id-d',
+    }
+
+    def setUp(self):
+        PathCache.clear()
+        for path, file_id in self.PATHS.items():
+            PathCache.put(path, 'any', file_id)
+
+    def tearDown(self):
+        PathCache.clear()
+
+    def cached(self):
+        """ Пути, которые остались в кэше в обе стороны """
+        paths = {path for path, file_id in self.PATHS.items() if PathCache.get_id(path, 'any', count=False)}
+        ids = {path for path, file_id in self.PATHS.items() if PathCache.get_path(file_id, count=False)}
+        self.assertEqual(paths, ids)
+        return paths
+
+    def test_invalidate_ids(self):
+        PathCache.invalidate_ids(['id-b'])
+        self.assertEqual(self.cached(), {'a', 'ab', 'd'})
+
+    def test_invalidate_ids_several(self):
+        PathCache.invalidate_ids(['id-a', 'id-d', 'unknown'])
+        self.assertEqual(self.cached(), {'ab'})
+
+    def test_invalidate_ids_forward_only(self):
+        # обратная запись вытеснена, путь находится по прямому отображению
+        del PathCache._ids['id-a']
+        PathCache.invalidate_ids(['id-a'])
+        self.assertEqual(self.cached(), {'ab', 'd'})
+
+    def test_invalidate_path(self):
+        PathCache.invalidate_path('a/b/c')
+        self.assertEqual(self.cached(), {'a', 'a/b', 'ab', 'd'})
+
+    def test_invalidate_root(self):
+        PathCache.put('', 'any', 'id-root')
+        PathCache.invalidate_ids(['id-root'])
+        self.assertEqual(self.cached(), set())
+        self.assertEqual(PathCache.stats()['paths'], 0)
+
+    def test_kinds(self):
+        # один путь с разными видами поиска - разные записи, выбрасываются вместе
+        PathCache.put('a', 'folder', 'id-a')
+        PathCache.invalidate_path('a')
+        self.assertIsNone(PathCache.get_id('a', 'folder', count=False))
+        self.assertEqual(self.cached(), {'ab', 'd'})
+
+    def test_max_age(self):
+        now = path_cache_module.time.monotonic()
+        with mock.patch.object(path_cache_module.time, 'monotonic', return_value=now + 60):
+            PathCache.put('d', 'any', 'id-d')
+            self.assertIsNone(PathCache.get_id('a', 'any', max_age=30))
+            self.assertIsNone(PathCache.get_path('id-b', max_age=30))
+            self.assertEqual(PathCache.get_id('d', 'any', max_age=30), 'id-d')
+            # без max_age (есть индекс) записи не устаревают
+            self.assertEqual(PathCache.get_id('ab', 'any'), 'id-ab')
+        # устаревшая запись удалена
+        self.assertIsNone(PathCache.get_id('a', 'any', count=False))
+
+    def test_eviction(self):
+        with mock.patch.object(PathCache, 'MAX_SIZE', 3):
+            PathCache.put('e', 'any', 'id-e')
+        self.assertEqual(PathCache.stats()['paths'], 3)
+        self.assertIsNone(PathCache.get_id('a', 'any', count=False))
+        self.assertEqual(PathCache.get_id('e', 'any', count=False), 'id-e')
+
+    def test_command(self):
+        # команда cache показывает счетчики и очищает кэш
+        PathCache.get_id('a', 'any')
+        PathCache.get_id('missing', 'any')
+        stats = PathCache.stats()
+        command, args = CommandParser.parser_command('cache --clear')
+        with mock.patch('FileManager.UserInterface.show_message') as show_message:
+            FileManager.cache(clear=args.clear)
+        lines = [call.args[0][0]['text'] for call in show_message.call_args_list]
+        self.assertEqual(command, 'cache')
+        self.assertIn(f"Hits: {stats['hits']}, misses: {stats['misses']}", lines[0])
+        self.assertEqual(lines[1], 'Cached paths: 0, cached ids: 0')
+        self.assertEqual(self.cached(), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
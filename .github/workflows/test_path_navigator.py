@@ -0,0 +1,60 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import os
+import unittest
+from unittest import mock
+
+from MetadataIndex import MetadataIndex
+from PathNavigator import PathNavigator
+
+FOLDER = 'application/vnd.google-apps.folder'
+
+
+def folder(file_id, parent, trashed=False):
+    return {'id': file_id, 'name': file_id, 'mimeType': FOLDER, 'parents': [parent], 'trashed': trashed}
+
+
+class RefreshLocationTest(unittest.TestCase):
+    """ PathNavigator.refresh_location: текущая папка по индексу после изменений диска """
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"GOOGLE_CLOUD_MY_DRIVE_ID": 'drive'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        MetadataIndex.build('drive', [folder('a', 'drive'), folder('b', 'a'), folder('c', 'b')], 'token')
+        self.addCleanup(MetadataIndex.invalidate)
+        location = PathNavigator.LOCATION
+        self.addCleanup(PathNavigator.set_location, location)
+        PathNavigator.set_location([('a', 'a'), ('b', 'b'), ('c', 'c')])
+
+    def refresh(self):
+        with mock.patch('PathNavigator.UserInterface.show_error') as show_error:
+            PathNavigator.refresh_location()
+        return show_error.called
+
+    def test_moved(self):
+        # перемещение ветки: путь пересобирается по родителям
+        MetadataIndex.put(folder('b', 'drive'))
+        self.assertFalse(self.refresh())
+        self.assertEqual(PathNavigator.LOCATION, [('b', 'b'), ('c', 'c')])
+        self.assertEqual(os.environ["GOOGLE_CLOUD_CURRENT_ABSPATH_STR"], 'b/c/')
+
+    def test_removed(self):
+        MetadataIndex.remove('c')
+        self.assertTrue(self.refresh())
+        self.assertEqual(PathNavigator.LOCATION, [])
+
+    def test_trashed(self):
+        MetadataIndex.put(folder('c', 'b', trashed=True))
+        self.assertTrue(self.refresh())
+        self.assertEqual(PathNavigator.LOCATION, [])
+
+    def test_parent_trashed(self):
+        # в корзину убран предок: сама папка в индексе не помечена
+        MetadataIndex.put(folder('a', 'drive', trashed=True))
+        self.assertTrue(self.refresh())
+        self.assertEqual(PathNavigator.LOCATION, [])
+        self.assertEqual(os.environ["GOOGLE_CLOUD_CURRENT_PATH"], 'drive')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest import mock
+
+import requests
+
+from Batch import BatchResponse
+from LocalDrive import LocalDrive
+from NetworkSimulator import NetworkSimulator, NetworkSimulatorHandler
+from RetryPolicy import RetryPolicy
+from Transport import Transport
+
+
+def response(status_code, text='', retry_after=None):
+    headers = {'Retry-After': retry_after} if retry_after is not None else {}
+    return BatchResponse(status_code, text, headers)
+
+
+class RetryPolicyTest(unittest.TestCase):
+    """ RetryPolicy.should_retry: классы ошибок, бюджеты и Retry-After """
+
+    def test_classes(self):
+        self.assertEqual(RetryPolicy.classify(response(429)), 'rate_limit')
+        self.assertEqual(RetryPolicy.classify(response(403, '{"reason": "userRateLimitExceeded"}')), 'rate_limit')
+        self.assertEqual(RetryPolicy.classify(response(503)), 'server')
+        self.assertEqual(RetryPolicy.classify(error=requests.exceptions.ReadTimeout()), 'network')
+        # окончательные ошибки не повторяются
+        for status_code, text in ((403, '{"reason": "insufficientPermissions"}'), (404, ''), (400, ''), (501, '')):
+            self.assertEqual(RetryPolicy().should_retry(response(status_code, text)), (None, None))
+        self.assertEqual(RetryPolicy().should_retry(error=ValueError()), (None, None))
+
+    def test_budgets(self):
+        for error_class, budget in RetryPolicy.BUDGETS.items():
+            policy = RetryPolicy()
+            retry = {'rate_limit': {'response': response(429)},
+                     'server': {'response': response(500)},
+                     'network': {'error': requests.exceptions.ConnectionError()}}[error_class]
+            for _ in range(budget):
+                self.assertEqual(policy.should_retry(**retry)[0], error_class)
+            self.assertEqual(policy.should_retry(**retry), (None, None))
+
+    def test_budgets_are_separate(self):
+        policy = RetryPolicy()
+        for _ in range(RetryPolicy.BUDGETS['server']):
+            policy.should_retry(response(502))
+        self.assertEqual(policy.should_retry(response(502)), (None, None))
+        self.assertEqual(policy.should_retry(response(429))[0], 'rate_limit')
+
+    def test_jitter(self):
+        policy = RetryPolicy()
+        for _ in range(RetryPolicy.BUDGETS['rate_limit']):
+            _, delay = policy.should_retry(response(429))
+            self.assertGreaterEqual(delay, RetryPolicy.BASE_DELAY)
+            self.assertLessEqual(delay, RetryPolicy.MAX_DELAY)
+
+    def test_retry_after_seconds(self):
+        self.assertEqual(RetryPolicy().should_retry(response(429, retry_after='7')), ('rate_limit', 7.0))
+        self.assertEqual(RetryPolicy().should_retry(response(503, retry_after='0')), ('server', 0.0))
+        self.assertEqual(RetryPolicy.retry_after(response(503, retry_after='-5')), 0.0)
+
+    def test_retry_after_date(self):
+        date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=20), usegmt=True)
+        _, delay = RetryPolicy().should_retry(response(503, retry_after=date))
+        self.assertTrue(15 <= delay <= 20, delay)
+        # дата в прошлом - повтор сразу
+        past = format_datetime(datetime.now(timezone.utc) - timedelta(hours=1), usegmt=True)
+        self.assertEqual(RetryPolicy.retry_after(response(503, retry_after=past)), 0.0)
+
+    def test_retry_after_invalid(self):
+        self.assertIsNone(RetryPolicy.retry_after(response(503, retry_after='soon')))
+        self.assertIsNone(RetryPolicy.retry_after(None))
+        _, delay = RetryPolicy().should_retry(response(503, retry_after='soon'))
+        self.assertGreaterEqual(delay, RetryPolicy.BASE_DELAY)
+
+    def test_retry_after_clamped(self):
+        self.assertEqual(RetryPolicy().should_retry(response(429, retry_after='3600')),
+                         ('rate_limit', RetryPolicy.MAX_DELAY))
+
+    def test_no_network_retry(self):
+        policy = RetryPolicy(retry_network=False)
+        self.assertEqual(policy.should_retry(error=requests.exceptions.ConnectionError()), (None, None))
+        # отказ по лимиту сервер не выполнял, такой ответ повторяется и без retry_network
+        self.assertEqual(policy.should_retry(response(429, retry_after='1')), ('rate_limit', 1.0))
+
+
+class TransportRetryTest(unittest.TestCase):
+    """ Повторы Transport на настоящих ответах: LocalDrive за прокси с ошибками и обрывами """
+
+    def setUp(self):
+        # паузы между повторами не нужны
+        patcher = mock.patch.object(RetryPolicy, 'BASE_DELAY', 0.001)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def proxy(self, **conditions):
+        server, url = NetworkSimulator.serve(offline_environment.api_url, seed=1, **conditions)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server.simulator, url
+
+    def created(self, name):
+        drive = offline_environment.local_drive.drive
+        return [file for file in drive.files.values() if file['name'] == name]
+
+    def test_server_errors(self):
+        simulator, url = self.proxy(error_rate=0.5)
+        for _ in range(10):
+            response = Transport.get(f'{url}/drive/v3/files/root')
+            self.assertEqual(response.json()['id'], LocalDrive.ROOT_ID)
+        self.assertGreater(simulator.stats['errors'], 0)
+
+    def test_rate_limit_retry_after(self):
+        # всплеск 429 на все время теста: Transport ждет Retry-After и сдается, исчерпав бюджет
+        simulator, url = self.proxy(burst_every=0.001, burst_duration=60, retry_after=0.05)
+        decisions = []
+        should_retry = RetryPolicy.should_retry
+
+        def record(policy, *args, **kwargs):
+            decisions.append(should_retry(policy, *args, **kwargs))
+            return decisions[-1]
+
+        with mock.patch.object(RetryPolicy, 'should_retry', record):
+            response = Transport.get(f'{url}/drive/v3/files/root')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(simulator.stats['rate_limited'], RetryPolicy.BUDGETS['rate_limit'] + 1)
+        self.assertEqual(decisions, [('rate_limit', 0.05)] * RetryPolicy.BUDGETS['rate_limit'] + [(None, None)])
+
+    def test_dropped_get(self):
+        simulator, url = self.proxy(drop_rate=0.5)
+        for _ in range(10):
+            self.assertEqual(Transport.get(f'{url}/drive/v3/about', params={'fields': 'user'}).status_code, 200)
+        self.assertGreater(simulator.stats['dropped'], 0)
+
+    def test_dropped_post(self):
+        # создание после обрыва ответа не повторяется: файл создан ровно один раз
+        simulator, url = self.proxy(drop_rate=1)
+        # тело запроса доходит целиком, обрывается только ответ
+        with mock.patch.object(NetworkSimulatorHandler, '_receive', lambda handler, length: handler.rfile.read(length)), \
+                self.assertRaises(requests.exceptions.RequestException):
+            Transport.post(f'{url}/drive/v3/files', json={'name': 'retry-post', 'parents': [LocalDrive.ROOT_ID]})
+        self.assertEqual(simulator.stats['requests'], 1)
+        self.assertEqual(len(self.created('retry-post')), 1)
+
+    def test_dropped_post_body(self):
+        # обрыв посреди тела запроса: сервер запроса не получил, но и тогда без повтора
+        simulator, url = self.proxy(drop_rate=1)
+        with self.assertRaises(requests.exceptions.RequestException):
+            Transport.post(f'{url}/drive/v3/files', json={'name': 'retry-post-body', 'parents': [LocalDrive.ROOT_ID]})
+        self.assertEqual(simulator.stats['requests'], 1)
+        self.assertEqual(self.created('retry-post-body'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from SingleFlight import SingleFlight
+
+WAITERS = 8
+
+
+class SingleFlightTest(unittest.TestCase):
+    """ SingleFlight: одновременные вызовы с одним ключом выполняются один раз """
+
+    def coalesced(self, func):
+        """ WAITERS одновременных do('key', ...) с одним медленным func; возвращает (число вызовов, результаты) """
+        calls = []
+        started = threading.Barrier(WAITERS)
+
+        def leader():
+            calls.append(1)
+            # остальные потоки успевают прийти, пока первый вызов в полете
+            threading.Event().wait(0.2)
+            return func()
+
+        def call():
+            started.wait()
+            try:
+                return SingleFlight.do('key', leader)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(WAITERS) as executor:
+            results = list(executor.map(lambda _: call(), range(WAITERS)))
+        return len(calls), results
+
+    def test_coalescing(self):
+        result = object()
+        calls, results = self.coalesced(lambda: result)
+        self.assertEqual(calls, 1)
+        self.assertTrue(all(value is result for value in results))
+        self.assertEqual(SingleFlight._calls, {})
+
+    def test_error_fan_out(self):
+        error = ConnectionError('dropped')
+
+        def fail():
+            raise error
+
+        calls, results = self.coalesced(fail)
+        self.assertEqual(calls, 1)
+        self.assertTrue(all(value is error for value in results))
+        self.assertEqual(SingleFlight._calls, {})
+
+    def test_no_caching(self):
+        # следующий вызов после завершения снова выполняется
+        counter = iter(range(10))
+        self.assertEqual(SingleFlight.do('key', lambda: next(counter)), 0)
+        self.assertEqual(SingleFlight.do('key', lambda: next(counter)), 1)
+        # разные ключи не склеиваются
+        self.assertEqual(SingleFlight.do('other', lambda: next(counter)), 2)
+
+    def test_async(self):
+        calls = []
+
+        async def request(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            if value == 'error':
+                raise ConnectionError(value)
+            return value
+
+        async def scenario():
+            results = await asyncio.gather(
+                *(SingleFlight.do_async('ok', lambda: request('ok')) for _ in range(WAITERS)),
+                *(SingleFlight.do_async('error', lambda: request('error')) for _ in range(WAITERS)),
+                return_exceptions=True)
+            return results, dict(SingleFlight._futures)
+
+        results, futures = asyncio.run(scenario())
+        self.assertEqual(sorted(calls), ['error', 'ok'])
+        self.assertEqual(results[:WAITERS], ['ok'] * WAITERS)
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results[WAITERS:]))
+        self.assertEqual(len({id(result) for result in results[WAITERS:]}), 1)
+        self.assertEqual(futures, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
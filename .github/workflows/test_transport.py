@@ -0,0 +1,109 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import io
+import os
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import requests
+from google.auth.exceptions import RefreshError, TransportError
+
+from LocalDrive import LocalDrive
+from Transport import Transport
+
+
+def response(status_code):
+    result = requests.Response()
+    result.status_code = status_code
+    result._content = b'{}'
+    result.raw = io.BytesIO()
+    return result
+
+
+class ExpiredTokenTest(unittest.TestCase):
+    """ Transport: ответ 401 и обновление токена """
+
+    def send(self, *statuses):
+        """ Запрос, на который сервер по очереди отвечает statuses; возвращает (ответ, сессия) """
+        session = mock.Mock()
+        session.request.side_effect = [response(status) for status in statuses]
+        with mock.patch.object(Transport, 'session', return_value=session):
+            return Transport.get(f'{Transport.BASE_URL}/drive/v3/about'), session
+
+    def test_offline(self):
+        # учетные данные-заглушка: в Google за новым токеном не ходим
+        with mock.patch.object(Transport, 'refresh_expired') as refresh:
+            result, session = self.send(401)
+        refresh.assert_not_called()
+        self.assertEqual((result.status_code, session.request.call_count), (401, 1))
+
+    def test_refresh(self):
+        with mock.patch.object(Transport, 'OFFLINE', False), \
+                mock.patch.object(Transport, 'refresh_expired') as refresh:
+            result, session = self.send(401, 200)
+        refresh.assert_called_once_with('offline')
+        self.assertEqual((result.status_code, session.request.call_count), (200, 2))
+
+    def test_refresh_failed(self):
+        # токен отозван или нет сети до Google: команда получает 401, а не исключение google-auth
+        for error in (RefreshError('invalid_grant'), TransportError('connection refused')):
+            with mock.patch.object(Transport, 'OFFLINE', False), \
+                    mock.patch.object(Transport, 'refresh_expired', side_effect=error):
+                result, session = self.send(401)
+            self.assertEqual((result.status_code, session.request.call_count), (401, 1))
+
+    def test_refresh_once(self):
+        # после обновления снова 401 - второй раз не обновляем
+        with mock.patch.object(Transport, 'OFFLINE', False), \
+                mock.patch.object(Transport, 'refresh_expired') as refresh:
+            result, session = self.send(401, 401)
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual((result.status_code, session.request.call_count), (401, 2))
+
+    def test_refresh_concurrent(self):
+        # одновременные 401 со старым токеном: токен обновляется один раз, все запросы повторяются с новым
+        threads = 8
+        all_sent = threading.Barrier(threads)
+        creds = Transport.creds()
+        refreshes = []
+
+        def refresh(request):
+            refreshes.append(request)
+            creds.token = 'fresh'
+            # как настоящий ответ Google: новый токен на час, фоновое обновление не сработает во время теста
+            creds.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+        def reply(method, url, headers=None, **kwargs):
+            if headers['Authorization'] == 'Bearer offline':
+                # все запросы ушли со старым токеном, прежде чем кто-то его обновил
+                all_sent.wait(5)
+                return response(401)
+            return response(200)
+
+        session = mock.Mock()
+        session.request.side_effect = reply
+        with mock.patch.dict(os.environ), \
+                mock.patch.object(Transport, 'OFFLINE', False), \
+                mock.patch.object(Transport, 'session', return_value=session), \
+                mock.patch.object(creds, 'refresh', side_effect=refresh):
+            self.addCleanup(setattr, Transport, '_creds', None)
+            self.addCleanup(lambda: Transport._refresh_timer and Transport._refresh_timer.cancel())
+            with ThreadPoolExecutor(threads) as executor:
+                # разные адреса: GET не склеиваются SingleFlight
+                statuses = list(executor.map(
+                    lambda index: Transport.get(f'{Transport.BASE_URL}/drive/v3/files/{index}').status_code,
+                    range(threads)))
+
+        self.assertEqual(statuses, [200] * threads)
+        self.assertEqual(len(refreshes), 1)
+        self.assertEqual(session.request.call_count, 2 * threads)
+
+    def test_local_drive(self):
+        result = Transport.get(f'{Transport.BASE_URL}/drive/v3/files/root', params={'fields': 'id'})
+        self.assertEqual(result.json(), {'id': LocalDrive.ROOT_ID})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+import offline_environment  # noqa: F401 (окружение до импорта модулей терминала)
+import os
+import unittest
+from unittest import mock
+
+import requests
+
+from LocalDrive import LocalDrive
+from Transport import Transport
+from UploadEngine import UploadEngine
+from UploadJournal import UploadJournal
+
+KIB = 1024
+CONTENT = os.urandom(1536 * KIB)
+
+
+def clear_journal():
+    for entry in UploadJournal.pending():
+        UploadJournal.remove(entry)
+
+
+class UploadJournalTest(unittest.TestCase):
+    """ UploadJournal: поиск незавершенной загрузки по отпечатку файла """
+
+    def setUp(self):
+        clear_journal()
+        self.path = offline_environment.local_file('journal.bin', CONTENT)
+        self.identity = UploadJournal.identity(self.path)
+
+    def tearDown(self):
+        clear_journal()
+
+    def test_identity(self):
+        self.assertEqual(self.identity['local_path'], os.path.abspath(self.path))
+        self.assertEqual(self.identity['size'], len(CONTENT))
+        self.assertEqual(UploadJournal.identity(self.path), self.identity)
+
+    def test_find(self):
+        self.assertIsNone(UploadJournal.find(self.identity, 'parent', 'journal.bin'))
+        entry = UploadJournal.start(self.identity, 'parent', 'journal.bin', None, 'session-1')
+        UploadJournal.update(entry, 256 * KIB)
+
+        found = UploadJournal.find(self.identity, 'parent', 'journal.bin')
+        self.assertEqual((found['session'], found['offset']), ('session-1', 256 * KIB))
+        # другое место или имя - другая загрузка
+        self.assertIsNone(UploadJournal.find(self.identity, 'other', 'journal.bin'))
+        self.assertIsNone(UploadJournal.find(self.identity, 'parent', 'renamed.bin'))
+
+        # новая сессия того же файла заменяет прежнюю
+        UploadJournal.start(self.identity, 'parent', 'journal.bin', None, 'session-2')
+        found = UploadJournal.find(self.identity, 'parent', 'journal.bin')
+        self.assertEqual((found['session'], found['offset']), ('session-2', 0))
+
+        UploadJournal.remove(found)
+        self.assertIsNone(UploadJournal.find(self.identity, 'parent', 'journal.bin'))
+
+    def test_changed_file(self):
+        UploadJournal.start(self.identity, 'parent', 'journal.bin', None, 'session')
+        # тот же размер и mtime, другие первые байты
+        changed = dict(self.identity, head='0' * 64)
+        self.assertIsNone(UploadJournal.find(changed, 'parent', 'journal.bin'))
+        # запись изменившегося файла удалена
+        self.assertIsNone(UploadJournal.find(self.identity, 'parent', 'journal.bin'))
+
+        UploadJournal.start(self.identity, 'parent', 'journal.bin', None, 'session')
+        offline_environment.local_file('journal.bin', CONTENT + b'!')
+        self.assertIsNone(UploadJournal.find(UploadJournal.identity(self.path), 'parent', 'journal.bin'))
+        self.assertEqual(UploadJournal.pending(), [])
+
+    def test_pending(self):
+        other = offline_environment.local_file('other.bin', b'other')
+        UploadJournal.start(self.identity, 'parent', 'first.bin', None, 'session-1')
+        UploadJournal.start(UploadJournal.identity(other), 'parent', 'other.bin', None, 'session-2')
+        UploadJournal.start(self.identity, 'parent', 'second.bin', None, 'session-3')
+
+        self.assertEqual([entry['session'] for entry in UploadJournal.pending()],
+                         ['session-1', 'session-2', 'session-3'])
+        self.assertEqual([entry['session'] for entry in UploadJournal.pending(self.path)],
+                         ['session-1', 'session-3'])
+
+    def test_chunk_size(self):
+        self.assertIsNone(UploadJournal.chunk_size('test network'))
+        UploadJournal.remember_chunk_size('test network', 8 * 256 * KIB, 1e6)
+        UploadJournal.remember_chunk_size('test network', 4 * 256 * KIB, 2e6)
+        self.assertEqual(UploadJournal.chunk_size('test network'), 4 * 256 * KIB)
+
+
+class ResumeLocalDriveTest(unittest.TestCase):
+    """ UploadEngine.resumable на LocalDrive: продолжение с подтвержденного сервером места """
+
+    def setUp(self):
+        clear_journal()
+        # куски по 256 КиБ, сколько бы ни запомнили для этой сети другие загрузки
+        patcher = mock.patch.object(UploadJournal, 'chunk_size', return_value=256 * KIB)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path = offline_environment.local_file('resume.bin', CONTENT)
+        self.identity = UploadJournal.identity(self.path)
+
+    def tearDown(self):
+        clear_journal()
+
+    def start_session(self, name):
+        response = Transport.post(f'{UploadEngine.UPLOAD_URL}?uploadType=resumable',
+                                  json={'name': name, 'parents': [LocalDrive.ROOT_ID]},
+                                  headers={'X-Upload-Content-Length': str(len(CONTENT))})
+        return response.headers['Location']
+
+    def upload(self, name):
+        """ resumable с записью Content-Range всех PUT """
+        ranges = []
+        put = Transport.put
+
+        def record(url, headers=None, **kwargs):
+            ranges.append(headers['Content-Range'])
+            return put(url, headers=headers, **kwargs)
+
+        with mock.patch.object(Transport, 'put', side_effect=record):
+            result = UploadEngine.resumable(LocalDrive.ROOT_ID, self.identity, name, quiet=True)
+        return result, ranges
+
+    def uploaded(self, result):
+        return offline_environment.local_drive.drive.contents[result['id']]
+
+    def test_resume(self):
+        session = self.start_session('resume.bin')
+        # первый кусок принят сервером, но процесс упал до записи смещения в журнал
+        Transport.put(session, headers={'Content-Range': f'bytes 0-{512 * KIB - 1}/{len(CONTENT)}'},
+                      data=CONTENT[:512 * KIB])
+        UploadJournal.start(self.identity, LocalDrive.ROOT_ID, 'resume.bin', None, session)
+
+        result, ranges = self.upload('resume.bin')
+        self.assertEqual(self.uploaded(result), CONTENT)
+        # смещение берется у сервера, данные с нуля не отправляются
+        self.assertEqual(ranges[0], f'bytes */{len(CONTENT)}')
+        self.assertTrue(ranges[1].startswith(f'bytes {512 * KIB}-'), ranges)
+        self.assertEqual(UploadJournal.pending(), [])
+
+    def test_finished_session(self):
+        # сервер принял все, но ответ о завершении потерялся
+        session = self.start_session('finished.bin')
+        Transport.put(session, headers={'Content-Range': f'bytes 0-{len(CONTENT) - 1}/{len(CONTENT)}'}, data=CONTENT)
+        UploadJournal.start(self.identity, LocalDrive.ROOT_ID, 'finished.bin', None, session)
+
+        result, ranges = self.upload('finished.bin')
+        self.assertEqual(self.uploaded(result), CONTENT)
+        self.assertTrue(all(value.startswith('bytes */') for value in ranges), ranges)
+        self.assertEqual(UploadJournal.pending(), [])
+
+    def test_expired_session(self):
+        UploadJournal.start(self.identity, LocalDrive.ROOT_ID, 'expired.bin', None,
+                            f'{UploadEngine.UPLOAD_URL}?uploadType=resumable&upload_id=missing')
+
+        result, ranges = self.upload('expired.bin')
+        self.assertEqual(self.uploaded(result), CONTENT)
+        self.assertTrue(ranges[1].startswith('bytes 0-'), ranges)
+        self.assertEqual(UploadJournal.pending(), [])
+
+    def test_interrupted(self):
+        # процесс упал после первого куска: в журнале остается сессия с подтвержденным смещением
+        put = Transport.put
+        calls = []
+
+        def fail_after_first(url, **kwargs):
+            calls.append(kwargs['headers']['Content-Range'])
+            if len(calls) > 1:
+                raise ConnectionError('terminal crashed')
+            return put(url, **kwargs)
+
+        with mock.patch.object(Transport, 'put', side_effect=fail_after_first), \
+                mock.patch('UploadEngine.UserInterface.show_error'):
+            with self.assertRaises(ConnectionError):
+                UploadEngine.resumable(LocalDrive.ROOT_ID, self.identity, 'interrupted.bin', quiet=True)
+
+        entry, = UploadJournal.pending(self.path)
+        self.assertGreater(entry['offset'], 0)
+
+        result, ranges = self.upload('interrupted.bin')
+        self.assertEqual(self.uploaded(result), CONTENT)
+        self.assertTrue(ranges[1].startswith(f"bytes {entry['offset']}-"), ranges)
+
+    def stalled(self, name, range_header):
+        """ resumable, на каждый PUT которого сервер отвечает 308 с одним и тем же Range (или без него) """
+        calls = []
+
+        def reply(url, headers=None, **kwargs):
+            calls.append(headers['Content-Range'])
+            response = requests.Response()
+            response.status_code = 308
+            if range_header:
+                response.headers['Range'] = range_header
+            return response
+
+        with mock.patch.object(Transport, 'put', side_effect=reply), \
+                mock.patch('UploadEngine.UserInterface.show_error') as show_error:
+            result = UploadEngine.resumable(LocalDrive.ROOT_ID, self.identity, name, quiet=True)
+        self.assertIsNone(result)
+        show_error.assert_called_once()
+        return calls
+
+    def test_no_progress(self):
+        # 308 без Range или с прежним Range - сбой, после UPLOAD_RECOVERIES загрузка останавливается
+        for range_header in (None, f'bytes=0-{256 * KIB - 1}'):
+            clear_journal()
+            calls = self.stalled('stalled.bin', range_header)
+            self.assertLess(len(calls), 3 * (UploadEngine.UPLOAD_RECOVERIES + 2), calls)
+            entry, = UploadJournal.pending(self.path)
+            self.assertLessEqual(entry['offset'], 256 * KIB)
+
+    def test_no_progress_at_end(self):
+        # все байты приняты, но запрос состояния все время отвечает 308 вместо завершения
+        calls = self.stalled('stalled-end.bin', f'bytes=0-{len(CONTENT) - 1}')
+        self.assertEqual(calls[0], f'bytes 0-{256 * KIB - 1}/{len(CONTENT)}')
+        self.assertEqual(calls[1:], [f'bytes */{len(CONTENT)}'] * (UploadEngine.UPLOAD_RECOVERIES + 1))
+        self.assertEqual(UploadJournal.pending(self.path)[0]['offset'], len(CONTENT))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import asyncio
+import threading
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+from google.auth.exceptions import GoogleAuthError
+from Concurrency import Concurrency
+from RateLimiter import RateLimiter
+from RetryPolicy import RetryPolicy
+from SingleFlight import SingleFlight
+from Transport import Transport
+
+
+class AsyncResponse:
+    """ Прочитанный ответ aiohttp, повторяет нужную часть интерфейса requests.Response """
+    def __init__(self, status_code, content, headers):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content) if self.content else {}
+
+
+class AsyncDrive:
+    """
+    Асинхронный клиент Drive API v3 на aiohttp (необязательная зависимость, см. available()),
+    которым sync скачивает файлы ветки.
+
+    Все корутины выполняются в одном фоновом потоке со своим циклом событий,
+    синхронные команды вызывают их через мост run(). Каждая попытка запроса занимает слот
+    общего регулятора Concurrency, так что одновременно в полете столько запросов, сколько он разрешает
+    (вместе с задачами WorkerPool других команд), но не больше LIMIT соединений
+    (GOOGLE_CLOUD_ASYNC_LIMIT, по умолчанию 100) - и все на одном потоке вместо потока на запрос.
+
+    Запросы идут по тем же правилам, что и через Transport: общий объект Credentials
+    (обновление и повтор на 401), RateLimiter, RetryPolicy и отчет регулятору Concurrency.
+    Ответы - AsyncResponse, проверять их нужно так же, как ответы Transport.
+    Одинаковые одновременные GET склеиваются через SingleFlight.
+    """
+    URL = f'{Transport.BASE_URL}/drive/v3/files'
+    LIMIT = int(os.getenv("GOOGLE_CLOUD_ASYNC_LIMIT", "100"))
+    CHUNK_SIZE = 64 * 1024
+    # слот может освободить и поток WorkerPool, о котором цикл событий не узнает: ждущие проверяют и по таймеру
+    SLOT_POLL = 0.05
+
+    _loop = None
+    _session = None
+    _lock = threading.Lock()
+    _in_flight = 0
+    _released = None
+
+    @staticmethod
+    def available():
+        """ Установлен ли aiohttp """
+        return aiohttp is not None
+
+    @staticmethod
+    def in_flight():
+        """ Сколько запросов сейчас в сети (для строки прогресса) """
+        return AsyncDrive._in_flight
+
+    @staticmethod
+    def run(coroutine):
+        """
+        Мост для синхронного кода: выполняет корутину в цикле событий клиента и ждет результат.
+        Не вызывается из задачи WorkerPool: слот задачи не дал бы запросам корутины занять свои.
+
+        Args:
+            coroutine: Корутина AsyncDrive (или собранная из них).
+
+        Returns:
+            Результат корутины (исключение пробрасывается).
+        """
+        with AsyncDrive._lock:
+            if AsyncDrive._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='AsyncDrive', daemon=True).start()
+                AsyncDrive._loop = loop
+        return asyncio.run_coroutine_threadsafe(coroutine, AsyncDrive._loop).result()
+
+    @staticmethod
+    def _get_session():
+        """ Общий aiohttp.ClientSession, создается в цикле событий клиента при первом запросе """
+        if AsyncDrive._session is None:
+            AsyncDrive._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=AsyncDrive.LIMIT),
+                # таймауты те же, что у Transport, и только на зависание: без total,
+                # иначе скачивание дольше 5 минут (умолчание aiohttp) обрывалось бы и начиналось заново
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=Transport.CONNECT_TIMEOUT,
+                                              sock_read=Transport.READ_TIMEOUT),
+                headers={
+                    'Accept-Encoding': 'gzip',
+                    'User-Agent': 'GoogleCloudTerminal (gzip)',
+                },
+            )
+        return AsyncDrive._session
+
+    @staticmethod
+    async def _acquire():
+        """ Ждет слот Concurrency, не блокируя цикл событий """
+        while not Concurrency.try_acquire():
+            if AsyncDrive._released is None:
+                AsyncDrive._released = asyncio.Event()
+            AsyncDrive._released.clear()
+            try:
+                await asyncio.wait_for(AsyncDrive._released.wait(), AsyncDrive.SLOT_POLL)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _release():
+        Concurrency.release()
+        if AsyncDrive._released is not None:
+            AsyncDrive._released.set()
+
+    @staticmethod
+    async def request(method, url, headers=None, cost=1, sink=None, retry_network=None, **kwargs):
+        """
+        Выполняет авторизованный запрос.
+
+        Args:
+            method (str): HTTP метод.
+            url (str): Адрес запроса.
+            headers (dict, optional): Дополнительные заголовки, Authorization добавляется автоматически.
+            cost (int, optional): Сколько запросов к квоте Drive стоит вызов.
+            sink (str, optional): Локальный файл, в который потоком пишется тело успешного ответа
+                                  (скачивание без чтения файла в память).
+            retry_network (bool, optional): Повторять ли запрос после обрыва связи (по умолчанию - кроме POST).
+            **kwargs: Остальные аргументы aiohttp (params, json, data ...).
+
+        Returns:
+            AsyncResponse: Ответ сервера (при sink тело успешного ответа пустое).
+        """
+        if retry_network is None:
+            retry_network = method != 'POST'
+        if method == 'GET' and sink is None:
+            key = Transport.flight_key(method, url, headers, kwargs.get('params'))
+            return await SingleFlight.do_async(
+                key, lambda: AsyncDrive._request(method, url, headers, cost, sink, retry_network, **kwargs))
+        return await AsyncDrive._request(method, url, headers, cost, sink, retry_network, **kwargs)
+
+    @staticmethod
+    async def _request(method, url, headers, cost, sink, retry_network, **kwargs):
+        """ Сам запрос с RateLimiter, обновлением токена и повторами (см. request) """
+        headers = dict(headers) if headers else {}
+        policy = RetryPolicy(retry_network)
+        refreshed = False
+        session = AsyncDrive._get_session()
+
+        while True:
+            wait = RateLimiter.reserve(cost)
+            while wait:
+                await asyncio.sleep(wait)
+                wait = RateLimiter.reserve(cost)
+
+            if hasattr(kwargs.get('data'), 'seek'):
+                kwargs['data'].seek(0)
+
+            token = Transport.creds().token
+            headers['Authorization'] = f'Bearer {token}'
+
+            # слот держится только на время попытки, паузы перед повтором его не занимают
+            await AsyncDrive._acquire()
+            started = time.monotonic()
+            AsyncDrive._in_flight += 1
+            error = None
+            try:
+                async with session.request(method, url, headers=headers, **kwargs) as raw:
+                    if sink and raw.status == 200:
+                        # запись небольшими блоками, цикл событий между ними обслуживает другие запросы
+                        with open(sink, 'wb') as f:
+                            async for chunk in raw.content.iter_chunked(AsyncDrive.CHUNK_SIZE):
+                                f.write(chunk)
+                        content = b''
+                    else:
+                        content = await raw.read()
+                    response = AsyncResponse(raw.status, content, dict(raw.headers))
+            except RetryPolicy.NETWORK_ERRORS as e:
+                error = e
+            finally:
+                AsyncDrive._in_flight -= 1
+                AsyncDrive._release()
+
+            if error is not None:
+                Concurrency.observe(time.monotonic() - started, 'network')
+                error_class, delay = policy.should_retry(error=error)
+                if error_class is None:
+                    raise error
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code == 401 and not refreshed and Transport.can_refresh():
+                # обновление токена блокирующее, выносим его из цикла событий
+                refreshed = True
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, Transport.refresh_expired, token)
+                except GoogleAuthError:
+                    return response
+                continue
+
+            Concurrency.observe(time.monotonic() - started, RetryPolicy.classify(response=response))
+
+            error_class, delay = policy.should_retry(response=response)
+            if error_class is None:
+                return response
+
+            if error_class == 'rate_limit':
+                RateLimiter.penalize(delay)
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def download(file_id, local_path):
+        """ Скачивает содержимое файла потоком в local_path """
+        return await AsyncDrive.request('GET', f'{AsyncDrive.URL}/{file_id}', params={'alt': 'media'}, sink=local_path)
+
+    @staticmethod
+    async def gather(coroutines, progress=None):
+        """
+        Выполняет корутины параллельно, двигая progress по мере завершения.
+        Упавшая корутина не прерывает остальные.
+
+        Returns:
+            list: Результаты в порядке coroutines, на месте упавшей корутины - ее исключение.
+        """
+        async def tracked(coroutine):
+            try:
+                return await coroutine
+            finally:
+                if progress:
+                    progress.advance()
+
+        return await asyncio.gather(*(tracked(coroutine) for coroutine in coroutines), return_exceptions=True)
@@ -0,0 +1,198 @@
+import re
+import json
+import time
+import uuid
+from urllib.parse import urlsplit, urlencode
+from Concurrency import Concurrency
+from RateLimiter import RateLimiter
+from RetryPolicy import RetryPolicy
+from Transport import Transport
+from WorkerPool import WorkerPool
+
+
+class BatchResponse:
+    """ Ответ на одну часть пакетного запроса, повторяет нужную часть интерфейса requests.Response """
+    def __init__(self, status_code, text, headers=None):
+        self.status_code_response = status_code
+        self.text_response = text
+        self.headers = headers or {}
+
+    @property
+    def status_code(self):
+        return self.status_code_response
+
+    @property
+    def text(self):
+        return self.text_response
+
+    def json(self):
+        return json.loads(self.text_response) if self.text_response else {}
+
+
+class Batch:
+    """
+    Пакетное выполнение запросов к Drive API.
+
+    До MAX_CALLS вызовов упаковываются в один multipart/mixed POST на /batch/drive/v3,
+    ответ разбирается по частям (Content-ID), а повторно отправляются только части,
+    завершившиеся временной ошибкой (429, 5xx, превышение лимита) - по RetryPolicy, у каждой части свой бюджет.
+    Вызов - словарь {'method': ..., 'url': ..., 'params': ..., 'json': ...},
+    url - полный адрес Drive API, как и для Transport.
+    """
+    URL = f'{Transport.BASE_URL}/batch/drive/v3'
+    MAX_CALLS = 100
+
+    @staticmethod
+    def _encode_part(index, call):
+        """ Одна часть multipart/mixed: вложенный HTTP запрос с путем относительно хоста """
+        parts = urlsplit(call['url'])
+        path = parts.path
+        query = parts.query
+        if call.get('params'):
+            query = '&'.join(q for q in (query, urlencode(call['params'])) if q)
+        if query:
+            path = f'{path}?{query}'
+
+        lines = [
+            'Content-Type: application/http',
+            f'Content-ID: <item-{index}>',
+            '',
+            f"{call['method']} {path} HTTP/1.1",
+        ]
+        if call.get('json') is not None:
+            lines += ['Content-Type: application/json; charset=UTF-8', '', json.dumps(call['json'])]
+        else:
+            lines += ['']
+        return '\r\n'.join(lines)
+
+    @staticmethod
+    def _parse(response):
+        """
+        Разбирает multipart/mixed ответ пакетного запроса.
+
+        Returns:
+            dict: номер вызова -> BatchResponse.
+        """
+        # граница может быть в кавычках, а за ней могут идти другие параметры (; charset=...)
+        match = re.search(r'boundary="?([^";]+)"?', response.headers.get('Content-Type', ''))
+        if not match:
+            return {}
+        boundary = match.group(1).strip()
+
+        results = {}
+        for part in response.content.decode('utf-8').split(f'--{boundary}'):
+            part = part.strip('\r\n')
+            if not part or part == '--':
+                continue
+
+            outer_headers, _, http = part.replace('\r\n', '\n').partition('\n\n')
+
+            index = None
+            for line in outer_headers.split('\n'):
+                name, _, value = line.partition(':')
+                if name.strip().lower() == 'content-id':
+                    index = int(value.strip().strip('<>').rsplit('-', 1)[-1])
+            if index is None:
+                continue
+
+            head, _, body = http.partition('\n\n')
+            head_lines = head.split('\n')
+            status_code = int(head_lines[0].split()[1])
+            headers = {}
+            for line in head_lines[1:]:
+                name, _, value = line.partition(':')
+                headers[name.strip()] = value.strip()
+
+            results[index] = BatchResponse(status_code, body.strip(), headers)
+        return results
+
+    @staticmethod
+    def _send(calls):
+        """ Один пакетный запрос. Returns: dict номер -> BatchResponse (для вызовов из calls) """
+        boundary = f'batch_{uuid.uuid4().hex}'
+        body = ''.join(f'--{boundary}\r\n{Batch._encode_part(index, call)}\r\n'
+                       for index, call in calls.items()) + f'--{boundary}--\r\n'
+
+        response = Transport.post(
+            Batch.URL,
+            headers={'Content-Type': f'multipart/mixed; boundary={boundary}'},
+            data=body.encode('utf-8'),
+            cost=len(calls),
+            # пакет без создающих вызовов можно безопасно отправить еще раз после обрыва
+            retry_network=all(call['method'] != 'POST' for call in calls.values())
+        )
+
+        if response.status_code != 200:
+            # пакет не принят целиком: результат каждой части - ответ на весь пакет
+            failed = BatchResponse(response.status_code, response.text)
+            return {index: failed for index in calls}
+
+        results = Batch._parse(response)
+        for index in calls:
+            if index not in results:
+                results[index] = BatchResponse(500, 'Missing part in batch response')
+        return results
+
+    @staticmethod
+    def _execute_chunk(calls, start):
+        """
+        Выполняет до MAX_CALLS вызовов одним пакетом, повторяя только временно упавшие части.
+
+        Returns:
+            list: Ответы для calls[start:start + MAX_CALLS].
+        """
+        pending = {index: calls[index] for index in range(start, min(start + Batch.MAX_CALLS, len(calls)))}
+        policies = {index: RetryPolicy() for index in pending}
+        results = {}
+
+        while pending:
+            for index, response in Batch._send(pending).items():
+                results[index] = response
+
+            retry = {}
+            delay = 0
+            for index, call in pending.items():
+                error_class, part_delay = policies[index].should_retry(response=results[index])
+                if error_class is None:
+                    continue
+                retry[index] = call
+                delay = max(delay, part_delay)
+                if error_class == 'rate_limit':
+                    RateLimiter.penalize(part_delay)
+                    Concurrency.throttled()
+
+            pending = retry
+            if pending:
+                time.sleep(delay)
+
+        return [results[index] for index in sorted(results)]
+
+    @staticmethod
+    def execute(calls, progress=None):
+        """
+        Выполняет вызовы пакетами по MAX_CALLS, пакеты идут параллельно через WorkerPool.
+
+        Args:
+            calls (list): Вызовы {'method', 'url', 'params', 'json'}.
+            progress (Progress, optional): Строка прогресса команды, двигается на число выполненных вызовов.
+
+        Returns:
+            list: Ответы в том же порядке, что и calls
+                  (requests.Response для одиночного вызова или BatchResponse).
+        """
+        if not calls:
+            return []
+
+        # ради одного вызова пакет не нужен
+        if len(calls) == 1:
+            call = calls[0]
+            response = Transport.request(call['method'], call['url'],
+                                         params=call.get('params'), json=call.get('json'))
+            if progress:
+                progress.advance()
+            return [response]
+
+        starts = range(0, len(calls), Batch.MAX_CALLS)
+        chunks = WorkerPool.map(lambda start: Batch._execute_chunk(calls, start), starts, progress=progress,
+                                weight=lambda start: min(Batch.MAX_CALLS, len(calls) - start))
+        return [response for chunk in chunks for response in chunk]
@@ -0,0 +1,114 @@
+import os
+import socket
+from urllib.parse import urlsplit
+from Transport import Transport
+from UploadJournal import UploadJournal
+
+
+class ChunkSizer:
+    """
+    Размер куска resumable-загрузки, подстраиваемый под канал (создается на каждую загрузку).
+
+    Время куска ~ RTT + размер / полоса. Каждый принятый кусок дает оценку полосы
+    (EWMA, RTT берется из запроса без тела - старта сессии или запроса ее состояния).
+    Следующий кусок выбирается так, чтобы на RTT уходило не больше OVERHEAD времени куска,
+    но кусок шел не дольше MAX_SECONDS (обрыв теряет не больше куска). За шаг размер меняется
+    не больше чем вдвое, сбой куска уменьшает его вдвое. Размер всегда кратен 256 КиБ, как требует Drive.
+
+    Лучший размер (с наибольшей измеренной скоростью) запоминается для сети, через которую идет загрузка,
+    и следующая загрузка в той же сети начинается с него.
+    """
+    GRANULARITY = 256 * 1024
+    MIN_SIZE = GRANULARITY
+    MAX_SIZE = int(os.getenv("GOOGLE_CLOUD_MAX_CHUNK_MB", "256")) * 1024 * 1024
+    OVERHEAD = 0.1
+    MAX_SECONDS = 30
+    # RTT не меньше: на локальной сети задержку дает сам сервер, а не провод
+    MIN_RTT = 0.02
+    ALPHA = 0.5
+
+    def __init__(self, file_size, rtt):
+        """
+        Args:
+            file_size (int): Размер загружаемого файла.
+            rtt (float): Время запроса без тела к серверу загрузки, секунды.
+        """
+        self.rtt = max(rtt, ChunkSizer.MIN_RTT)
+        self.network = ChunkSizer.network()
+        remembered = UploadJournal.chunk_size(self.network)
+        self.size = ChunkSizer._round(remembered or ChunkSizer.initial(file_size))
+        self.bandwidth = None
+        self.best_size = None
+        self.best_throughput = 0
+
+    @staticmethod
+    def initial(file_size):
+        """ Начальный размер, пока для сети ничего не известно: по размеру файла """
+        if file_size <= 50 * 1024 * 1024:  # ≤ 50 MB
+            return 1 * 1024 * 1024  # 1 MB
+        elif file_size <= 200 * 1024 * 1024:  # > 50 MB and ≤ 200 MB
+            return 5 * 1024 * 1024  # 5 MB
+        elif file_size <= 1 * 1024 * 1024 * 1024:  # > 200 MB and ≤ 1 GB
+            return 10 * 1024 * 1024  # 10 MB
+        else:  # > 1 GB
+            return 20 * 1024 * 1024  # 20 MB
+
+    @staticmethod
+    def network():
+        """
+        Ключ сети: адрес API и локальный адрес, с которого к нему идут пакеты
+        (разный дома, в офисе и через VPN). UDP connect пакетов не отправляет.
+        """
+        host = urlsplit(Transport.BASE_URL).hostname or ''
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+                probe.connect((host, 443))
+                local = probe.getsockname()[0]
+        except OSError:
+            local = 'unknown'
+        return f'{host} via {local}'
+
+    @staticmethod
+    def _round(size):
+        """ Ближайшее кратное 256 КиБ в пределах MIN_SIZE..MAX_SIZE """
+        size = round(size / ChunkSizer.GRANULARITY) * ChunkSizer.GRANULARITY
+        return max(ChunkSizer.MIN_SIZE, min(ChunkSizer.MAX_SIZE, size))
+
+    def record(self, sent, seconds):
+        """
+        Учитывает принятый кусок и выбирает размер следующего.
+
+        Args:
+            sent (int): Сколько байт куска подтвердил сервер.
+            seconds (float): Время запроса.
+        """
+        if sent < self.size:
+            # последний (короткий) кусок или частичный прием: для оценки полосы не годится
+            return
+
+        throughput = sent / seconds
+        if throughput > self.best_throughput:
+            self.best_throughput = throughput
+            self.best_size = self.size
+
+        transfer = seconds - self.rtt
+        if transfer <= 0:
+            # кусок целиком ушел в задержку: полосу не оценить, но кусок явно мал
+            target = self.size * 2
+        else:
+            bandwidth = sent / transfer
+            self.bandwidth = bandwidth if self.bandwidth is None else \
+                ChunkSizer.ALPHA * bandwidth + (1 - ChunkSizer.ALPHA) * self.bandwidth
+            target = min(self.bandwidth * self.rtt * (1 - ChunkSizer.OVERHEAD) / ChunkSizer.OVERHEAD,
+                         self.bandwidth * ChunkSizer.MAX_SECONDS)
+
+        self.size = ChunkSizer._round(max(self.size / 2, min(self.size * 2, target)))
+
+    def failed(self):
+        """ Кусок не принят: следующий вдвое меньше """
+        self.size = ChunkSizer._round(self.size / 2)
+
+    def save(self):
+        """ Запоминает лучший размер для этой сети """
+        if self.best_size:
+            UploadJournal.remember_chunk_size(self.network, self.best_size, self.best_throughput)
@@ -48,6 +48,7 @@ class CommandParser:
             'upload': CommandParser.parse_args_upload,
             "sync": CommandParser.parse_args_sync,
             'refresh_completer': CommandParser.parse_args_refresh_completer,
+            'cache': CommandParser.parse_args_cache,
         }
 
         try:
@@ -573,13 +574,18 @@ class CommandParser:
     @staticmethod
     def parse_args_upload(args):
         parser = argparse.ArgumentParser(description="Upload a file to Google Drive.")
-        parser.add_argument('local_path', type=str, help="Local path to the file to upload.")
-        parser.add_argument('path', type=str, default="./", help="Path in Google Drive where to upload.")
+        parser.add_argument('local_path', type=str, nargs='?', default=None, help="Local path to the file to upload.")
+        parser.add_argument('path', type=str, nargs='?', default="./", help="Path in Google Drive where to upload.")
         parser.add_argument('--name', type=str, default=None, help="Optional name for the uploaded file.")
         parser.add_argument('--mimeType', type=str, default=None, help="Optional MIME type of the uploaded file. Or you can just specify the file extension in the name. ")
         parser.add_argument('--uploadType', type=str, choices=['SimpleUpload', 'MultipartUpload', 'ResumableUpload'],
-                            default='SimpleUpload',
-                            help="Type of upload method (SimpleUpload, MultipartUpload, ResumableUpload). Default is SimpleUpload")
+                            default=None,
+                            help="Type of upload method (SimpleUpload, MultipartUpload, ResumableUpload). "
+                                 "By default it is chosen by file size: empty files - SimpleUpload, "
+                                 "up to 5 MB - MultipartUpload, larger - ResumableUpload")
+        parser.add_argument('--resume', action='store_true',
+                            help="Continue interrupted resumable uploads (all of them, or only local_path if given).")
+        parser.add_argument('--pending', action='store_true', help="List interrupted resumable uploads.")
 
         try:
             # Проверка на наличие --help или -h
@@ -643,3 +649,25 @@ class CommandParser:
             # Перехват ArgumentError для обработки ошибок неправильных аргументов
             UserInterface.show_error(e)
             return None
+
+    @staticmethod
+    def parse_args_cache(args):
+        parser = argparse.ArgumentParser(description="Statistics of the path cache (hits, misses, size). ")
+        parser.add_argument('-c', '--clear', action='store_true', help='Drop all cached paths. ')
+
+        try:
+            # Проверка на наличие --help или -h
+            if '--help' in args or '-h' in args:
+                parser.print_help()
+                return "help"
+
+            return parser.parse_args(args)
+        except SystemExit:
+            # Перехват SystemExit для предотвращения завершения программы
+            # При вызове --help или -h, класс parser вызывает это исключение
+            pass
+
+        except argparse.ArgumentError as e:
+            # Перехват ArgumentError для обработки ошибок неправильных аргументов
+            UserInterface.show_error(e)
+            return None
@@ -0,0 +1,144 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+
+class Concurrency:
+    """
+    Общий для всех команд регулятор параллельности (AIMD).
+
+    Массовые операции (cp -r, rm -r, sync, загрузка папок) выполняют задачи в WorkerPool,
+    и каждая задача занимает слот; запрос AsyncDrive тоже занимает слот на время попытки. Число слотов (limit) одно на весь процесс, поэтому две массовые
+    операции, идущие одновременно, делят его между собой, а не удваивают нагрузку на квоту.
+
+    Transport сообщает о каждом ответе (observe):
+        пока задержка не выше LATENCY_FACTOR от лучшей наблюдаемой, а доля ошибок ниже ERROR_THRESHOLD,
+        limit растет на 1 после каждых limit успешных ответов (аддитивный рост);
+        на превышение лимита Drive (429, rateLimitExceeded) limit уменьшается вдвое,
+        но не чаще раза в DECREASE_INTERVAL секунд - один всплеск ошибок дает одно уменьшение.
+    Растет limit только когда все слоты заняты, иначе он ушел бы вверх на одиночных командах.
+    Верхняя граница - GOOGLE_CLOUD_MAX_CONCURRENCY (по умолчанию размер пула соединений).
+    """
+    MIN_LIMIT = 1
+    MAX_LIMIT = int(os.getenv("GOOGLE_CLOUD_MAX_CONCURRENCY", os.getenv("GOOGLE_CLOUD_POOL_SIZE", "16")))
+    INITIAL_LIMIT = min(4, MAX_LIMIT)
+    LATENCY_FACTOR = 2.0
+    ERROR_THRESHOLD = 0.05
+    DECREASE_INTERVAL = 1.0
+    # вес нового наблюдения в скользящих средних
+    ALPHA = 0.2
+
+    _limit = INITIAL_LIMIT
+    _in_flight = 0
+    _successes = 0
+    _latency = None
+    _baseline = None
+    _error_rate = 0.0
+    _last_decrease = 0.0
+    _condition = threading.Condition()
+    # поток, уже занявший слот, не ждет второй (вложенный WorkerPool иначе зависнет)
+    _local = threading.local()
+
+    @staticmethod
+    def limit():
+        """ Текущее допустимое число параллельных задач """
+        return Concurrency._limit
+
+    @staticmethod
+    @contextmanager
+    def slot():
+        """ Занимает слот на время задачи, ждет, если заняты все limit слотов """
+        if getattr(Concurrency._local, 'held', False):
+            yield
+            return
+
+        with Concurrency._condition:
+            while Concurrency._in_flight >= Concurrency._limit:
+                Concurrency._condition.wait()
+            Concurrency._in_flight += 1
+        Concurrency._local.held = True
+        try:
+            yield
+        finally:
+            Concurrency._local.held = False
+            Concurrency.release()
+
+    @staticmethod
+    def try_acquire():
+        """
+        Занимает слот без ожидания (для AsyncDrive: блокировать его цикл событий нельзя).
+
+        Returns:
+            bool: Занят ли слот. Занятый слот освобождается release().
+        """
+        with Concurrency._condition:
+            if Concurrency._in_flight >= Concurrency._limit:
+                return False
+            Concurrency._in_flight += 1
+            return True
+
+    @staticmethod
+    def release():
+        """ Освобождает слот """
+        with Concurrency._condition:
+            Concurrency._in_flight -= 1
+            Concurrency._condition.notify()
+
+    @staticmethod
+    def in_slot():
+        """ Выполняется ли текущий поток внутри задачи WorkerPool """
+        return getattr(Concurrency._local, 'held', False)
+
+    @staticmethod
+    def observe(latency, error_class=None):
+        """
+        Учитывает результат одного запроса к Drive.
+
+        Args:
+            latency (float): Время запроса в секундах (без ожидания RateLimiter и пауз перед повтором).
+            error_class (str): Класс ошибки из RetryPolicy или None для успешного ответа.
+        """
+        if error_class == 'rate_limit':
+            Concurrency.throttled()
+            return
+
+        with Concurrency._condition:
+            alpha = Concurrency.ALPHA
+            Concurrency._error_rate = (1 - alpha) * Concurrency._error_rate + alpha * (error_class is not None)
+            if error_class is not None:
+                return
+
+            if Concurrency._latency is None:
+                Concurrency._latency = latency
+            else:
+                Concurrency._latency = (1 - alpha) * Concurrency._latency + alpha * latency
+
+            # база - лучшая наблюдаемая задержка, медленно подтягивается к текущей (сеть могла смениться)
+            if Concurrency._baseline is None or Concurrency._latency < Concurrency._baseline:
+                Concurrency._baseline = Concurrency._latency
+            else:
+                Concurrency._baseline += (Concurrency._latency - Concurrency._baseline) * 0.01
+
+            healthy = (Concurrency._latency <= Concurrency.LATENCY_FACTOR * Concurrency._baseline
+                       and Concurrency._error_rate < Concurrency.ERROR_THRESHOLD)
+            if not healthy or Concurrency._in_flight < Concurrency._limit:
+                Concurrency._successes = 0
+                return
+
+            Concurrency._successes += 1
+            if Concurrency._successes >= Concurrency._limit and Concurrency._limit < Concurrency.MAX_LIMIT:
+                Concurrency._limit += 1
+                Concurrency._successes = 0
+                Concurrency._condition.notify()
+
+    @staticmethod
+    def throttled():
+        """ Drive ответил превышением лимита: limit уменьшается вдвое """
+        with Concurrency._condition:
+            now = time.monotonic()
+            if now - Concurrency._last_decrease < Concurrency.DECREASE_INTERVAL:
+                return
+            Concurrency._last_decrease = now
+            Concurrency._limit = max(Concurrency.MIN_LIMIT, Concurrency._limit // 2)
+            Concurrency._successes = 0
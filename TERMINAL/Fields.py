@@ -0,0 +1,42 @@
+class Fields:
+    """
+    Реестр наборов полей (partial response, параметр fields) для запросов к Drive.
+
+    Каждая операция просит у Drive ровно те поля, которые использует:
+    pwd нужны только имя и родитель, проверке коллизий - только имена.
+    Чем уже набор, тем меньше ответ и быстрее разбор JSON на больших листингах.
+
+    file(operation) - набор для files.get / files.create / files.update и т.п.,
+    files(operation) - тот же набор для files.list, вместе с nextPageToken для постраничного обхода.
+    """
+    # все, что хранит MetadataIndex: ответы изменяющих запросов сразу записываются в индекс
+    INDEX = 'id, name, parents, mimeType, size, md5Checksum, modifiedTime, trashed'
+
+    SETS = {
+        'index': INDEX,
+        # метаданные файла целиком (get_file_metadata), при построенном индексе попадают в него
+        'metadata': INDEX,
+        # подъем по родителям: pwd, cd, ..
+        'parents': 'id, name, parents',
+        # поиск ребенка по имени при разборе пути
+        'ids': 'id',
+        # проверка коллизий имен (mkdir, touch, cp ...)
+        'names': 'name',
+        # дети папки и обход ветки без индекса (ls, tree, du, rm, cp -r)
+        'children': 'id, name, mimeType, parents, size',
+        # скачивание при sync: по размеру и md5 пропускаются уже совпадающие файлы
+        'sync': 'id, name, mimeType, parents, size, md5Checksum, modifiedTime',
+        'drive_id': 'id',
+        'quota': 'storageQuota',
+        'export_formats': 'exportFormats',
+    }
+
+    @staticmethod
+    def file(operation):
+        """ Поля одного файла для операции operation """
+        return Fields.SETS[operation]
+
+    @staticmethod
+    def files(operation):
+        """ Поля files.list для операции operation """
+        return f'nextPageToken, files({Fields.SETS[operation]})'
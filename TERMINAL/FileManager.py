@@ -1,10 +1,20 @@
+import hashlib
 import requests
 import re
 import os
-import json
-from google.oauth2.credentials import Credentials
+import time
+from AsyncDrive import AsyncDrive
+from Fields import Fields
+from PathCache import PathCache
 from PathNavigator import PathNavigator
+from FileManagerProxy import FileManagerProxy
+from Batch import Batch
+from MetadataIndex import MetadataIndex
+from Transport import Transport
+from UploadEngine import UploadEngine
+from UploadJournal import UploadJournal
 from UserInterface import UserInterface
+from WorkerPool import WorkerPool, Progress
 
 
 class BiDict:
@@ -137,12 +147,10 @@ class FileManager:
 
     Этот класс содержит все методы, которыми пользователь оперирует во время работы.
     """
-
     @staticmethod
     def _creds():
         """ Восстанваливаем объект после сериализаци """
-        return Credentials.from_authorized_user_info(
-            json.loads(os.getenv("GOOGLE_CLOUD_CREDS")))
+        return Transport.creds()
 
     @staticmethod
     def get_user_drive_id():
@@ -155,17 +163,16 @@ class FileManager:
             str: Идентификатор MyDrive.
         """
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json'
         }
 
-        url = 'https://www.googleapis.com/drive/v3/files/root'
+        url = f'{Transport.BASE_URL}/drive/v3/files/root'
         params = {
-            'fields': 'id'
+            'fields': Fields.file('drive_id')
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = Transport.get(url, headers=headers, params=params)
             response.raise_for_status()
 
             root_drive_id = response.json().get('id')
@@ -184,53 +191,33 @@ class FileManager:
         Функция для получения списка файлов Google Drive API v3.
 
         Args:
-            creds (Credentials): Учетные данные для аутентификации в Google API.
             called_directly (bool, optional): Флаг, указывающий, была ли функция вызвана напрямую пользователем.
                                              По умолчанию True.
 
         Returns:
-            list: Список файлов Google Drive.
-                  Возвращает None в случае ошибки.
+            generator: Ленивый список файлов Google Drive, страницы подгружаются по мере обхода.
+                       При прямом вызове файлы выводятся сразу по мере прихода страниц и ничего не возвращается.
         """
-        # Создаем заголовок с авторизационным токеном
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}'
-        }
-
-        # URL запроса для получения списка файлов Google Drive API v3
-        url = 'https://www.googleapis.com/drive/v3/files'
-
-        # Параметры запроса
-        params = {
-            "corpora": "user",
-            'fields': 'files(name, id, mimeType, parents, size)',
-        }
-
-        # Отправляем GET-запрос к API Google Drive
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()  # Вызываем исключение в случае ошибки HTTP
-
-            files = response.json().get('files', [])
-
-            if called_directly:
-                if not files:
-                    UserInterface.show_message('Your google drive is empty')
-                else:
-                    UserInterface.show_message('Files: ')
-                    for file in files:
-                        UserInterface.show_message(f'{file["name"]}:{file["id"]}')
+        files = FileManagerProxy.iter_list_of_files()
 
+        if not called_directly:
             return files
 
-        except requests.exceptions.RequestException as e:
-            UserInterface.show_error(f'Failed to retrieve files: {e}')
-            return None
+        empty = True
+        for file in files:
+            if empty:
+                UserInterface.show_message('Files: ')
+                empty = False
+            UserInterface.show_message(f'{file["name"]}:{file["id"]}')
+
+        if empty:
+            UserInterface.show_message('Your google drive is empty')
 
     @staticmethod
     def get_file_metadata(file_id):
         """
         Получение метаданных файла по его идентификатору.
+        Сначала смотрим в локальный индекс, в сеть идем только если файла там нет.
 
         Args:
             file_id: Идентификатор файла.
@@ -238,23 +225,7 @@ class FileManager:
         Returns:
             dict: Метаданные файла.
         """
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
-            'Content-Type': 'application/json'
-        }
-
-        url = f'https://www.googleapis.com/drive/v3/files/{file_id}'
-        params = {
-            'fields': 'name, id, parents, mimeType, size'
-        }
-
-        response = requests.get(url, headers=headers, params=params)
-
-        if response.status_code == 200:
-            return response.json()
-        else:
-            UserInterface.show_error(f'Failed to get file metadata. Status code: {response.status_code}')
-            return None
+        return FileManagerProxy.get_file_metadata(file_id)
 
     @staticmethod
     def find_file_by_id(files, file_id: str, mime_type: str = None):
@@ -309,6 +280,7 @@ class FileManager:
     def look_for_file(name: str = None, file_id: str = None, mime_type: str = None):
         """
         Функция для поиска файла на Google Диске по имени или идентификатору.
+        Если индекс построен, поиск идет по нему, без обхода диска.
 
         Args:
             name (str, optional): Имя файла для поиска. По умолчанию None.
@@ -317,30 +289,7 @@ class FileManager:
         Returns:
             str: Идентификатор или имя файла.
         """
-        files = FileManager.get_list_of_files(called_directly=False)
-
-        if file_id:
-            file_name = FileManager.find_file_by_id(files, file_id, mime_type)
-            if file_name:
-                return file_name
-            elif file_id == os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID"):
-                # Отмечаем, что дошли до корня
-                return None
-            else:
-                UserInterface.show_error(
-                    f'File with ID "{file_id}" not found.'
-                )
-                return None
-
-        if name:
-            file_id = FileManager.find_file_by_name(files, name, mime_type)
-            if file_id:
-                return file_id
-            else:
-                UserInterface.show_error(
-                    f'File with name "{name}" not found.'
-                )
-                return None
+        return FileManagerProxy.look_for_file(name=name, file_id=file_id, mime_type=mime_type)
 
     @staticmethod
     def format_size(size):
@@ -367,8 +316,6 @@ class FileManager:
         if pattern:
             import fnmatch
 
-        files = FileManager.get_list_of_files(called_directly=False)
-
         if path:
             path_parts_id = PathNavigator.validate_path(path=path, current_path=os.getenv("GOOGLE_CLOUD_CURRENT_PATH"))
         else:
@@ -379,6 +326,9 @@ class FileManager:
             stop_loading()
             return
 
+        # с индексом - из MetadataStore, без него Drive сам отбирает детей папки ('<id>' in parents)
+        files = PathNavigator.get_child_files(path_parts_id, with_trashed=True)
+
         for file in files:
             if 'parents' in file.keys() and file['parents'][0] == path_parts_id:
                 if show_long:
@@ -460,22 +410,19 @@ class FileManager:
 
         # Создаем заголовок с авторизационным токеном
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json',
         }
 
         # URL запроса для получения списка файлов Google Drive API v3
-        url = 'https://www.googleapis.com/drive/v3/files'
+        url = f'{Transport.BASE_URL}/drive/v3/files'
 
         # Проверяем есть ли в destination_id папки с таким же именем
-        lst = [child['name'] for child in PathNavigator.get_child_files(parents_id)]
+        lst = PathNavigator.get_child_names(parents_id)
 
-        while lst.count(name_path):
+        while name_path in lst:
 
             name_path = f"Copy of {name_path}"
 
-            lst = [child['name'] for child in PathNavigator.get_child_files(parents_id)]
-
         if called_directly:
             UserInterface.show_message(
                 f"Creating path: {path}, parents path id: {parents_id}"
@@ -487,9 +434,10 @@ class FileManager:
             'parents': [parents_id]
         }
 
-        response = requests.post(url, headers=headers, json=body)
+        response = Transport.post(url, headers=headers, json=body, params={'fields': MetadataIndex.FIELDS})
 
         if response.status_code == 200:
+            MetadataIndex.put(response.json())
             if called_directly:
                 UserInterface.show_success('Create folder complete')
             stop_loading()
@@ -522,11 +470,10 @@ class FileManager:
 
         # Метод для обновления временных меток файла в Google Drive
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json'
         }
 
-        url = f'https://www.googleapis.com/drive/v3/files/{file_id}'
+        url = f'{Transport.BASE_URL}/drive/v3/files/{file_id}'
 
         # Получаем текущее время в формате UTC без дробной части секунд
         modified_time = datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
@@ -535,9 +482,10 @@ class FileManager:
             'modifiedTime': modified_time
         }
 
-        response = requests.patch(url, headers=headers, json=body)
+        response = Transport.patch(url, headers=headers, json=body, params={'fields': MetadataIndex.FIELDS})
 
         if response.status_code == 200:
+            MetadataIndex.put(response.json())
             UserInterface.show_success("Update time complete!")
             return response.json()
         else:
@@ -593,23 +541,21 @@ class FileManager:
             UserInterface.show_error("Ur forgot give me name new filee")
 
         # Проверяем есть ли в destination_id папки с таким же именем
-        lst = [child['name'] for child in PathNavigator.get_child_files(parents_id)]
+        lst = PathNavigator.get_child_names(parents_id)
 
-        while lst.count(name_file):
+        while name_file in lst:
             UserInterface.show_message(
                 [{"text": f"Name: {name_file} is occupied. ", "color": "bright_yellow"}]
             )
             name_file = f"Copy of {name_file}"
             UserInterface.show_message(f"I'll try to create a file named '{name_file}'. ")
-            lst = [child['name'] for child in PathNavigator.get_child_files(parents_id)]
 
         # Метод для создания файла в Google Cloud
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json'
         }
 
-        url = f'https://www.googleapis.com/drive/v3/files'
+        url = f'{Transport.BASE_URL}/drive/v3/files'
 
         body = {
             "name": name_file,
@@ -619,9 +565,10 @@ class FileManager:
         if mimeType:
             body["mimeType"] = mimeType
 
-        response = requests.post(url, headers=headers, json=body)
+        response = Transport.post(url, headers=headers, json=body, params={'fields': MetadataIndex.FIELDS})
 
         if response.status_code == 200:
+            MetadataIndex.put(response.json())
             if verbose:
                 UserInterface.show_success(
                     f"Creating file complete! file: name <{response.json()['name']}>, id <{response.json()['id']}>"
@@ -676,10 +623,11 @@ class FileManager:
                 stop_loading()
                 return
         else:
+            # дальше прогресс показывает WorkerPool
+            stop_loading()
             if FileManager._copy_directory(file_source, destination_id):
                 UserInterface.show_success(f'Recursive files copied successfully to {destination}')
-                stop_loading()
-                return
+            return
 
     @staticmethod
     def _copy_folder(source, destination_id):
@@ -694,23 +642,20 @@ class FileManager:
         """
         # Создаем папку, так как нельз их копировать...
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json',
         }
 
         # URL запроса для получения списка файлов Google Drive API v3
-        url = 'https://www.googleapis.com/drive/v3/files'
+        url = f'{Transport.BASE_URL}/drive/v3/files'
 
         name_copy_folder = f"Copy of {source['name']}"
 
         # Проверяем есть ли в destination_id папки с таким же именем
-        lst = [child['name'] for child in PathNavigator.get_child_files(destination_id)]
+        lst = PathNavigator.get_child_names(destination_id)
 
-        while lst.count(name_copy_folder):
+        while name_copy_folder in lst:
             name_copy_folder = f"Copy of {name_copy_folder}"
 
-            lst = [child['name'] for child in PathNavigator.get_child_files(destination_id)]
-
         # Если имя отсавить без изменений то у нас появиться два одинковых пути
         body = {
             "name": name_copy_folder,
@@ -718,9 +663,10 @@ class FileManager:
             'parents': [destination_id]
         }
 
-        response = requests.post(url, headers=headers, json=body)
+        response = Transport.post(url, headers=headers, json=body, params={'fields': MetadataIndex.FIELDS})
 
         if response.status_code == 200:
+            MetadataIndex.put(response.json())
             return response.json()
         else:
             return None
@@ -737,15 +683,15 @@ class FileManager:
         """
         # Реализация копирования одного файла
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json',
         }
-        url = f'https://www.googleapis.com/drive/v3/files/{source["id"]}/copy'
+        url = f'{Transport.BASE_URL}/drive/v3/files/{source["id"]}/copy'
         body = {
             'parents': [destination_id]
         }
-        response = requests.post(url, headers=headers, json=body)
+        response = Transport.post(url, headers=headers, json=body, params={'fields': MetadataIndex.FIELDS})
         if response.status_code == 200:
+            MetadataIndex.put(response.json())
             return response.json()
         else:
             UserInterface.show_error(f"Error copying file: {response.status_code} - {response.text}")
@@ -757,37 +703,67 @@ class FileManager:
         Не подразумевает использованием напрямую пользователем
         Рекурсивно копирует файлы в директории source в destination.
 
+        Копии папок создаются по уровням: папки одного уровня с разными родителями - параллельно,
+        дети одного родителя - по очереди (иначе одинаковые имена не получат разные "Copy of").
+        Затем параллельно копируются все файлы. Параллельность регулирует WorkerPool.
+
         Args:
             source (dict): field объект google drive v3..
             destination_id (str): id папки куда надо скопировать. Определяется еще в cp
+
+        Returns:
+            bool: Скопировано ли все.
         """
-        destination_id = FileManager._copy_folder(source, destination_id)['id']
+        # Ветку фиксируем до копирования: копия может оказаться внутри самой ветки (cp -r a a/)
+        # folders - (папка, номер родителя в folders), files - (файл, номер папки в folders)
+        folders = [(source, None)]
+        files = []
+        # уровень -> номер родителя -> номера папок
+        levels = {}
+        stack = [0]
 
-        needed_copy = PathNavigator.gather_structure(source['id'])
+        for event, file in PathNavigator.walk_structure(source['id']):
 
-        iterator = iter(needed_copy)
+            if event == PathNavigator.ENTER:
+                folders.append((file, stack[-1]))
+                levels.setdefault(len(stack), {}).setdefault(stack[-1], []).append(len(folders) - 1)
+                stack.append(len(folders) - 1)
 
-        # использую стандартный итератор для фикса проблемы с извлечением следующего элемента при "?"
-        for file in iterator:
+            elif event == PathNavigator.LEAVE:
+                stack.pop()
 
-            if file == "!":
-                next_file = next(iterator, None)
-                if not next_file:
-                    break
-                elif next_file == "?":
-                    file = "?"
-                else:
-                    next_file = FileManager._copy_folder(next_file, destination_id)
-                    destination_id = next_file['id']
-                    continue
+            else:
+                files.append((file, stack[-1]))
 
-            if file == "?":
-                previous_file = FileManager.get_file_metadata(destination_id)
-                destination_id = previous_file['parents'][0]
+        copies = [None] * len(folders)
+        copies[0] = FileManager._copy_folder(source, destination_id)
+        if copies[0] is None:
+            UserInterface.show_error(f"Error copying folder: {source['name']}")
+            return False
 
-            if file != '!' and file != '?':
-                FileManager._copy_file(file, destination_id)
-        return True
+        def copy_children(parent):
+            if copies[parent] is None:
+                return
+            for index in levels[depth][parent]:
+                copies[index] = FileManager._copy_folder(folders[index][0], copies[parent]['id'])
+                if copies[index] is None:
+                    UserInterface.show_error(f"Error copying folder: {folders[index][0]['name']}")
+
+        def copy_file(item):
+            file, folder = item
+            if copies[folder] is not None:
+                return FileManager._copy_file(file, copies[folder]['id'])
+
+        progress = Progress('cp', len(folders) - 1 + len(files))
+        try:
+            for depth in sorted(levels):
+                WorkerPool.map(copy_children, levels[depth], progress=progress,
+                               weight=lambda parent: len(levels[depth][parent]))
+            copied = WorkerPool.map(copy_file, files, progress=progress)
+        finally:
+            progress.close()
+
+        return all(copies) and all(copied)
 
     @staticmethod
     def _remove_file(id_remove):
@@ -798,17 +774,16 @@ class FileManager:
         Args:
             id_remove (str): field объект google drive v3..
         """
-        if PathNavigator.get_child_files(id_remove):
+        if PathNavigator.get_child_files(id_remove, with_trashed=True):
             return ResponseTeg("Folder have child files", 403)
 
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}'
-        }
-
         # URL запроса для удаления файла Google Drive API v3
-        url = f'https://www.googleapis.com/drive/v3/files/{id_remove}'
+        url = f'{Transport.BASE_URL}/drive/v3/files/{id_remove}'
+
+        response = Transport.delete(url)
 
-        response = requests.delete(url, headers=headers)
+        if response.status_code == 204:
+            MetadataIndex.remove(id_remove)
 
         return response
 
@@ -817,25 +792,33 @@ class FileManager:
         """
         Рекурсивно удаляет файлы директорию.
 
+        Сначала обходится вся ветка (с выводом и подтверждениями), затем файлы удаляются пакетами (Batch)
+        по уровням, начиная с самого глубокого: папка удаляется только после своего содержимого.
+        Пакеты одного уровня отправляются параллельно (WorkerPool).
+        Если что-то внутри папки не удалено (отказ или ошибка), сама папка и ее предки не удаляются,
+        иначе Drive удалил бы оставшееся вместе с ними.
+
         Args:
-            remove_files_struct (list): Результат метода PathNavigator.gather_structure()
-                                            Список обьектов field Google Drive v3
-                                            Содержит всю ветку начиная с директории, которую нужно рекурсивно удалить
+            remove_files_struct (iterable): Результат метода PathNavigator.walk_structure()
+                                            События обхода ветки, начиная с директории, которую нужно рекурсивно удалить
                                             САМ КОРЕНЬ ВЕТКИ НЕ СОДЕРЖИТ
             verbose (bool): Выводить ли дополнительную информацию, о этапах рекусривного удаления файла.
             interactive (bool): Запрашивать согласие перед каждым удалением файла, в случае отказа, файл не будет удлён.
         """
-        remove_files_struct = iter(remove_files_struct[::-1])
-
-        for file_remove in remove_files_struct:
-            response = None
-
-            # пропускаем все сигналы ! и ?
-            while isinstance(file_remove, str):
-                file_remove = next(remove_files_struct, None)
-
-            if not file_remove:
-                break
+        # глубина -> [(файл, идентификатор родительской папки внутри ветки)]
+        levels = {}
+        # стек идентификаторов папок, внутри которых сейчас находимся
+        parents = []
+        # папки, которые удалять нельзя: в них что-то осталось
+        blocked = set()
+
+        for event, file_remove in remove_files_struct:
+            # папку удаляем только после ее содержимого
+            if event == PathNavigator.ENTER:
+                parents.append(file_remove['id'])
+                continue
+            if event == PathNavigator.LEAVE:
+                parents.pop()
 
             if verbose:
                 try:
@@ -850,17 +833,44 @@ class FileManager:
             if interactive:
                 if FileManager._confirm_action(file_remove['name']):
                     UserInterface.show_message("The action is confirmed. We continue the execution. ")
-                    response = FileManager._remove_file(file_remove['id'])
                 else:
                     UserInterface.show_message("The action has been canceled. ")
+                    blocked.update(parents)
                     continue
-            else:
-                response = FileManager._remove_file(file_remove['id'])
 
-            if response.status_code == 204:
-                UserInterface.show_success(f"{file_remove['name']} delete complete")
-            else:
-                UserInterface.show_error(f'error when deleting file: {response.status_code} - {response.text}')
+            levels.setdefault(len(parents), []).append((file_remove, parents[-1] if parents else None))
+
+        progress = Progress('rm', sum(len(level) for level in levels.values()))
+        try:
+            FileManager._remove_levels(levels, blocked, progress)
+        finally:
+            progress.close()
+
+    @staticmethod
+    def _remove_levels(levels, blocked, progress):
+        """ Удаляет собранные _recursive_remove_branch уровни, от самого глубокого """
+        for depth in sorted(levels, reverse=True):
+            to_remove = []
+            for file_remove, parent_id in levels[depth]:
+                if file_remove['id'] in blocked:
+                    UserInterface.show_error(f"error when deleting file: {file_remove['name']} have child files")
+                    blocked.add(parent_id)
+                else:
+                    to_remove.append((file_remove, parent_id))
+
+            progress.advance(len(levels[depth]) - len(to_remove))
+            responses = Batch.execute([
+                {'method': 'DELETE', 'url': f"{Transport.BASE_URL}/drive/v3/files/{file_remove['id']}"}
+                for file_remove, _ in to_remove
+            ], progress=progress)
+
+            for (file_remove, parent_id), response in zip(to_remove, responses):
+                if response.status_code == 204:
+                    MetadataIndex.remove(file_remove['id'])
+                    UserInterface.show_success(f"{file_remove['name']} delete complete")
+                else:
+                    blocked.add(parent_id)
+                    UserInterface.show_error(f'error when deleting file: {response.status_code} - {response.text}')
 
     @staticmethod
     def _confirm_action(name_file):
@@ -908,7 +918,10 @@ class FileManager:
         else:
             pattern_result = path_pattern[-1]
 
-        files = FileManager.get_list_of_files(called_directly=False)
+        if MetadataIndex.ready():
+            files = MetadataIndex.iter_files()
+        else:
+            files = FileManager.get_list_of_files(called_directly=False)
         # отбор кандидатов на удаления
         for file in files:
             if fnmatch.fnmatch(file['name'], pattern_result):
@@ -1012,9 +1025,9 @@ class FileManager:
 
         # папку без рекурсиваного удаления, удалять нельзя
         if file_remove_root['mimeType'] == 'application/vnd.google-apps.folder':
-            remove_files_struct = PathNavigator.gather_structure(id_remove)
+            has_children = bool(PathNavigator.get_child_files(id_remove))
 
-            if not recursive and not remove_files_struct:
+            if not recursive and not has_children:
                 response = None
 
                 if interactive:
@@ -1051,8 +1064,10 @@ class FileManager:
                         ])
                     UserInterface.show_message(f"I'm starting to clean the branch")
 
-                # чистим ветку
-                FileManager._recursive_remove_branch(verbose, interactive, remove_files_struct)
+                # чистим ветку, прогресс показывает WorkerPool
+                stop_loading()
+                FileManager._recursive_remove_branch(verbose, interactive, PathNavigator.walk_structure(id_remove))
+                stop_loading = UserInterface.show_loading_message()
 
                 if verbose:
                     UserInterface.show_message(f"I'll trying delete: {file_remove_root['name']} (folder): {file_remove_root['id']}")
@@ -1163,18 +1178,13 @@ class FileManager:
         old_parent_id = parents[0]
 
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json'
         }
 
-        url = f'https://www.googleapis.com/drive/v3/files/{source_id}'
+        url = f'{Transport.BASE_URL}/drive/v3/files/{source_id}'
 
-        # Сначала добавляем нового родителя
-        body = {
-            'addParents': [destination_id]
-        }
-
-        response = requests.patch(url, headers=headers, json=body)
+        # Сначала добавляем нового родителя (addParents и removeParents - параметры запроса, не поля тела)
+        response = Transport.patch(url, headers=headers, json={}, params={'addParents': destination_id})
 
         if response.status_code != 200:
             UserInterface.show_error(f'Failed to add new parent. Status code: {response.status_code}: {response.text}')
@@ -1182,13 +1192,11 @@ class FileManager:
             return None
 
         # Затем удаляем старого родителя
-        body = {
-            'removeParents': [old_parent_id]
-        }
-
-        response = requests.patch(url, headers=headers, json=body)
+        response = Transport.patch(url, headers=headers, json={},
+                                   params={'removeParents': old_parent_id, 'fields': MetadataIndex.FIELDS})
 
         if response.status_code == 200:
+            MetadataIndex.put(response.json())
             UserInterface.show_success(f"Transfer is completed. File moved to new location.")
         else:
             UserInterface.show_error(f'Failed to remove old parent. Status code: {response.status_code}: {response.text}')
@@ -1219,7 +1227,8 @@ class FileManager:
             stop_loading()
             return
 
-        # Применяем регулярное выражение
+        # Применяем регулярное выражение, переименования собираем в пакет
+        calls = []
         for file in files:
             if fnmatch.fnmatch(file['name'], pattern_file):
                 try:
@@ -1234,27 +1243,21 @@ class FileManager:
                     )
                     continue
                 # обновляем имя файла
-                # Метод для обновления временных меток файла в Google Drive
-                headers = {
-                    'Authorization': f'Bearer {FileManager._creds().token}',
-                    'Content-Type': 'application/json'
-                }
-
-                url = f'https://www.googleapis.com/drive/v3/files/{file["id"]}'
-
-                body = {
-                    'name': file_new_name,
-                    'fields': 'name, id'  # Указываем поля, которые хотим получить в ответе
-                }
-
-                response = requests.patch(url, headers=headers, json=body)
-
-                if response.status_code == 200:
-                    UserInterface.show_message(f"rename is completed")
-                else:
-                    UserInterface.show_error(
-                        f'Failed to rename file. Status code: {response.status_code}: {response.text}'
-                    )
+                calls.append({
+                    'method': 'PATCH',
+                    'url': f'{Transport.BASE_URL}/drive/v3/files/{file["id"]}',
+                    'params': {'fields': MetadataIndex.FIELDS},
+                    'json': {'name': file_new_name},
+                })
+
+        for response in Batch.execute(calls):
+            if response.status_code == 200:
+                MetadataIndex.put(response.json())
+                UserInterface.show_message(f"rename is completed")
+            else:
+                UserInterface.show_error(
+                    f'Failed to rename file. Status code: {response.status_code}: {response.text}'
+                )
         stop_loading()
 
     @staticmethod
@@ -1287,24 +1290,16 @@ class FileManager:
             stop_loading()
             return
 
-        # URL запроса
-        url = f'https://www.googleapis.com/drive/v3/files/{file_id}'
-
-        # Заголовки
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
-            'Content-Type': 'application/json'
-        }
-
-        # Тело запроса
-        body = {
-            'trashed': True
-        }
-
         # Отправка запроса
-        response = requests.patch(url, headers=headers, json=body)
+        response, = Batch.execute([{
+            'method': 'PATCH',
+            'url': f'{Transport.BASE_URL}/drive/v3/files/{file_id}',
+            'params': {'fields': MetadataIndex.FIELDS},
+            'json': {'trashed': True},
+        }])
 
         if response.status_code == 200:
+            MetadataIndex.put(response.json())
             UserInterface.show_success('File moved to trash successfully.')
         else:
             UserInterface.show_error(f'Failed to move file to trash: {response.text}')
@@ -1325,7 +1320,8 @@ class FileManager:
             path,
             os.getenv("GOOGLE_CLOUD_CURRENT_PATH"),
             check_file=True,
-            mimeType=mimeType
+            mimeType=mimeType,
+            with_trashed=True
         )
 
         if not file_id:
@@ -1333,24 +1329,16 @@ class FileManager:
             stop_loading()
             return
 
-        # URL запроса
-        url = f'https://www.googleapis.com/drive/v3/files/{file_id}'
-
-        # Заголовки
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
-            'Content-Type': 'application/json'
-        }
-
-        # Тело запроса
-        body = {
-            'trashed': False
-        }
-
         # Отправка запроса
-        response = requests.patch(url, headers=headers, json=body)
+        response, = Batch.execute([{
+            'method': 'PATCH',
+            'url': f'{Transport.BASE_URL}/drive/v3/files/{file_id}',
+            'params': {'fields': MetadataIndex.FIELDS},
+            'json': {'trashed': False},
+        }])
 
         if response.status_code == 200:
+            MetadataIndex.put(response.json())
             UserInterface.show_success('File restored from trash successfully. ')
         else:
             UserInterface.show_error(f'Failed to restore file from trash: {response.text}')
@@ -1363,17 +1351,13 @@ class FileManager:
         """
         stop_loading = UserInterface.show_loading_message()
         # URL запроса
-        url = 'https://www.googleapis.com/drive/v3/files/trash'
-
-        # Заголовки
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
-        }
+        url = f'{Transport.BASE_URL}/drive/v3/files/trash'
 
         # Отправка запроса
-        response = requests.delete(url, headers=headers)
+        response = Transport.delete(url)
 
         if response.status_code == 204:
+            MetadataIndex.remove_trashed()
             UserInterface.show_success('Trash emptied successfully.')
         else:
             UserInterface.show_error(f'Failed to empty trash: {response.text}')
@@ -1405,52 +1389,35 @@ class FileManager:
             stop_loading()
             return
 
-        files = PathNavigator.gather_structure(source_id)
-
-        iterator = iter(files)
-
         count_space = 0
         indent = "" if no_indent else "    "
 
-        # использую стандартный итератор для фикса проблемы с извлечением следующего элемента при "?"
-        for file in iterator:
+        for event, file in PathNavigator.walk_structure(source_id, dirs_only=dirs_only):
 
-            if file == "!":
-                next_file = next(iterator, None)
-                if not next_file:
-                    break
-                elif next_file == "?":
-                    file = "?"
+            if event == PathNavigator.ENTER:
+                file_output = f"{count_space * indent}{file['name']}/"
+                if not pattern:
+                    UserInterface.show_message(file_output)
                 else:
-                    file_output = f"{count_space * indent}{next_file['name']}/"
-                    if not pattern:
+                    if fnmatch.fnmatch(file['name'], pattern):
                         UserInterface.show_message(file_output)
-                    else:
-                        if fnmatch.fnmatch(next_file['name'], pattern):
-                            UserInterface.show_message(file_output)
 
-                    if not no_indent:
-                        count_space += 1
-                    else:
-                        # улиняем путь так как поднялись на одну папку вверх
-                        count_space = 1
-                        if next_file["mimeType"] == 'application/vnd.google-apps.folder':
-                            indent = indent + next_file['name'] + "/"
-                    continue
+                if not no_indent:
+                    count_space += 1
+                else:
+                    # улиняем путь так как поднялись на одну папку вверх
+                    count_space = 1
+                    indent = indent + file['name'] + "/"
 
-            if file == "?":
+            elif event == PathNavigator.LEAVE:
                 if not no_indent:
                     count_space -= 1
                 else:
                     count_space = 1
                     # урезаем путь так как опустились на одну папку вверх
-                    indent = indent[:-1]
-                    i = len(indent) - 1
-                    while i >= 0 and indent[i] != "/":
-                        indent = indent[:-1]
-                        i -= 1
+                    indent = indent[:-len(file['name']) - 1]
 
-            if file != '!' and file != '?':
+            else:
                 if no_indent:
                     count_space = 1
 
@@ -1521,59 +1488,54 @@ class FileManager:
             stop_loading()
             return
 
-        files = PathNavigator.gather_structure(source_id)
-        FileManager.display_usage(path, files, all)
+        if MetadataIndex.ready():
+            # Размеры всех папок разом посчитаны по колонкам хранилища, обходим только папки
+            store = MetadataIndex.store()
+            files = PathNavigator.walk_structure(source_id, dirs_only=not all)
+            FileManager.display_usage(path, files, all, folder_size=store.folder_size, source_id=source_id)
+        else:
+            files = PathNavigator.walk_structure(source_id)
+            FileManager.display_usage(path, files, all)
 
         stop_loading()
 
     @staticmethod
-    def display_usage(path, files, all):
+    def display_usage(path, files, all, folder_size=None, source_id=None):
         """
         Отображение использования дискового пространства для списка файлов/директорий.
-        """
-        iterator = iter(files)
 
+        Args:
+            files (iterable): События обхода ветки из PathNavigator.walk_structure.
+            folder_size (callable, optional): Готовый размер ветки по идентификатору (MetadataStore.folder_size).
+                                              Если задан, размеры папок не суммируются по файлам.
+            source_id (str, optional): Идентификатор корня ветки, нужен вместе с folder_size.
+        """
         indent = ""
         total_size = [0]
-        total_folders = ["main"]
 
-        # использую стандартный итератор для фикса проблемы с извлечением следующего элемента при "?"
-        for file in iterator:
-
-            if file == "!":
-                next_file = next(iterator, None)
-                if not next_file:
-                    break
-                elif next_file == "?":
-                    file = "?"
-                else:
-                    total_size.append(0)
-                    total_folders.append(next_file)
+        for event, file in files:
 
-                    if next_file["mimeType"] == 'application/vnd.google-apps.folder':
-                        indent = indent + next_file['name'] + "/"
-                    continue
+            if event == PathNavigator.ENTER:
+                total_size.append(0)
+                indent = indent + file['name'] + "/"
 
-            if file == "?":
+            elif event == PathNavigator.LEAVE:
                 # урезаем путь так как опустились на одну папку вверх
-                indent = indent[:-1]
-                i = len(indent) - 1
-                while i >= 0 and indent[i] != "/":
-                    indent = indent[:-1]
-                    i -= 1
+                indent = indent[:-len(file['name']) - 1]
                 # Выводим размер текущей папки
                 size = total_size.pop()
                 # так как эта папка тоже поддиректория предыдущей
                 total_size[-1] += size
 
-                folder = total_folders.pop()
+                if folder_size:
+                    size = folder_size(file['id']) or 0
 
                 result_size = FileManager.format_size(size)
 
-                file_output = f"{result_size}{(10-len(result_size)) * ' '}|    {path}{indent}{folder['name']}/"
+                file_output = f"{result_size}{(10-len(result_size)) * ' '}|    {path}{indent}{file['name']}/"
                 UserInterface.show_message(file_output)
 
-            if file != '!' and file != '?':
+            else:
                 if "size" in file:
                     total_size[-1] += int(file['size'])
                     if all:
@@ -1589,6 +1551,8 @@ class FileManager:
                          }])
         # выводим размер основной ветки
         size = total_size.pop()
+        if folder_size:
+            size = folder_size(source_id) or 0
         result_size = FileManager.format_size(size)
         file_output = f"{result_size}{(10-len(result_size)) * ' '}|    {path}"
         UserInterface.show_message(file_output)
@@ -1598,13 +1562,9 @@ class FileManager:
         """
         Показать свободное место на Google Диске.
         """
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}'
-        }
+        url = f'{Transport.BASE_URL}/drive/v3/about'
 
-        url = 'https://www.googleapis.com/drive/v3/about?fields=storageQuota'
-
-        response = requests.get(url, headers=headers)
+        response = Transport.get(url, params={'fields': Fields.file('quota')})
 
         if response.status_code == 200:
             quota = response.json()['storageQuota']
@@ -1626,6 +1586,32 @@ class FileManager:
                 f'Failed to retrieve free space. Status code: {response.status_code}'
             )
 
+    @staticmethod
+    def cache(clear=False):
+        """
+        Показать статистику PathCache (попадания и промахи с запуска терминала, размер).
+
+        Args:
+            clear (bool): Выбросить из кэша все пути (счетчики остаются).
+        """
+        if clear:
+            PathCache.clear()
+
+        stats = PathCache.stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = f"{stats['hits'] / lookups:.0%}" if lookups else "-"
+
+        UserInterface.show_message(
+            [{"text": f"Hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {hit_rate}", "color": "bright_yellow"}]
+        )
+        UserInterface.show_message(
+            [{"text": f"Cached paths: {stats['paths']}, cached ids: {stats['ids']}", "color": "bright_yellow"}]
+        )
+        if not MetadataIndex.ready():
+            UserInterface.show_message(
+                [{"text": f"No metadata index: entries expire after {PathCache.TTL:g} s", "color": "bright_yellow"}]
+            )
+
     @staticmethod
     def share(path, email, role, type, mimeType):
         """
@@ -1647,18 +1633,16 @@ class FileManager:
             return
 
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json'
         }
 
-        url = f"https://www.googleapis.com/drive/v3/files/{source_id}/permissions"
+        url = f"{Transport.BASE_URL}/drive/v3/files/{source_id}/permissions"
 
         if type == 'restricted':
             # Удалить все текущие разрешения (ограничить доступ)
-            current_permissions = requests.get(url, headers=headers).json().get('permissions', [])
-            for permission in current_permissions:
-                delete_url = f"{url}/{permission['id']}"
-                requests.delete(delete_url, headers=headers)
+            current_permissions = Transport.get(url, headers=headers).json().get('permissions', [])
+            Batch.execute([{'method': 'DELETE', 'url': f"{url}/{permission['id']}"}
+                           for permission in current_permissions])
             UserInterface.show_success("All permissions have been removed. The file is now restricted.")
             stop_loading()
             return
@@ -1670,7 +1654,7 @@ class FileManager:
         if email:
             body['emailAddress'] = email
 
-        response = requests.post(url, headers=headers, json=body)
+        response = Transport.post(url, headers=headers, json=body)
 
         if response.status_code == 200:
             UserInterface.show_success("Permission granted successfully")
@@ -1702,14 +1686,12 @@ class FileManager:
             local_path (str): Локальный путь для синхронизации.
             sync_mode (int): Режим синхронизации (download - из облака в локального репозиторий, upload - из локального репозитория в облако).
         """
-        stop_loading = UserInterface.show_loading_message()
-
+        # вместо анимации загрузки прогресс показывает WorkerPool
         if sync_mode == "download":
             FileManager.sync_from_cloud(drive_path, local_path)
         else:
             FileManager.sync_to_cloud(local_path, drive_path)
 
-        stop_loading()
         UserInterface.show_success("Synchronization completed successfully")
 
     @staticmethod
@@ -1752,76 +1734,130 @@ class FileManager:
 
     @staticmethod
     def _download_folder_contents(drive_path, local_path):
+        """
+        Скачивает ветку drive_path в local_path.
+        Локальные папки создаются при обходе, обычные файлы скачиваются параллельно
+        (через AsyncDrive, если установлен aiohttp, иначе WorkerPool),
+        документы Google после них по одному через export: формат выбирает пользователь.
+        Файлы, локальная копия которых совпадает по размеру и md5, не скачиваются.
+        """
         folder_id = PathNavigator.validate_path(drive_path, current_path=os.getenv("GOOGLE_CLOUD_CURRENT_PATH"))
-        needed_copy = PathNavigator.gather_structure(folder_id)
+        downloads = []
+        exports = []
+        for event, file in PathNavigator.walk_structure(folder_id, fields=Fields.files('sync')):
+
+            if event == PathNavigator.ENTER:
+                local_path = os.path.join(local_path, file['name'])
+                # Проверка существования локальной директории
+                if not os.path.exists(local_path):
+                    UserInterface.show_message(f"Create path {local_path}")
+                    os.mkdir(local_path)
+
+            elif event == PathNavigator.LEAVE:
+                local_path = os.path.dirname(local_path)
 
-        iterator = iter(needed_copy)
+            elif file['mimeType'].startswith('application/vnd.google-apps.'):
+                exports.append((file, os.path.join(local_path, file['name'])))
 
-        # использую стандартный итератор для фикса проблемы с извлечением следующего элемента при "?"
-        for file in iterator:
+            elif not FileManager._is_synced(file, os.path.join(local_path, file['name'])):
+                downloads.append((file, os.path.join(local_path, file['name'])))
 
-            if file == "!":
-                next_file = next(iterator, None)
-                if not next_file:
-                    break
-                elif next_file == "?":
-                    file = "?"
+        if AsyncDrive.available():
+            # все скачивания в одном цикле событий, одновременно столько, сколько разрешает Concurrency
+            progress = Progress('sync', len(downloads))
+            try:
+                responses = AsyncDrive.run(AsyncDrive.gather(
+                    (AsyncDrive.download(file['id'], file_local_path) for file, file_local_path in downloads),
+                    progress=progress
+                ))
+            finally:
+                progress.close()
+
+            for (file, file_local_path), response in zip(downloads, responses):
+                if isinstance(response, Exception):
+                    UserInterface.show_error(f"Failed to download {file['name']}: {response!r}")
+                elif response.status_code == 200:
+                    UserInterface.show_message(f"Download file {file_local_path}")
                 else:
-                    local_path = os.path.join(local_path, next_file['name'])
-                    # Проверка существования локальной директории
-                    if not os.path.exists(local_path):
-                        UserInterface.show_message(f"Create path {local_path}")
-                        os.mkdir(local_path)
-                    continue
-
-            if file == "?":
-                local_path = os.path.dirname(local_path)
+                    UserInterface.show_error(f"Failed to download {file['name']}. Status code: {response.status_code}: {response.text}")
+        else:
+            progress = Progress('sync', len(downloads))
+            try:
+                WorkerPool.map(lambda item: FileManager._download_file(*item), downloads, progress=progress)
+            finally:
+                progress.close()
 
-            if file != '!' and file != '?':
-                path = PathNavigator.pwd(file['id'])
-                path = path.replace("MyDrive", "~", 1)
-                UserInterface.show_message(f"Download file {path}")
-                file_local_path = os.path.join(local_path, file['name'])
-                FileManager.export(path, file_local_path)
+        for file, file_local_path in exports:
+            path = PathNavigator.pwd(file['id'])
+            path = path.replace("MyDrive", "~", 1)
+            UserInterface.show_message(f"Download file {path}")
+            FileManager.export(path, file_local_path)
 
     @staticmethod
-    def _upload_folder_contents(local_path, drive_path):
-        drive_path.strip("/")
-        for item in os.listdir(local_path):
-            item_local_path = os.path.join(local_path, item)
-
-            if os.path.isdir(item_local_path):
-                # Обработка директорий на первом уровне
-                dir_drive_path = os.path.join(drive_path, item)
-                FileManager.mkdir(dir_drive_path, True)
-                # Загружаем содержимое директории на первом уровне
-                FileManager._upload_folder_contents(item_local_path, dir_drive_path)
-            else:
-                # Обработка файлов на первом уровне
-                UserInterface.show_message(f"Upload file: {item_local_path}")
-                FileManager.upload(drive_path, item_local_path, item, uploadType="MultipartUpload")
+    def _is_synced(file, local_path):
+        """
+        Совпадает ли локальный файл с файлом на диске: сначала сравнивается размер, и только при
+        совпадении считается md5. Без md5Checksum (его нет у документов Google) файл считается измененным.
+        """
+        if not os.path.isfile(local_path) or int(file.get('size') or -1) != os.path.getsize(local_path):
+            return False
+
+        md5_checksum = file.get('md5Checksum')
+        if not md5_checksum and MetadataIndex.ready():
+            # обход по индексу идет по MetadataStore, а md5 хранится только в SQLite
+            md5_checksum = (MetadataIndex.get(file['id']) or {}).get('md5Checksum')
+        if not md5_checksum:
+            return False
+
+        md5 = hashlib.md5()
+        with open(local_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                md5.update(chunk)
+        return md5.hexdigest() == md5_checksum
 
     @staticmethod
-    def _confirm_upload():
+    def _download_file(file, local_path):
         """
-        Запрашивает подтверждение действия у пользователя.
+        Скачивает содержимое файла (не документа Google) в local_path.
 
         Args:
-            name_file (str): Имя файла, над которым будет производиться действие.
+            file (dict): field объект google drive v3..
+            local_path (str): Локальный путь для сохранения.
+
+        Returns:
+            bool: Скачан ли файл.
         """
-        while True:
-            response = input("Should I continue sending the file (Y/N): ").strip().lower()
-            if response in ('yes', 'y'):
-                return True
-            elif response in ('no', 'n'):
-                return False
-            else:
-                UserInterface.show_message(
-                    [{"text": f"Please enter 'yes' or 'no' to confirm. ", "color": "bright_yellow"}]
-                )
+        url = f"{Transport.BASE_URL}/drive/v3/files/{file['id']}?alt=media"
+        response = Transport.get(url, stream=True)
+
+        if response.status_code != 200:
+            UserInterface.show_error(f"Failed to download {file['name']}. Status code: {response.status_code}: {response.text}")
+            return False
+
+        with open(local_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:
+                    f.write(chunk)
+        UserInterface.show_message(f"Download file {local_path}")
+        return True
 
     @staticmethod
-    def upload(path, local_path="./", name=None, mimeType=None, uploadType="SimpleUpload"):
+    def _upload_folder_contents(local_path, drive_path):
+        """
+        Загружает локальную папку local_path в drive_path.
+        Путь разбирается один раз, дальше работает UploadEngine.upload_tree: папки создаются по уровням,
+        файлы загружаются параллельно, каждый подходящим по размеру способом.
+        """
+        folder_id = PathNavigator.validate_path(drive_path, current_path=os.getenv("GOOGLE_CLOUD_CURRENT_PATH"),
+                                                check_file=False)
+        if not folder_id:
+            UserInterface.show_error(f"Drive path {drive_path} not found")
+            return
+
+        UploadEngine.upload_tree(local_path, folder_id)
+
+    @staticmethod
+    def upload(path, local_path="./", name=None, mimeType=None, uploadType=None):
         """
         Загружаем файл с локального компьютера на Google Drive.
 
@@ -1830,127 +1866,54 @@ class FileManager:
             local_path (str): Локальный путь к файлу для загрузки.
             name (str): Опционально. Указывает имя для загружаемого файла.
             mimeType (str): Опционально. Указывает MIME-тип загружаемого файла.
-            uploadType (str): Опционально. Указывает тип метода загрузки:
-                - SimpleUpload: Базовый метод загрузки для небольших файлов (5 МБ или меньше).
-                - MultipartUpload: Метод загрузки для небольших файлов (5 МБ или меньше).
+            uploadType (str): Опционально. Указывает тип метода загрузки, по умолчанию он выбирается
+                по размеру файла (UploadEngine.strategy):
+                - SimpleUpload: Создание метаданных и отдельная запись содержимого (пустые файлы).
+                - MultipartUpload: Метаданные и содержимое одним запросом (5 МБ или меньше).
                 - ResumableUpload: Метод многократной загрузки для крупных файлов с возможностью повтора (более 5 МБ).
         """
-        stop_loading = UserInterface.show_loading_message()
-
         TypesUpload = {
             "SimpleUpload": FileManager.SimpleUpload,
             "MultipartUpload": FileManager.MultipartUpload,
             "ResumableUpload": FileManager.ResumableUpload
         }
-
-        if os.path.isfile(local_path):
-            file_size = os.path.getsize(local_path)
-            if uploadType != 'ResumableUpload' and file_size >= 6 * 1024 * 1024:  # 6 MB
-                stop_loading()
-                UserInterface.show_message(
-                    [{"text": f"File '{local_path}' exceeds the size limit of 6 MB, it is better to use ResumableUpload.",
-                      "color": "bright_yellow"}]
-                )
-                if FileManager._confirm_upload():
-                    stop_loading = UserInterface.show_loading_message()
-                    TypesUpload[uploadType](path, local_path, name, mimeType)
-                    stop_loading()
-                    return
-                else:
-                    UserInterface.show_message("The upload has been canceled. ")
-                    return
-            if uploadType == 'SimpleUpload' and (name or mimeType):
-                stop_loading()
-                UserInterface.show_message(
-                    [{
-                         "text": f"When you used a simple download, you can't specify the file name and type. I recommend u should use ResumableUpload",
-                         "color": "bright_yellow"}]
-                )
-                if FileManager._confirm_upload():
-                    stop_loading = UserInterface.show_loading_message()
-                    TypesUpload[uploadType](path, local_path, name, mimeType)
-                    stop_loading()
-                    return
-                else:
-                    UserInterface.show_message("The upload has been canceled. ")
-                    return
-            TypesUpload[uploadType](path, local_path, name, mimeType)
-        else:
-            UserInterface.show_error(f"File '{local_path}' does not exist.")
-        stop_loading()
-        return
-
-    @staticmethod
-    def creating_metadata_file(parents_id, name_file, mimeType):
-        """
-        Создаем метаданные файла перед записыванием туда даннных
-        """
-        # Метод для создания файла в Google Cloud
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
-            'Content-Type': 'application/json'
+        Strategies = {
+            'simple': "SimpleUpload",
+            'multipart': "MultipartUpload",
+            'resumable': "ResumableUpload"
         }
 
-        url = f'https://www.googleapis.com/drive/v3/files'
-
-        body = {
-            "name": name_file,
-            'parents': [parents_id] if parents_id else [],
-            'fields': 'id'
-        }
+        if not os.path.isfile(local_path):
+            UserInterface.show_error(f"File '{local_path}' does not exist.")
+            return None
 
-        if mimeType:
-            body["mimeType"] = mimeType
+        file_size = os.path.getsize(local_path)
+        strategy = Strategies[UploadEngine.strategy(file_size)]
+        if uploadType and uploadType != 'ResumableUpload' and strategy == 'ResumableUpload':
+            UserInterface.show_message(
+                [{"text": f"File '{local_path}' exceeds the size limit of 5 MB for {uploadType}, using ResumableUpload.",
+                  "color": "bright_yellow"}]
+            )
+            uploadType = strategy
+        uploadType = uploadType or strategy
 
-        response = requests.post(url, headers=headers, json=body)
+        if uploadType == 'ResumableUpload':
+            # у ResumableUpload своя анимация загрузки и полоса прогресса
+            return TypesUpload[uploadType](path, local_path, name, mimeType)
 
-        if response.status_code == 200:
-            UserInterface.show_success("Creating file metadata complete!")
-            return response.json()
-        else:
-            UserInterface.show_error(f'Failed then create metadata file. Status code: {response.status_code}')
-            return None
+        stop_loading = UserInterface.show_loading_message()
+        try:
+            return TypesUpload[uploadType](path, local_path, name, mimeType)
+        finally:
+            stop_loading()
 
     @staticmethod
     def SimpleUpload(path, local_path="./", name=None, mimeType=None):
         """
-        Используйте этот тип загрузки для передачи небольшого медиафайла
-        (5 МБ или меньше) без предоставления метаданных/ Но я все равно их задаю,
-        Так как потом будут траблы с преобразованием полученной много весящей пустышки
+        Используйте этот тип загрузки для пустых файлов: они создаются одним запросом с метаданными.
+        Содержимое непустого файла записывается вторым запросом (uploadType=media).
         """
-        # Дополнительные проверки на существоания файла!!!
-        try:
-            with open(local_path, "rb") as file:
-                file_bytes = file.read()
-        except FileNotFoundError:
-            UserInterface.show_error(f"File {local_path} not found")
-            return None
-        except IsADirectoryError:
-            UserInterface.show_error(f"Path {local_path} is a directory, not a file")
-            return None
-
-        file_id = FileManager.creating_metadata_file(os.getenv("GOOGLE_CLOUD_CURRENT_PATH"),
-                                           os.path.basename(local_path),
-                                           None)['id']
-
-        if not file_id:
-            return
-
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
-            'Content-Type': 'application/octet-stream'
-        }
-
-        url_upload = f'https://www.googleapis.com/upload/drive/v3/files/{file_id}?uploadType=media'
-
-        response_upload = requests.patch(url_upload, headers=headers, data=file_bytes)
-
-        if response_upload.status_code == 200:
-            UserInterface.show_success("Uploading file complete!")
-            return response_upload.json()
-        else:
-            UserInterface.show_error(f'Failed to upload file. Status code: {response_upload.status_code}')
-            return None
+        return FileManager._upload_with(UploadEngine.simple, path, local_path, name, mimeType)
 
     @staticmethod
     def MultipartUpload(path, local_path, name=None, mimeType=None):
@@ -1958,11 +1921,24 @@ class FileManager:
         «Используйте этот тип загрузки для передачи небольшого файла
         (5 МБ или меньше) вместе с метаданными, описывающими файл, в одном запросе.
         """
-        parents_id = PathNavigator.validate_path(path, os.getenv("GOOGLE_CLOUD_CURRENT_PATH"), check_file=True)
-        # Дополнительные проверки на существоания файла!!!
+        return FileManager._upload_with(UploadEngine.multipart, path, local_path, name, mimeType)
+
+    @staticmethod
+    def _upload_with(method, path, local_path, name, mimeType):
+        """
+        Загружает local_path в папку path методом UploadEngine (simple или multipart).
+
+        Returns:
+            dict: Метаданные загруженного файла или None.
+        """
+        # путь назначения - папка: файл с таким именем родителем не считается
+        parents_id = PathNavigator.validate_path(path, os.getenv("GOOGLE_CLOUD_CURRENT_PATH"), check_file=False)
+        if not parents_id:
+            UserInterface.show_error(f"Drive path {path} not found")
+            return None
+
         try:
-            with open(local_path, "rb") as file:
-                file_bytes = file.read()
+            file = method(parents_id, local_path, name if name else os.path.basename(local_path), mimeType)
         except FileNotFoundError:
             UserInterface.show_error(f"File {local_path} not found")
             return None
@@ -1970,134 +1946,91 @@ class FileManager:
             UserInterface.show_error(f"Path {local_path} is a directory, not a file")
             return None
 
-        file_id = FileManager.creating_metadata_file(parents_id,
-                                                     name if name else os.path.basename(local_path),
-                                                     mimeType)['id']
-
-        if not file_id:
-            return
-
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
-            'Content-Type': "application/json"
-        }
-        "https://www.googleapis.com/upload/drive/v3/files?uploadType=multipart"
-
-        url_upload = f'https://www.googleapis.com/upload/drive/v3/files/{file_id}?uploadType=multipart'
-
-        response_upload = requests.patch(url_upload, headers=headers, data=file_bytes)
-
-        if response_upload.status_code == 200:
+        if file:
             UserInterface.show_success("Uploading file complete!")
-            return response_upload.json()
-        else:
-            UserInterface.show_error(f'Failed to upload file. Status code: {response_upload.status_code}')
-            return None
-
-    @staticmethod
-    def _determine_chunk_size(file_size):
-        """
-        Подбираем размер чанка в зависимости от размера файла
-        """
-        if file_size <= 50 * 1024 * 1024:  # ≤ 50 MB
-            return 1 * 1024 * 1024  # 1 MB
-        elif file_size <= 200 * 1024 * 1024:  # > 50 MB and ≤ 200 MB
-            return 5 * 1024 * 1024  # 5 MB
-        elif file_size <= 1 * 1024 * 1024 * 1024:  # > 200 MB and ≤ 1 GB
-            return 10 * 1024 * 1024  # 10 MB
-        else:  # > 1 GB
-            return 20 * 1024 * 1024  # 20 MB
+        return file
 
     @staticmethod
     def ResumableUpload(path, local_path, name=None, mimeType=None):
         """
         используйте этот тип загрузки для больших файлов (более 5 МБ)
-        и при высокой вероятности прерывания сети
+        и при высокой вероятности прерывания сети.
+        Сессия и подтвержденное сервером смещение пишутся в UploadJournal: незавершенная загрузка
+        того же файла в то же место продолжается с места обрыва (см. также upload --resume).
         """
         stop_loading = UserInterface.show_loading_message()
 
         parents_id = PathNavigator.validate_path(path,
                                                  os.getenv("GOOGLE_CLOUD_CURRENT_PATH"),
-                                                 check_file=True)
-
-        # Создаем метаданные файла
-        metadata = {
-            'name': name if name else os.path.basename(local_path),
-            'parents': [parents_id],
-            'fields': 'id'
-        }
-        if mimeType:
-            metadata['mimeType'] = mimeType
-
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
-            'Content-Type': 'application/json; charset=UTF-8',
-            'X-Upload-Content-Type': mimeType if mimeType else 'application/octet-stream',
-        }
-
-        url_resumable_upload = f'https://www.googleapis.com/upload/drive/v3/files?uploadType=resumable'
-
-        #  Действуем строго согласно документации: https://developers.google.com/drive/api/guides/manage-uploads
-        # Отправляем первоначальный запрос и получаем URI возобновляемого сеанса.
-        start_response = requests.post(url_resumable_upload, headers=headers, json=metadata)
-        if start_response.status_code != 200:
-            UserInterface.show_error(f'Failed to start resumable upload. Status code: {start_response.status_code}: {start_response.text}')
-            return None
-
-        # Если все ок, извлекаем Location из заголовков
-        location = start_response.headers.get('Location')
-
-        if not location:
-            UserInterface.show_error(
-                f'No Location header in response. Status code: {start_response.status_code}: {start_response.text}')
+                                                 check_file=False)
+        if not parents_id:
+            # иначе сессия с parents: [None] попала бы в журнал
+            UserInterface.show_error(f"Drive path {path} not found")
+            stop_loading()
             return None
 
         try:
-            file_size = os.path.getsize(local_path)
-            with open(local_path, "rb") as file:
-                file_bytes = file.read()
+            # только отпечаток файла: содержимое читается по кускам при отправке
+            if os.path.isdir(local_path):
+                raise IsADirectoryError(local_path)
+            identity = UploadJournal.identity(local_path)
         except FileNotFoundError:
             UserInterface.show_error(f"File {local_path} not found")
+            stop_loading()
             return None
         except IsADirectoryError:
             UserInterface.show_error(
                 f"Path {local_path} is a directory, not a file"
             )
+            stop_loading()
             return None
 
-        # Проверяем, сколько данных уже было загружено
-        if f'BYTES_UPLOADED_{name}' in os.environ:
-            bytes_uploaded = int(os.environ['BYTES_UPLOADED'])
-        else:
-            os.environ[f'BYTES_UPLOADED_{name}'] = '0'
-            bytes_uploaded = 0
+        return UploadEngine.resumable(parents_id, identity, name if name else os.path.basename(local_path),
+                                      mimeType, stop_loading)
 
-        # Загрузаем данные и отслеживаем состояние загрузки.
-        chunk_size = FileManager._determine_chunk_size(file_size)
-        uploading_update, stop_uploading = UserInterface.show_upload_process_message()
-        stop_loading()
-        with open(local_path, "rb") as file:
-            while bytes_uploaded < file_size:
-                chunk = file.read(chunk_size)
-                start_byte = bytes_uploaded
-                os.environ[f'BYTES_UPLOADED_{name}'] = str(start_byte)
-                end_byte = min(bytes_uploaded + chunk_size - 1, file_size - 1)
+    @staticmethod
+    def resume_uploads(local_path=None):
+        """
+        Продолжает незавершенные загрузки из журнала (все или только файла local_path).
+        """
+        entries = UploadJournal.pending(local_path)
+        if not entries:
+            UserInterface.show_message("No pending uploads.")
+            return
 
-                headers['Content-Range'] = f'bytes {start_byte}-{end_byte}/{file_size}'
+        for entry in entries:
+            try:
+                identity = UploadJournal.identity(entry['local_path'])
+            except FileNotFoundError:
+                UserInterface.show_error(f"File {entry['local_path']} no longer exists, its upload is dropped")
+                UploadJournal.remove(entry)
+                continue
 
-                upload_response = requests.put(location, headers=headers, data=chunk)
+            if any(entry[key] != identity[key] for key in ('size', 'mtime', 'head')):
+                UserInterface.show_message(
+                    [{"text": f"File {entry['local_path']} has changed since the upload started, uploading it again.",
+                      "color": "bright_yellow"}]
+                )
+            stop_loading = UserInterface.show_loading_message()
+            UploadEngine.resumable(entry['parent_id'], identity, entry['name'], entry['mimeType'], stop_loading)
 
-                if upload_response.status_code not in [200, 201, 308]:
-                    UserInterface.show_error(
-                        f'Failed to upload chunk. Status code: {upload_response.status_code}: {upload_response.text}')
-                    stop_uploading()
-                    return None
+    @staticmethod
+    def pending_uploads():
+        """
+        Показывает незавершенные загрузки из журнала.
+        """
+        entries = UploadJournal.pending()
+        if not entries:
+            UserInterface.show_message("No pending uploads.")
+            return
 
-                bytes_uploaded += len(chunk)
-                uploading_update((bytes_uploaded / file_size) * 100)
-        stop_uploading()
-        UserInterface.show_success("Resumable uploading file complete!")
-        return upload_response.json()
+        for entry in entries:
+            percent = entry['offset'] / entry['size'] * 100 if entry['size'] else 0
+            started = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['started']))
+            UserInterface.show_message(
+                f"{entry['local_path']} -> {entry['name']} (folder id: {entry['parent_id']}): "
+                f"{entry['offset']}/{entry['size']} bytes ({percent:.1f}%), started {started}"
+            )
 
     @staticmethod
     def ChangeMime(path, new_mimeType):
@@ -2113,19 +2046,15 @@ class FileManager:
 
         file_id = PathNavigator.validate_path(path, os.getenv("GOOGLE_CLOUD_CURRENT_PATH"), check_file=True)
 
-        headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
-            'Content-Type': 'application/json'
-        }
-
-        url = f'https://www.googleapis.com/drive/v3/files/{file_id}'
-        body = {
-            'mimeType': new_mimeType
-        }
-
-        response = requests.patch(url, headers=headers, json=body)
+        response, = Batch.execute([{
+            'method': 'PATCH',
+            'url': f'{Transport.BASE_URL}/drive/v3/files/{file_id}',
+            'params': {'fields': MetadataIndex.FIELDS},
+            'json': {'mimeType': new_mimeType},
+        }])
 
         if response.status_code == 200:
+            MetadataIndex.put(response.json())
             UserInterface.show_success(f"MIME-type changed successfully for file {path}.")
         else:
             UserInterface.show_error(
@@ -2184,7 +2113,6 @@ class FileManager:
         source_mimeType = file_metadata['mimeType']
 
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json'
         }
 
@@ -2197,15 +2125,15 @@ class FileManager:
 
         # Если mimeType не требует конвертации и указанный пользователем совпадает с исходным или не указан
         if valid_mimeType == 'NotRequire' and (not mimeType or mimeType == source_mimeType):
-            url = f'https://www.googleapis.com/drive/v3/files/{file_id}?alt=media'
-            response = requests.get(url, headers=headers, stream=True)
+            url = f'{Transport.BASE_URL}/drive/v3/files/{file_id}?alt=media'
+            response = Transport.get(url, headers=headers, stream=True)
         else:
             # Если mimeType указан и требует конвертации
             if mimeType:
                 if mimeType in valid_mimeType:
-                    url = f'https://www.googleapis.com/drive/v3/files/{file_id}/export'
+                    url = f'{Transport.BASE_URL}/drive/v3/files/{file_id}/export'
                     params = {'mimeType': mimeType}
-                    response = requests.get(url, headers=headers, params=params, stream=True)
+                    response = Transport.get(url, headers=headers, params=params, stream=True)
                 else:
                     UserInterface.show_error("Invalid MIME type for export.")
                     stop_loading()
@@ -2228,9 +2156,9 @@ class FileManager:
                     stop_loading()
                     return
 
-                url = f'https://www.googleapis.com/drive/v3/files/{file_id}/export'
+                url = f'{Transport.BASE_URL}/drive/v3/files/{file_id}/export'
                 params = {'mimeType': mimeType}
-                response = requests.get(url, headers=headers, params=params, stream=True)
+                response = Transport.get(url, headers=headers, params=params, stream=True)
 
         if response.status_code == 200:
             local_path = os.path.join(os.getcwd(), local_path)
@@ -2284,7 +2212,6 @@ class FileManager:
         ]
 
         headers = {
-            'Authorization': f'Bearer {FileManager._creds().token}',
             'Content-Type': 'application/json'
         }
 
@@ -2294,10 +2221,10 @@ class FileManager:
             file = FileManager.get_file_metadata(file_id)
             mimeType = file['mimeType']
 
-        url = 'https://www.googleapis.com/drive/v3/about'
-        params = {'fields': 'exportFormats'}
+        url = f'{Transport.BASE_URL}/drive/v3/about'
+        params = {'fields': Fields.file('export_formats')}
 
-        response = requests.get(url, headers=headers, params=params)
+        response = Transport.get(url, headers=headers, params=params)
 
         if response.status_code != 200:
             UserInterface.show_error(
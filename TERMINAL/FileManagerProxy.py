@@ -1,7 +1,8 @@
 import requests
 import os
-import json
-from google.oauth2.credentials import Credentials
+from Fields import Fields
+from MetadataIndex import MetadataIndex
+from Transport import Transport
 from UserInterface import UserInterface
 
 
@@ -12,8 +13,60 @@ class FileManagerProxy:
     @staticmethod
     def _creds():
         """ Восстанваливаем объект после сериализаци """
-        return Credentials.from_authorized_user_info(
-            json.loads(os.getenv("GOOGLE_CLOUD_CREDS")))
+        return Transport.creds()
+
+    @staticmethod
+    def iter_list_of_files(q=None, page_size=1000, fields=None, raise_errors=False):
+        """
+        Генератор, постранично перебирающий файлы Google Drive API v3.
+
+        Следует за nextPageToken и отдает файлы сразу по мере прихода каждой страницы,
+        поэтому вызывающий код может остановиться раньше, не дожидаясь обхода всего диска,
+        а в памяти одновременно держится не больше одной страницы.
+
+        Args:
+            q (str, optional): Поисковый запрос Drive (files.list q). По умолчанию None.
+            page_size (int, optional): Размер страницы, максимум у Drive - 1000.
+            fields (str, optional): Поля files.list из реестра Fields (Fields.files(...)),
+                                    по умолчанию Fields.files('children').
+            raise_errors (bool, optional): Пробрасывать ли ошибку запроса вместо вывода сообщения.
+                                           Нужно, когда неполный список недопустим (построение индекса).
+
+        Yields:
+            dict: Очередной файл Google Drive.
+        """
+        # URL запроса для получения списка файлов Google Drive API v3
+        url = f'{Transport.BASE_URL}/drive/v3/files'
+
+        # Параметры запроса
+        params = {
+            "corpora": "user",
+            'pageSize': page_size,
+            'fields': fields or Fields.files('children'),
+        }
+        if q:
+            params['q'] = q
+
+        while True:
+            # Отправляем GET-запрос к API Google Drive
+            try:
+                response = Transport.get(url, params=params)
+                response.raise_for_status()  # Вызываем исключение в случае ошибки HTTP
+            except requests.exceptions.RequestException as e:
+                if raise_errors:
+                    raise
+                UserInterface.show_error(f'Failed to retrieve files: {e}')
+                return
+
+            page = response.json()
+
+            yield from page.get('files', [])
+
+            # Последняя страница приходит без nextPageToken
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return
+            params['pageToken'] = page_token
 
     @staticmethod
     def get_list_of_files(called_directly=True):
@@ -22,76 +75,169 @@ class FileManagerProxy:
         Функция для получения списка файлов Google Drive API v3.
 
         Args:
-            creds (Credentials): Учетные данные для аутентификации в Google API.
             called_directly (bool, optional): Флаг, указывающий, была ли функция вызвана напрямую пользователем.
                                              По умолчанию True.
 
         Returns:
-            list: Список файлов Google Drive.
-                  Возвращает None в случае ошибки.
+            generator: Ленивый список файлов Google Drive (см. iter_list_of_files).
         """
-        # Создаем заголовок с авторизационным токеном
-        headers = {
-            'Authorization': f'Bearer {FileManagerProxy._creds().token}'
-        }
+        if called_directly:
+            # Класс вобще не долен затрагиваться пользователем
+            pass
 
-        # URL запроса для получения списка файлов Google Drive API v3
-        url = 'https://www.googleapis.com/drive/v3/files'
+        return FileManagerProxy.iter_list_of_files()
+
+    @staticmethod
+    def get_start_page_token():
+        """
+        Текущий курсор ленты изменений Drive (changes.getStartPageToken).
+
+        Returns:
+            str: Курсор, начиная с которого changes.list вернет все последующие изменения.
+        """
+        url = f'{Transport.BASE_URL}/drive/v3/changes/startPageToken'
+
+        response = Transport.get(url)
+        response.raise_for_status()
+
+        return response.json()['startPageToken']
+
+    @staticmethod
+    def sync_index():
+        """
+        Применяет к локальному индексу изменения диска, накопившиеся с прошлой синхронизации.
+        Обычно это один небольшой запрос changes.list вместо повторного обхода диска.
+        Если Drive не принимает сохраненный курсор, индекс помечается недействительным.
+
+        Returns:
+            bool: True, если индекс актуален.
+        """
+        if not MetadataIndex.ready():
+            return False
+
+        page_token = MetadataIndex.page_token()
+        if not page_token:
+            MetadataIndex.invalidate()
+            return False
+
+        url = f'{Transport.BASE_URL}/drive/v3/changes'
 
-        # Параметры запроса
         params = {
-            "corpora": "user",
-            'fields': 'files(name, id, mimeType, parents, size)',
+            'pageSize': 1000,
+            'fields': MetadataIndex.CHANGES_FIELDS,
         }
 
-        # Отправляем GET-запрос к API Google Drive
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()  # Вызываем исключение в случае ошибки HTTP
-
-            files = response.json().get('files', [])
+        while page_token:
+            params['pageToken'] = page_token
+            try:
+                response = Transport.get(url, params=params)
+            except requests.exceptions.RequestException as e:
+                UserInterface.show_error(f'Failed to retrieve drive changes: {e}')
+                return False
+
+            if response.status_code in (400, 404, 410):
+                # Курсор устарел или не подходит, остается только полный обход
+                MetadataIndex.invalidate()
+                return False
+            if response.status_code != 200:
+                UserInterface.show_error(
+                    f'Failed to retrieve drive changes. Status code: {response.status_code}'
+                )
+                return False
 
-            if called_directly:
-                # Класс вобще не долен затрагиваться пользователем
-                pass
+            page = response.json()
 
-            return files
+            # На последней странице вместо nextPageToken приходит newStartPageToken
+            next_page_token = page.get('nextPageToken')
+            MetadataIndex.apply_changes(page.get('changes', []),
+                                        next_page_token or page.get('newStartPageToken'))
+            page_token = next_page_token
 
-        except requests.exceptions.RequestException as e:
-            UserInterface.show_error(f'Failed to retrieve files: {e}')
-            return None
+        return True
 
     @staticmethod
-    def get_file_metadata(file_id):
+    def get_file_metadata(file_id, fields=None):
         """
         Получение метаданных файла по его идентификатору.
 
         Args:
             file_id: Идентификатор файла.
+            fields (str, optional): Поля из реестра Fields, по умолчанию все поля индекса.
+                                    Ответ с неполным набором полей в индекс не записывается.
 
         Returns:
             dict: Метаданные файла.
         """
+        if MetadataIndex.ready():
+            file = MetadataIndex.get(file_id)
+            if file:
+                return file
+
         headers = {
-            'Authorization': f'Bearer {FileManagerProxy._creds().token}',
             'Content-Type': 'application/json'
         }
 
-        url = f'https://www.googleapis.com/drive/v3/files/{file_id}'
+        url = f'{Transport.BASE_URL}/drive/v3/files/{file_id}'
+        fields = fields or Fields.file('metadata')
         params = {
-            'fields': 'name, id, parents, mimeType, size'
+            'fields': fields
         }
 
-        response = requests.get(url, headers=headers, params=params)
+        response = Transport.get(url, headers=headers, params=params)
 
         if response.status_code == 200:
-            return response.json()
+            file = response.json()
+            if MetadataIndex.ready() and fields == MetadataIndex.FIELDS:
+                MetadataIndex.put(file)
+            return file
         else:
             UserInterface.show_error(
                 f'Failed to get file metadata. Status code: {response.status_code}'
             )
             return None
 
+    @staticmethod
+    def look_for_child(parent_id: str, name: str, mime_type: str = None, with_trashed: bool = False):
+        """
+        Поиск файлов с именем name непосредственно внутри папки parent_id.
+        Если индекс построен, поиск идет по нему, иначе фильтр отдается на сторону Drive.
+
+        Args:
+            parent_id (str): Идентификатор папки, в которой ищем.
+            name (str): Имя файла.
+            mime_type (str, optional): Сузить поиск до определенного mimeType.
+            with_trashed (bool, optional): Искать и среди файлов в корзине.
+
+        Returns:
+            list: Идентификаторы найденных файлов (возможно пустой).
+        """
+        if MetadataIndex.ready():
+            return MetadataIndex.children_by_name(parent_id, name, mime_type, with_trashed)
+
+        def quote(value):
+            return value.replace("\\", "\\\\").replace("'", "\\'")
+
+        q = f"'{quote(parent_id)}' in parents and name = '{quote(name)}'"
+        if mime_type:
+            q += f" and mimeType = '{quote(mime_type)}'"
+        if not with_trashed:
+            q += " and trashed = false"
+
+        return [file['id'] for file in FileManagerProxy.iter_list_of_files(q=q, fields=Fields.files('ids'))]
+
+    @staticmethod
+    def get_parent_id(file_id: str):
+        """
+        Идентификатор родительской папки файла.
+
+        Returns:
+            str: Идентификатор родителя или None, если это корень (или файла нет).
+        """
+        file = FileManagerProxy.get_file_metadata(file_id, Fields.file('parents'))
+        if file and file.get('parents'):
+            return file['parents'][0]
+        return None
+
     @staticmethod
     def find_file_by_id(files, file_id: str, mime_type: str = None):
         """
@@ -153,6 +299,9 @@ class FileManagerProxy:
         Returns:
             str: Идентификатор или имя файла.
         """
+        if MetadataIndex.ready():
+            return FileManagerProxy._look_for_file_in_index(name, file_id, mime_type)
+
         files = FileManagerProxy.get_list_of_files(called_directly=False)
 
         if file_id:
@@ -177,3 +326,29 @@ class FileManagerProxy:
                     f'File with name "{name}" not found.'
                 )
                 return None
+
+    @staticmethod
+    def _look_for_file_in_index(name: str = None, file_id: str = None, mime_type: str = None):
+        """ То же, что и look_for_file, но по локальному индексу, без обхода диска """
+        if file_id:
+            if file_id == os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID"):
+                # Отмечаем, что дошли до корня
+                return None
+            file = MetadataIndex.get(file_id)
+            if file and not mime_type:
+                return file['name']
+            if not file:
+                UserInterface.show_error(
+                    f'File with ID "{file_id}" not found.'
+                )
+            return None
+
+        if name:
+            files_id = MetadataIndex.find_by_name(name, mime_type)
+            if files_id:
+                return files_id
+            else:
+                UserInterface.show_error(
+                    f'File with name "{name}" not found.'
+                )
+                return None
@@ -0,0 +1,83 @@
+import io
+import os
+
+
+class FileSlice(io.RawIOBase):
+    """
+    Участок файла [offset, offset + length) как тело запроса.
+
+    Данные читаются с диска небольшими блоками по мере отправки (requests и aiohttp сами
+    вызывают read), поэтому память не зависит ни от размера файла, ни от размера куска загрузки.
+    len() дает Content-Length. Transport и AsyncDrive перед каждой попыткой делают seek(0),
+    так что повтор запроса отправляет тот же участок заново.
+    prefix и suffix отправляются до и после участка (заголовки частей multipart-тела).
+    """
+
+    def __init__(self, path, offset=0, length=None, prefix=b'', suffix=b''):
+        """
+        Args:
+            path (str): Локальный файл.
+            offset (int, optional): Начало участка.
+            length (int, optional): Длина участка, по умолчанию до конца файла.
+            prefix (bytes, optional): Байты перед участком.
+            suffix (bytes, optional): Байты после участка.
+        """
+        super().__init__()
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.offset = min(offset, size)
+        self.length = size - self.offset if length is None else min(length, size - self.offset)
+        self.prefix = prefix
+        self.suffix = suffix
+        self.position = 0
+
+    def __len__(self):
+        return len(self.prefix) + self.length + len(self.suffix)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, position, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            position += self.position
+        elif whence == io.SEEK_END:
+            position += len(self)
+        self.position = max(0, min(position, len(self)))
+        return self.position
+
+    def prefetch(self, length):
+        """
+        Просит ОС заранее прочитать length байт сразу за участком (следующий кусок загрузки),
+        пока этот участок уходит в сеть. Память процесса не растет: данные ложатся в page cache.
+        """
+        if length > 0 and hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(self.file.fileno(), self.offset + self.length, length, os.POSIX_FADV_WILLNEED)
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)
+        size = min(len(view), len(self) - self.position)
+        if size <= 0:
+            return 0
+        start = len(self.prefix)
+        end = start + self.length
+        if self.position < start:
+            read = min(size, start - self.position)
+            view[:read] = self.prefix[self.position:self.position + read]
+        elif self.position < end:
+            self.file.seek(self.offset + self.position - start)
+            read = self.file.readinto(view[:min(size, end - self.position)])
+        else:
+            read = size
+            view[:read] = self.suffix[self.position - end:self.position - end + read]
+        self.position += read
+        return read
+
+    def close(self):
+        self.file.close()
+        super().close()
@@ -1,6 +1,9 @@
 from CommandParser import CommandParser
 from FileManager import FileManager
+from FileManagerProxy import FileManagerProxy
+from MetadataIndex import MetadataIndex
 from PathNavigator import PathNavigator
+from Transport import Transport
 from UserInterface import UserInterface
 from LOGGING import LOGGING
 from LOGGING import DummyLogger
@@ -61,8 +64,10 @@ class GoogleCloudTerminal:
         user_drive_id = FileManager.get_user_drive_id()
         if user_drive_id:
             os.environ["GOOGLE_CLOUD_MY_DRIVE_ID"] = user_drive_id
-            os.environ["GOOGLE_CLOUD_CURRENT_PATH"] = user_drive_id
+            PathNavigator.set_location([])
             stop_loading()
+            # полный обход диска нужен только в первый раз, дальше индекс догоняется по ленте изменений
+            self._build_index(user_drive_id)
         else:
             UserInterface.show_error([
                 {'text': 'Failed to retrieve user drive ID. ', 'color': 'red'},
@@ -80,6 +85,48 @@ class GoogleCloudTerminal:
                     f"Error when prepare completer: {e}"
                 ])
 
+    @staticmethod
+    def _build_index(user_drive_id):
+        """
+        Подготавливает локальный индекс метаданных.
+        Если индекс для этого диска уже есть с прошлого запуска, к нему применяются только изменения,
+        иначе весь диск обходится один раз. Если построить индекс не удалось,
+        все команды работают по сети, как раньше.
+
+        Args:
+            user_drive_id (str): Идентификатор MyDrive пользователя.
+        """
+        if FileManagerProxy.sync_index():
+            return
+
+        UserInterface.show_message([
+            {'text': "Indexing your GoogleDrive... ", 'color': 'bright_yellow'}
+        ])
+        stop_loading = UserInterface.show_loading_message()
+        try:
+            # курсор берем до обхода, чтобы не пропустить изменения, сделанные во время него
+            page_token = FileManagerProxy.get_start_page_token()
+            count = MetadataIndex.build(
+                user_drive_id,
+                FileManagerProxy.iter_list_of_files(fields=MetadataIndex.LIST_FIELDS, raise_errors=True),
+                page_token
+            )
+            stop_loading()
+            UserInterface.show_success(f"Indexing is complete: {count} files")
+        except Exception as e:
+            stop_loading()
+            UserInterface.show_error(f"Failed to build metadata index, working without it: {e}")
+
+    def _refresh_index(self):
+        """
+        Перед каждой командой подтягивает в индекс изменения диска (один небольшой запрос).
+        Если Drive отверг сохраненный курсор, индекс строится заново.
+        """
+        if not MetadataIndex.ready():
+            return
+        if not FileManagerProxy.sync_index() and not MetadataIndex.ready():
+            self._build_index(os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID"))
+
     @property
     def _creds(self):
         """ Восстанваливаем объект после сериализаци """
@@ -98,6 +145,13 @@ class GoogleCloudTerminal:
         )
         stop_loading = UserInterface.show_loading_message()
 
+        if Transport.OFFLINE:
+            # локальный LocalDrive (GOOGLE_CLOUD_API_URL) принимает любой токен
+            os.environ["GOOGLE_CLOUD_CREDS"] = json.dumps(Transport.OFFLINE_CREDS)
+            stop_loading()
+            UserInterface.show_success("Offline mode: authorization skipped. ")
+            return
+
         # Файл token.json хранит учетные данные пользователя и обновляет его автоматически, через запрос (Request)
         if os.path.exists(self.token_path):
             # статический метод класса, который создает экземпляр учетных данных из файла json
@@ -213,11 +267,15 @@ class GoogleCloudTerminal:
             'ChangeMime': self.ChangeMime,
             'upload': self.upload,
             'sync': self.synchronization,
-            'refresh_completer': self.refresh_completer
+            'refresh_completer': self.refresh_completer,
+            'cache': self.cache
         }
 
         command, args = CommandParser.parser_command(input_string)
 
+        if command:
+            self._refresh_index()
+
         try:
             COMMANDS[command](args)
         except KeyError:
@@ -225,6 +283,9 @@ class GoogleCloudTerminal:
                 f"Unknown command {command}"
             )
 
+        # команда могла переименовать, переместить или удалить текущую папку
+        PathNavigator.refresh_location()
+
     def change_directory(self, args):
         """
         Изменяет текущий рабочий каталог на указанный путь, если он существует.
@@ -236,11 +297,9 @@ class GoogleCloudTerminal:
             if args == 'help':
                 return
 
-            new_path = PathNavigator.validate_path(path=args.path, current_path=os.getenv("GOOGLE_CLOUD_CURRENT_PATH"))
+            new_path = PathNavigator.change_directory(args.path)
 
             if new_path:
-                os.environ["GOOGLE_CLOUD_CURRENT_PATH"] = new_path
-                os.environ["GOOGLE_CLOUD_CURRENT_ABSPATH_STR"] = args.path
                 return new_path
             else:
                 UserInterface.show_error(
@@ -569,6 +628,21 @@ class GoogleCloudTerminal:
             UserInterface.stop_loading_animation()
             self.logger_error.error(e)
 
+    def cache(self, args):
+        """
+        Статистика кэша путей: попадания, промахи и размер.
+        """
+        try:
+            if args == 'help':
+                return
+
+            FileManager.cache(clear=args.clear)
+        except Exception as e:
+            UserInterface.show_error(
+                f"Incorrect use of the command caused the message. Called exception: {e}"
+            )
+            self.logger_error.error(e)
+
     def export(self, args):
         """
         Скачиваем файлы с облака.
@@ -636,6 +710,16 @@ class GoogleCloudTerminal:
             if args == 'help':
                 return
 
+            if args.pending:
+                FileManager.pending_uploads()
+                return
+            if args.resume:
+                FileManager.resume_uploads(local_path=args.local_path)
+                return
+            if not args.local_path:
+                UserInterface.show_error("upload: the local_path argument is required")
+                return
+
             FileManager.upload(local_path=args.local_path, path=args.path, name=args.name, mimeType=args.mimeType,
                                uploadType=args.uploadType)
             if os.getenv("COMPLETER") == '1':
@@ -721,12 +805,8 @@ if __name__ == '__main__':
     readline.parse_and_bind('tab: complete')
 
     while True:
-        try:
-            pwd = PathNavigator.pwd(os.getenv("GOOGLE_CLOUD_CURRENT_PATH"))
-        except Exception as e:
-            UserInterface.show_error(f"Error in building the path: {e}")
-            os.environ["GOOGLE_CLOUD_CURRENT_PATH"] = os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID")
-            pwd = PathNavigator.pwd(os.getenv("GOOGLE_CLOUD_CURRENT_PATH"))
+        # приглашение строится по стеку текущего положения, без запросов к Drive
+        pwd = PathNavigator.cwd()
 
         input_string = input(f'{pwd} $ ')
 
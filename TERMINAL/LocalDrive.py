@@ -0,0 +1,677 @@
+import re
+import sys
+import json
+import uuid
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+GOOGLE_APPS_PREFIX = 'application/vnd.google-apps.'
+
+
+class DriveError(Exception):
+    """ Ошибка в формате Drive API: {"error": {"code", "message", "errors": [{"reason"}]}} """
+    def __init__(self, code, reason, message):
+        super().__init__(message)
+        self.code = code
+        self.reason = reason
+        self.message = message
+
+    def body(self):
+        return {'error': {'code': self.code, 'message': self.message,
+                          'errors': [{'domain': 'global', 'reason': self.reason, 'message': self.message}]}}
+
+
+class LocalDrive:
+    """
+    Локальный заменитель Drive API v3 для работы без сети и учетных данных.
+
+    Держит в памяти один диск и отвечает на то подмножество API, которым пользуется терминал:
+    files list/get/create/update/delete/copy/export/emptyTrash, загрузки media/multipart/resumable,
+    about, permissions, changes и пакетные запросы /batch/drive/v3.
+    Поддерживаются q из условий терминала ('X' in parents, name, mimeType, trashed, через and),
+    постраничная выдача и partial response (fields).
+
+    Запуск отдельно:  python LocalDrive.py --port 8088
+    Терминал:         GOOGLE_CLOUD_API_URL=http://127.0.0.1:8088 GOOGLE_CLOUD_OFFLINE=1 ./terminal.sh
+    Из тестов:        server, url = LocalDrive.serve()
+    """
+    # у настоящего диска корень - обычная папка со своим id, 'root' - его псевдоним
+    ROOT_ID = '0ALocalDriveRootFolder'
+    QUOTA_LIMIT = 15 * 1024 ** 3
+    DEFAULT_FILE_FIELDS = 'kind, id, name, mimeType'
+    MAX_BATCH = 100
+    EXPORT_FORMATS = {
+        'application/vnd.google-apps.document': ['text/plain', 'application/pdf',
+                                                 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'],
+        'application/vnd.google-apps.spreadsheet': ['text/csv', 'application/pdf',
+                                                    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'],
+        'application/vnd.google-apps.presentation': ['application/pdf', 'text/plain'],
+        'application/vnd.google-apps.drawing': ['image/png', 'application/pdf'],
+    }
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.files = {}
+        self.contents = {}
+        self.permissions = {}
+        # лента изменений: номер изменения = индекс + 1
+        self.changes = []
+        self.uploads = {}
+        self.files[LocalDrive.ROOT_ID] = {
+            'id': LocalDrive.ROOT_ID, 'name': 'My Drive', 'mimeType': FOLDER_MIME_TYPE, 'parents': [],
+            'createdTime': LocalDrive._now(), 'modifiedTime': LocalDrive._now(), 'trashed': False,
+        }
+
+    # ---------------------------------------------------------------- сервер
+
+    @staticmethod
+    def serve(host='127.0.0.1', port=0, drive=None):
+        """
+        Запускает сервер в фоновом потоке.
+
+        Returns:
+            tuple: (ThreadingHTTPServer, базовый адрес для GOOGLE_CLOUD_API_URL)
+        """
+        drive = drive or LocalDrive()
+        server = ThreadingHTTPServer((host, port), LocalDriveHandler)
+        server.daemon_threads = True
+        server.drive = drive
+        server.verbose = False
+        threading.Thread(target=server.serve_forever, name='LocalDrive', daemon=True).start()
+        return server, f'http://{host}:{server.server_address[1]}'
+
+    def dispatch(self, method, target, headers, body, base_url):
+        """
+        Обрабатывает один запрос.
+
+        Args:
+            method (str): HTTP метод.
+            target (str): Путь с query string.
+            headers (dict): Заголовки (имена в нижнем регистре).
+            body (bytes): Тело запроса.
+            base_url (str): Адрес сервера, для Location resumable-сессий.
+
+        Returns:
+            tuple: (код, заголовки, тело в bytes)
+        """
+        parts = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(parts.query, keep_blank_values=True).items()}
+        path = parts.path.rstrip('/')
+
+        try:
+            with self.lock:
+                return self._route(method, path, query, headers, body, base_url)
+        except DriveError as e:
+            return LocalDrive._json(e.code, e.body())
+
+    def _route(self, method, path, query, headers, body, base_url):
+        if path == '/batch/drive/v3' and method == 'POST':
+            return self._batch(headers, body, base_url)
+
+        if path.startswith('/upload/drive/v3/files'):
+            file_id = path[len('/upload/drive/v3/files/'):] if path != '/upload/drive/v3/files' else None
+            return self._upload(method, file_id, query, headers, body, base_url)
+
+        if not path.startswith('/drive/v3/'):
+            raise DriveError(404, 'notFound', f'Not Found: {path}')
+        route = path[len('/drive/v3/'):].split('/')
+
+        if route == ['about'] and method == 'GET':
+            return LocalDrive._json(200, self._select(self._about(), query.get('fields')))
+        if route == ['changes', 'startPageToken'] and method == 'GET':
+            return LocalDrive._json(200, {'kind': 'drive#startPageToken', 'startPageToken': str(len(self.changes) + 1)})
+        if route == ['changes'] and method == 'GET':
+            return self._list_changes(query)
+
+        if route[0] != 'files':
+            raise DriveError(404, 'notFound', f'Not Found: {path}')
+
+        if len(route) == 1:
+            if method == 'GET':
+                return self._list_files(query)
+            if method == 'POST':
+                return self._file_response(self._create(LocalDrive._body_json(body)), query)
+
+        elif route[1] == 'trash' and len(route) == 2 and method == 'DELETE':
+            for file_id in [file_id for file_id, file in self.files.items() if file['trashed']]:
+                if file_id in self.files:
+                    self._delete(file_id)
+            return 204, {}, b''
+
+        elif len(route) == 2:
+            file_id = self._resolve(route[1])
+            if method == 'GET':
+                if query.get('alt') == 'media':
+                    return self._media(file_id)
+                return self._file_response(file_id, query)
+            if method == 'PATCH':
+                self._update(file_id, LocalDrive._body_json(body), query)
+                return self._file_response(file_id, query)
+            if method == 'DELETE':
+                self._delete(file_id)
+                return 204, {}, b''
+
+        elif route[2] == 'copy' and len(route) == 3 and method == 'POST':
+            return self._file_response(self._copy(self._resolve(route[1]), LocalDrive._body_json(body)), query)
+
+        elif route[2] == 'export' and len(route) == 3 and method == 'GET':
+            return self._export(self._resolve(route[1]), query.get('mimeType'))
+
+        elif route[2] == 'permissions':
+            file_id = self._resolve(route[1])
+            if len(route) == 3 and method == 'GET':
+                return LocalDrive._json(200, {'kind': 'drive#permissionList',
+                                              'permissions': self.permissions.get(file_id, [])})
+            if len(route) == 3 and method == 'POST':
+                return LocalDrive._json(200, self._add_permission(file_id, LocalDrive._body_json(body)))
+            if len(route) == 4 and method == 'DELETE':
+                self._remove_permission(file_id, route[3])
+                return 204, {}, b''
+
+        raise DriveError(404, 'notFound', f'Not Found: {method} {path}')
+
+    # ---------------------------------------------------------------- ответы
+
+    @staticmethod
+    def _json(code, data):
+        return code, {'Content-Type': 'application/json; charset=UTF-8'}, json.dumps(data).encode('utf-8')
+
+    @staticmethod
+    def _body_json(body):
+        if not body:
+            return {}
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise DriveError(400, 'parseError', 'Parse Error')
+
+    @staticmethod
+    def _parse_fields(spec, index=0):
+        """ 'a, b(c, d)' -> {'a': None, 'b': {'c': None, 'd': None}} """
+        result = {}
+        name = ''
+        while index < len(spec):
+            char = spec[index]
+            if char == ',':
+                if name.strip():
+                    result[name.strip()] = None
+                name = ''
+                index += 1
+            elif char == '(':
+                result[name.strip()], index = LocalDrive._parse_fields(spec, index + 1)
+                name = ''
+            elif char == ')':
+                index += 1
+                break
+            else:
+                name += char
+                index += 1
+        if name.strip():
+            result[name.strip()] = None
+        return result, index
+
+    @staticmethod
+    def _select(data, fields):
+        """ Partial response: оставляет в data только поля из fields """
+        if not fields:
+            return data
+        if isinstance(fields, str):
+            fields, _ = LocalDrive._parse_fields(fields)
+        if '*' in fields:
+            return data
+        if isinstance(data, list):
+            return [LocalDrive._select(item, fields) for item in data]
+        if not isinstance(data, dict):
+            return data
+        return {key: LocalDrive._select(data[key], sub) if sub else data[key]
+                for key, sub in fields.items() if key in data}
+
+    def _file_response(self, file_id, query):
+        return LocalDrive._json(200, LocalDrive._select(self._public(file_id),
+                                                        query.get('fields') or LocalDrive.DEFAULT_FILE_FIELDS))
+
+    def _public(self, file_id):
+        """ Ресурс файла в формате Drive v3 """
+        file = dict(self.files[file_id])
+        file['kind'] = 'drive#file'
+        file['parents'] = list(file['parents'])
+        if file_id in self.contents:
+            content = self.contents[file_id]
+            file['size'] = str(len(content))
+            if not file['mimeType'].startswith(GOOGLE_APPS_PREFIX):
+                file['md5Checksum'] = hashlib.md5(content).hexdigest()
+        return file
+
+    # ---------------------------------------------------------------- файлы
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+    def _resolve(self, file_id):
+        if file_id == 'root':
+            return LocalDrive.ROOT_ID
+        if file_id not in self.files:
+            raise DriveError(404, 'notFound', f'File not found: {file_id}.')
+        return file_id
+
+    def _record_change(self, file_id, removed=False):
+        self.changes.append((file_id, removed))
+
+    def _create(self, metadata, content=None, mime_type=None):
+        """ Новый файл по метаданным (и содержимому) """
+        parents = metadata.get('parents') or [LocalDrive.ROOT_ID]
+        for parent_id in parents:
+            parent = self._resolve(parent_id)
+            if parent != LocalDrive.ROOT_ID and self.files[parent]['mimeType'] != FOLDER_MIME_TYPE:
+                raise DriveError(400, 'invalidParent', 'The specified parent is not a folder.')
+
+        file_id = uuid.uuid4().hex
+        now = LocalDrive._now()
+        self.files[file_id] = {
+            'id': file_id,
+            'name': metadata.get('name', 'Untitled'),
+            'mimeType': metadata.get('mimeType') or mime_type or 'application/octet-stream',
+            'parents': [self._resolve(parent_id) for parent_id in parents],
+            'createdTime': now,
+            'modifiedTime': metadata.get('modifiedTime', now),
+            'trashed': False,
+        }
+        if self.files[file_id]['mimeType'] != FOLDER_MIME_TYPE:
+            self.contents[file_id] = content or b''
+        self.permissions[file_id] = [{'kind': 'drive#permission', 'id': 'owner', 'type': 'user', 'role': 'owner'}]
+        self._record_change(file_id)
+        return file_id
+
+    def _descendants(self, file_id):
+        """ Все файлы ветки file_id (без нее самой) """
+        result = []
+        stack = [file_id]
+        while stack:
+            parent_id = stack.pop()
+            for child_id, child in self.files.items():
+                if parent_id in child['parents']:
+                    result.append(child_id)
+                    stack.append(child_id)
+        return result
+
+    def _update(self, file_id, metadata, query):
+        if file_id == LocalDrive.ROOT_ID:
+            raise DriveError(403, 'insufficientFilePermissions', 'The user does not have sufficient permissions for this file.')
+        file = self.files[file_id]
+
+        for key in ('name', 'mimeType', 'modifiedTime', 'description'):
+            if key in metadata:
+                file[key] = metadata[key]
+
+        if 'trashed' in metadata:
+            # корзина действует на всю ветку
+            for changed_id in [file_id] + self._descendants(file_id):
+                self.files[changed_id]['trashed'] = bool(metadata['trashed'])
+                self._record_change(changed_id)
+
+        add_parents = [parent for parent in query.get('addParents', '').split(',') if parent]
+        remove_parents = [parent for parent in query.get('removeParents', '').split(',') if parent]
+        for parent_id in add_parents:
+            parent_id = self._resolve(parent_id)
+            if parent_id == file_id or parent_id in self._descendants(file_id):
+                raise DriveError(400, 'invalidParent', 'A folder cannot be moved into itself or its descendants.')
+            if parent_id not in file['parents']:
+                file['parents'].append(parent_id)
+        for parent_id in remove_parents:
+            if parent_id in file['parents']:
+                file['parents'].remove(parent_id)
+
+        if 'modifiedTime' not in metadata:
+            file['modifiedTime'] = LocalDrive._now()
+        self._record_change(file_id)
+
+    def _delete(self, file_id):
+        """ Удаление насовсем, вместе с содержимым папки, как в Drive """
+        if file_id == LocalDrive.ROOT_ID:
+            raise DriveError(403, 'insufficientFilePermissions', 'The user does not have sufficient permissions for this file.')
+        for removed_id in self._descendants(file_id) + [file_id]:
+            self.files.pop(removed_id, None)
+            self.contents.pop(removed_id, None)
+            self.permissions.pop(removed_id, None)
+            self._record_change(removed_id, removed=True)
+
+    def _copy(self, file_id, metadata):
+        source = self.files[file_id]
+        if source['mimeType'] == FOLDER_MIME_TYPE:
+            raise DriveError(403, 'cannotCopyFile', 'This file cannot be copied by the user.')
+        copy = {
+            'name': metadata.get('name', source['name']),
+            'mimeType': source['mimeType'],
+            'parents': metadata.get('parents') or source['parents'],
+        }
+        return self._create(copy, self.contents.get(file_id, b''))
+
+    def _media(self, file_id):
+        file = self.files[file_id]
+        if file['mimeType'] == FOLDER_MIME_TYPE or file['mimeType'].startswith(GOOGLE_APPS_PREFIX):
+            raise DriveError(403, 'fileNotDownloadable',
+                             'Only files with binary content can be downloaded. Use Export with Docs Editors files.')
+        return 200, {'Content-Type': file['mimeType']}, self.contents.get(file_id, b'')
+
+    def _export(self, file_id, mime_type):
+        formats = LocalDrive.EXPORT_FORMATS.get(self.files[file_id]['mimeType'])
+        if not formats:
+            raise DriveError(403, 'fileNotExportable', 'Export only supports Docs Editors files.')
+        if mime_type not in formats:
+            raise DriveError(400, 'badRequest', 'The requested conversion is not supported.')
+        return 200, {'Content-Type': mime_type}, self.contents.get(file_id, b'')
+
+    def _add_permission(self, file_id, body):
+        permission = {'kind': 'drive#permission', 'id': uuid.uuid4().hex[:20],
+                      'type': body.get('type', 'user'), 'role': body.get('role', 'reader')}
+        if body.get('emailAddress'):
+            permission['emailAddress'] = body['emailAddress']
+        self.permissions.setdefault(file_id, []).append(permission)
+        return permission
+
+    def _remove_permission(self, file_id, permission_id):
+        permissions = self.permissions.get(file_id, [])
+        for permission in permissions:
+            if permission['id'] == permission_id:
+                if permission['role'] == 'owner':
+                    raise DriveError(403, 'cannotRemoveOwner', 'The owner of a file cannot be removed.')
+                permissions.remove(permission)
+                return
+        raise DriveError(404, 'notFound', f'Permission not found: {permission_id}.')
+
+    def _about(self):
+        usage = sum(len(content) for content in self.contents.values())
+        trash = sum(len(self.contents.get(file_id, b'')) for file_id, file in self.files.items() if file['trashed'])
+        return {
+            'kind': 'drive#about',
+            'user': {'displayName': 'Local Drive', 'emailAddress': 'local@localhost'},
+            'storageQuota': {'limit': str(LocalDrive.QUOTA_LIMIT), 'usage': str(usage),
+                             'usageInDrive': str(usage), 'usageInDriveTrash': str(trash)},
+            'exportFormats': LocalDrive.EXPORT_FORMATS,
+        }
+
+    # ---------------------------------------------------------------- списки
+
+    CONDITION = re.compile(r"""\s*(?:
+        '(?P<parent>(?:[^'\\]|\\.)*)'\s+in\s+parents
+      | (?P<field>name|mimeType)\s*(?P<op>!=|=|contains)\s*'(?P<value>(?:[^'\\]|\\.)*)'
+      | trashed\s*=\s*(?P<trashed>true|false)
+    )\s*""", re.VERBOSE)
+
+    @staticmethod
+    def _parse_query(q):
+        """ q из условий, соединенных and, -> список функций-фильтров """
+        filters = []
+        position = 0
+        while True:
+            match = LocalDrive.CONDITION.match(q, position)
+            if not match:
+                raise DriveError(400, 'invalid', 'Invalid Value')
+            position = match.end()
+
+            def unescape(value):
+                return re.sub(r'\\(.)', r'\1', value)
+
+            if match.group('parent') is not None:
+                parent_id = unescape(match.group('parent'))
+                filters.append(lambda file, parent_id=parent_id: parent_id in file['parents']
+                               or (parent_id == 'root' and LocalDrive.ROOT_ID in file['parents']))
+            elif match.group('field'):
+                field, op, value = match.group('field'), match.group('op'), unescape(match.group('value'))
+                if op == '=':
+                    filters.append(lambda file, field=field, value=value: file[field] == value)
+                elif op == '!=':
+                    filters.append(lambda file, field=field, value=value: file[field] != value)
+                else:
+                    filters.append(lambda file, field=field, value=value: value.lower() in file[field].lower())
+            else:
+                trashed = match.group('trashed') == 'true'
+                filters.append(lambda file, trashed=trashed: file['trashed'] == trashed)
+
+            if position == len(q):
+                return filters
+            connector = re.compile(r'and\s', re.IGNORECASE).match(q, position)
+            if not connector:
+                raise DriveError(400, 'invalid', 'Invalid Value')
+            position = connector.end()
+
+    def _list_files(self, query):
+        filters = LocalDrive._parse_query(query['q']) if query.get('q') else []
+        page_size = min(int(query.get('pageSize') or 100), 1000)
+        offset = int(query.get('pageToken') or 0)
+
+        # корень в files.list не попадает
+        matched = [file_id for file_id, file in self.files.items()
+                   if file_id != LocalDrive.ROOT_ID and all(check(file) for check in filters)]
+        page = matched[offset:offset + page_size]
+
+        result = {'kind': 'drive#fileList', 'incompleteSearch': False,
+                  'files': [self._public(file_id) for file_id in page]}
+        if offset + page_size < len(matched):
+            result['nextPageToken'] = str(offset + page_size)
+
+        fields = query.get('fields') or f'kind, nextPageToken, incompleteSearch, files({LocalDrive.DEFAULT_FILE_FIELDS})'
+        return LocalDrive._json(200, LocalDrive._select(result, fields))
+
+    def _list_changes(self, query):
+        if 'pageToken' not in query:
+            raise DriveError(400, 'required', 'Required parameter: pageToken')
+        try:
+            start = int(query['pageToken'])
+        except ValueError:
+            raise DriveError(400, 'invalid', 'Invalid Value')
+        if start < 1 or start > len(self.changes) + 1:
+            raise DriveError(404, 'notFound', 'Page token not found.')
+
+        page_size = min(int(query.get('pageSize') or 100), 1000)
+        page = self.changes[start - 1:start - 1 + page_size]
+
+        changes = []
+        for file_id, removed in page:
+            change = {'kind': 'drive#change', 'changeType': 'file', 'fileId': file_id,
+                      'removed': removed or file_id not in self.files}
+            if not change['removed']:
+                change['file'] = self._public(file_id)
+            changes.append(change)
+
+        result = {'kind': 'drive#changeList', 'changes': changes}
+        if start - 1 + page_size < len(self.changes):
+            result['nextPageToken'] = str(start + page_size)
+        else:
+            result['newStartPageToken'] = str(len(self.changes) + 1)
+        return LocalDrive._json(200, LocalDrive._select(result, query.get('fields')))
+
+    # ---------------------------------------------------------------- загрузки
+
+    @staticmethod
+    def _split_multipart(content_type, body):
+        """ Части multipart тела: список (заголовки, содержимое) """
+        match = re.search(r'boundary="?([^";]+)"?', content_type or '')
+        if not content_type.startswith('multipart/') or not match:
+            raise DriveError(400, 'badContent', 'Bad content type. Please use multipart.')
+        delimiter = b'--' + match.group(1).encode()
+
+        parts = []
+        for chunk in body.split(delimiter)[1:]:
+            if chunk.startswith(b'--'):
+                break
+            chunk = chunk[2:] if chunk.startswith(b'\r\n') else chunk.lstrip(b'\n')
+            head, _, content = chunk.partition(b'\r\n\r\n')
+            headers = {}
+            for line in head.decode('utf-8').split('\r\n'):
+                name, _, value = line.partition(':')
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+            if content.endswith(b'\r\n'):
+                content = content[:-2]
+            parts.append((headers, content))
+        return parts
+
+    def _upload(self, method, file_id, query, headers, body, base_url):
+        upload_type = query.get('uploadType')
+
+        if method == 'PUT' and query.get('upload_id'):
+            return self._resumable_chunk(query['upload_id'], headers, body)
+
+        if file_id is not None:
+            file_id = self._resolve(file_id)
+        if (method, file_id is None) not in (('POST', True), ('PATCH', False)):
+            raise DriveError(404, 'notFound', 'Not Found')
+
+        if upload_type == 'media':
+            metadata = {}
+            content = body
+        elif upload_type == 'multipart':
+            parts = LocalDrive._split_multipart(headers.get('content-type', ''), body)
+            if len(parts) != 2:
+                raise DriveError(400, 'badContent', 'Multipart body must contain metadata and media parts.')
+            metadata = LocalDrive._body_json(parts[0][1])
+            content = parts[1][1]
+        elif upload_type == 'resumable':
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {
+                'file_id': file_id,
+                'metadata': LocalDrive._body_json(body),
+                'mime_type': headers.get('x-upload-content-type'),
+                'fields': query.get('fields'),
+                'data': bytearray(),
+            }
+            location = f"{base_url}/upload/drive/v3/files?{urlencode({'uploadType': 'resumable', 'upload_id': upload_id})}"
+            return 200, {'Location': location, 'Content-Length': '0'}, b''
+        else:
+            raise DriveError(400, 'invalid', f'Invalid upload type: {upload_type}')
+
+        mime_type = headers.get('content-type', '').split(';')[0] if upload_type == 'media' else None
+        file_id = self._store_upload(file_id, metadata, content, mime_type)
+        return self._file_response(file_id, query)
+
+    def _store_upload(self, file_id, metadata, content, mime_type):
+        """ Содержимое в новый файл (file_id None) или в существующий """
+        if file_id is None:
+            return self._create(metadata, content, mime_type)
+        self._update(file_id, metadata, {})
+        self.contents[file_id] = bytes(content)
+        return file_id
+
+    def _resumable_chunk(self, upload_id, headers, body):
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            raise DriveError(404, 'notFound', 'Upload session not found.')
+        if upload.get('file_id_done'):
+            # сессия уже завершена: повтор последнего куска (ответ на него мог потеряться) получает тот же файл
+            return self._file_response(upload['file_id_done'], {'fields': upload['fields']})
+        data = upload['data']
+
+        match = re.match(r'bytes (\*|(\d+)-(\d+))/(\*|\d+)', headers.get('content-range', f'bytes 0-{len(body) - 1}/{len(body)}'))
+        if not match:
+            raise DriveError(400, 'badRequest', 'Invalid Content-Range header.')
+        total = None if match.group(4) == '*' else int(match.group(4))
+
+        if match.group(1) != '*':
+            start, end = int(match.group(2)), int(match.group(3))
+            if start > len(data) or end - start + 1 != len(body):
+                raise DriveError(400, 'badRequest', 'Content-Range does not match the session offset or body length.')
+            # повтор уже принятых байт просто перезаписывает их
+            data[start:start + len(body)] = body
+
+        if total is not None and len(data) >= total:
+            file_id = self._store_upload(upload['file_id'], upload['metadata'], bytes(data[:total]), upload['mime_type'])
+            upload['file_id_done'] = file_id
+            upload['data'] = None
+            return self._file_response(file_id, {'fields': upload['fields']})
+
+        response_headers = {'Content-Length': '0'}
+        if data:
+            response_headers['Range'] = f'bytes=0-{len(data) - 1}'
+        return 308, response_headers, b''
+
+    # ---------------------------------------------------------------- пакеты
+
+    def _batch(self, headers, body, base_url):
+        parts = LocalDrive._split_multipart(headers.get('content-type', ''), body)
+        if len(parts) > LocalDrive.MAX_BATCH:
+            raise DriveError(400, 'batchSizeTooLarge', f'A batch request can contain at most {LocalDrive.MAX_BATCH} calls.')
+
+        boundary = f'batch_{uuid.uuid4().hex}'
+        output = []
+        for part_headers, content in parts:
+            request_head, _, request_body = content.partition(b'\r\n\r\n')
+            lines = request_head.decode('utf-8').split('\r\n')
+            method, target = lines[0].split()[:2]
+            inner_headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                if name:
+                    inner_headers[name.strip().lower()] = value.strip()
+
+            code, response_headers, response_body = self.dispatch(method, target, inner_headers,
+                                                                  request_body.rstrip(b'\r\n'), base_url)
+
+            content_id = part_headers.get('content-id', '').strip('<>')
+            head = [f'--{boundary}', 'Content-Type: application/http', f'Content-ID: <response-{content_id}>', '',
+                    f'HTTP/1.1 {code} {LocalDriveHandler.responses.get(code, ("",))[0]}']
+            head += [f'{name}: {value}' for name, value in response_headers.items()]
+            output.append('\r\n'.join(head).encode() + b'\r\n\r\n' + response_body + b'\r\n')
+
+        output.append(f'--{boundary}--\r\n'.encode())
+        return 200, {'Content-Type': f'multipart/mixed; boundary={boundary}'}, b''.join(output)
+
+
+class LocalDriveHandler(BaseHTTPRequestHandler):
+    """ HTTP обертка над LocalDrive.dispatch, keep-alive как у настоящего Drive """
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        headers = {name.lower(): value for name, value in self.headers.items()}
+
+        code, response_headers, response_body = self.server.drive.dispatch(
+            self.command, self.path, headers, body, f"http://{self.headers.get('Host')}")
+
+        self.send_response(code)
+        for name, value in response_headers.items():
+            if name.lower() != 'content-length':
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(response_body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(response_body)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            # клиент закрыл соединение, не дочитав ответ
+            pass
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            sys.stderr.write(f"{self.address_string()} - {format % args}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local stand-in for the Google Drive v3 API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), LocalDriveHandler)
+    server.drive = LocalDrive()
+    server.verbose = args.verbose
+    print(f"LocalDrive is listening on http://{args.host}:{server.server_address[1]}")
+    print(f"Run the terminal with GOOGLE_CLOUD_API_URL=http://{args.host}:{server.server_address[1]} GOOGLE_CLOUD_OFFLINE=1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,349 @@
+import os
+import sqlite3
+import threading
+from Fields import Fields
+from MetadataStore import MetadataStore
+from PathCache import PathCache
+
+
+class MetadataIndex:
+    """
+    Локальный индекс метаданных всего Google Drive поверх SQLite.
+
+    Заполняется один раз полным обходом диска, после чего PathNavigator и FileManager
+    ищут файлы по имени, по родителю и по идентификатору в нем, а не через сеть.
+    Вместе с индексом хранится курсор ленты изменений Drive (changes.getStartPageToken):
+    перед каждой командой к индексу применяется только дельта из changes.list.
+    Все команды, изменяющие диск, сразу записывают результат в индекс (put/remove),
+    чтобы следующие шаги той же команды видели изменения.
+    Любое изменение файла в индексе выбрасывает из PathCache ветку под его старым путем.
+    Для команд просмотра индекс загружается в память в компактном виде (MetadataStore, см. store),
+    все изменения индекса сразу применяются и к нему.
+    """
+    # Поля, которые запрашиваются у Drive для индекса (files.get, files.create, files.update ...)
+    FIELDS = Fields.file('index')
+    # Те же поля для files.list
+    LIST_FIELDS = Fields.files('index')
+    # Те же поля для changes.list
+    CHANGES_FIELDS = f'nextPageToken, newStartPageToken, changes(fileId, removed, file({FIELDS}))'
+
+    _connection = None
+    _lock = threading.RLock()
+
+    @staticmethod
+    def path():
+        """ Путь к файлу индекса, можно переопределить через GOOGLE_CLOUD_INDEX_PATH """
+        return os.getenv("GOOGLE_CLOUD_INDEX_PATH") or os.path.join(
+            os.path.expanduser("~"), ".google_cloud_index.sqlite")
+
+    @staticmethod
+    def _connect():
+        """ Открывает (один раз за сессию) соединение с индексом и создает схему """
+        with MetadataIndex._lock:
+            if MetadataIndex._connection is None:
+                connection = sqlite3.connect(MetadataIndex.path(), check_same_thread=False)
+                connection.executescript("""
+                    PRAGMA journal_mode = WAL;
+                    PRAGMA synchronous = NORMAL;
+                    CREATE TABLE IF NOT EXISTS files (
+                        id TEXT PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        parent TEXT,
+                        mimeType TEXT,
+                        size INTEGER,
+                        md5Checksum TEXT,
+                        modifiedTime TEXT,
+                        trashed INTEGER NOT NULL DEFAULT 0
+                    );
+                    CREATE INDEX IF NOT EXISTS files_parent_name ON files (parent, name);
+                    CREATE INDEX IF NOT EXISTS files_name ON files (name);
+                    CREATE TABLE IF NOT EXISTS meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT
+                    );
+                """)
+                MetadataIndex._connection = connection
+            return MetadataIndex._connection
+
+    @staticmethod
+    def _get_meta(key):
+        row = MetadataIndex._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(key, value):
+        connection = MetadataIndex._connect()
+        if value is None:
+            connection.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @staticmethod
+    def _row_from_file(file):
+        """ field объект google drive v3 -> строка таблицы files """
+        parents = file.get('parents')
+        size = file.get('size')
+        return (
+            file['id'],
+            file['name'],
+            parents[0] if parents else None,
+            file.get('mimeType'),
+            int(size) if size is not None else None,
+            file.get('md5Checksum'),
+            file.get('modifiedTime'),
+            1 if file.get('trashed') else 0,
+        )
+
+    @staticmethod
+    def _file_from_row(row):
+        """ Строка таблицы files -> словарь в формате ответа Google Drive v3 """
+        file_id, name, parent, mime_type, size, md5, modified_time, trashed = row
+        file = {'id': file_id, 'name': name, 'mimeType': mime_type}
+        if parent:
+            file['parents'] = [parent]
+        if size is not None:
+            file['size'] = str(size)
+        if md5:
+            file['md5Checksum'] = md5
+        if modified_time:
+            file['modifiedTime'] = modified_time
+        file['trashed'] = bool(trashed)
+        return file
+
+    @staticmethod
+    def ready():
+        """ Построен ли индекс для диска текущего пользователя """
+        try:
+            with MetadataIndex._lock:
+                drive_id = MetadataIndex._get_meta('drive_id')
+        except sqlite3.Error:
+            return False
+        return drive_id is not None and drive_id == os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID")
+
+    @staticmethod
+    def build(drive_id, files, page_token):
+        """
+        Полностью перестраивает индекс.
+
+        Args:
+            drive_id (str): Идентификатор MyDrive, для которого строится индекс.
+            files (iterable): Все файлы диска (поля LIST_FIELDS), например FileManagerProxy.iter_list_of_files.
+                              Обходится лениво, поэтому в памяти не держится весь список.
+            page_token (str): Курсор ленты изменений, полученный ДО начала обхода,
+                              чтобы изменения, сделанные во время обхода, не потерялись.
+
+        Returns:
+            int: Количество проиндексированных файлов.
+        """
+        with MetadataIndex._lock:
+            PathCache.clear()
+            MetadataStore.clear()
+            connection = MetadataIndex._connect()
+            try:
+                with connection:
+                    # Пока индекс не достроен, он считается недоступным
+                    MetadataIndex._set_meta('drive_id', None)
+                    connection.execute("DELETE FROM files")
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (MetadataIndex._row_from_file(file) for file in files)
+                    )
+                    MetadataIndex._set_meta('page_token', page_token)
+                    MetadataIndex._set_meta('drive_id', drive_id)
+            except Exception:
+                with connection:
+                    MetadataIndex._set_meta('drive_id', None)
+                raise
+            return connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    @staticmethod
+    def page_token():
+        """ Курсор ленты изменений, с которого надо продолжить синхронизацию """
+        with MetadataIndex._lock:
+            return MetadataIndex._get_meta('page_token')
+
+    @staticmethod
+    def apply_changes(changes, page_token):
+        """
+        Применяет к индексу одну страницу changes.list и сдвигает курсор.
+        Все делается в одной транзакции: либо страница применена целиком вместе с курсором, либо нет.
+
+        Args:
+            changes (list): Элементы changes из ответа changes.list (поля CHANGES_FIELDS).
+            page_token (str): Курсор, с которого продолжать после этой страницы.
+        """
+        with MetadataIndex._lock:
+            PathCache.invalidate_ids(change['fileId'] for change in changes)
+            connection = MetadataIndex._connect()
+            with connection:
+                for change in changes:
+                    file = change.get('file')
+                    if change.get('removed') or not file:
+                        connection.execute("DELETE FROM files WHERE id = ?", (change['fileId'],))
+                    else:
+                        connection.execute(
+                            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            MetadataIndex._row_from_file(file)
+                        )
+                MetadataIndex._set_meta('page_token', page_token)
+
+            for change in changes:
+                file = change.get('file')
+                if change.get('removed') or not file:
+                    MetadataStore.remove(change['fileId'], branch=False)
+                else:
+                    MetadataStore.put(file)
+
+    @staticmethod
+    def invalidate():
+        """ Помечает индекс как недействительный, при следующем запуске он будет построен заново """
+        with MetadataIndex._lock:
+            PathCache.clear()
+            MetadataStore.clear()
+            connection = MetadataIndex._connect()
+            with connection:
+                MetadataIndex._set_meta('drive_id', None)
+                MetadataIndex._set_meta('page_token', None)
+
+    @staticmethod
+    def put(file):
+        """
+        Добавляет или обновляет файл в индексе.
+
+        Args:
+            file (dict): field объект google drive v3 (желательно с полями FIELDS).
+        """
+        if not file or 'id' not in file:
+            return
+        PathCache.invalidate_ids([file['id']])
+        if 'name' not in file or not MetadataIndex.ready():
+            return
+        with MetadataIndex._lock:
+            connection = MetadataIndex._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    MetadataIndex._row_from_file(file)
+                )
+            MetadataStore.put(file)
+
+    @staticmethod
+    def remove(file_id):
+        """ Удаляет файл из индекса вместе со всей веткой под ним """
+        PathCache.invalidate_ids([file_id])
+        if not MetadataIndex.ready():
+            return
+        with MetadataIndex._lock:
+            connection = MetadataIndex._connect()
+            with connection:
+                connection.execute("""
+                    WITH RECURSIVE branch(id) AS (
+                        SELECT ?
+                        UNION ALL
+                        SELECT files.id FROM files JOIN branch ON files.parent = branch.id
+                    )
+                    DELETE FROM files WHERE id IN branch
+                """, (file_id,))
+            MetadataStore.remove(file_id)
+
+    @staticmethod
+    def remove_trashed():
+        """ Удаляет из индекса все, что лежало в корзине (после emptyTrash) """
+        if not MetadataIndex.ready():
+            PathCache.clear()
+            return
+        with MetadataIndex._lock:
+            connection = MetadataIndex._connect()
+            trashed = connection.execute("SELECT id FROM files WHERE trashed = 1").fetchall()
+            PathCache.invalidate_ids(row[0] for row in trashed)
+            with connection:
+                connection.execute("DELETE FROM files WHERE trashed = 1")
+            MetadataStore.remove_trashed()
+
+    @staticmethod
+    def get(file_id):
+        """
+        Метаданные файла по идентификатору.
+
+        Returns:
+            dict: Файл в формате Google Drive v3 или None, если его нет в индексе.
+                  Для корня MyDrive возвращается папка без parents, как это делает сам Drive.
+        """
+        if file_id == os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID"):
+            return {'id': file_id, 'name': 'My Drive', 'mimeType': 'application/vnd.google-apps.folder'}
+
+        with MetadataIndex._lock:
+            row = MetadataIndex._connect().execute(
+                "SELECT * FROM files WHERE id = ?", (file_id,)
+            ).fetchone()
+        return MetadataIndex._file_from_row(row) if row else None
+
+    @staticmethod
+    def store():
+        """
+        Компактная копия индекса в памяти (MetadataStore).
+        Загружается из SQLite при первом обращении, дальше обновляется вместе с индексом.
+        """
+        with MetadataIndex._lock:
+            if not MetadataStore.loaded:
+                MetadataStore.load(MetadataIndex.iter_files())
+        return MetadataStore
+
+    @staticmethod
+    def find_by_name(name, mime_type=None):
+        """ Идентификаторы всех файлов с именем name (и, если указан, с нужным mimeType) """
+        with MetadataIndex._lock:
+            if mime_type:
+                rows = MetadataIndex._connect().execute(
+                    "SELECT id FROM files WHERE name = ? AND mimeType = ?", (name, mime_type)
+                ).fetchall()
+            else:
+                rows = MetadataIndex._connect().execute(
+                    "SELECT id FROM files WHERE name = ?", (name,)
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def children_by_name(parent_id, name, mime_type=None, with_trashed=False):
+        """
+        Идентификаторы файлов с именем name, лежащих непосредственно в parent_id (индекс (parent, name)).
+        Файлы из корзины - только при with_trashed=True.
+        """
+        query = "SELECT id FROM files WHERE parent = ? AND name = ?"
+        params = (parent_id, name)
+        if mime_type:
+            query += " AND mimeType = ?"
+            params += (mime_type,)
+        if not with_trashed:
+            query += " AND trashed = 0"
+        with MetadataIndex._lock:
+            rows = MetadataIndex._connect().execute(query, params).fetchall()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def children(parent_id, with_trashed=True):
+        """ Все файлы, лежащие непосредственно в parent_id (with_trashed=False - кроме лежащих в корзине) """
+        with MetadataIndex._lock:
+            if with_trashed:
+                rows = MetadataIndex._connect().execute(
+                    "SELECT * FROM files WHERE parent = ?", (parent_id,)
+                ).fetchall()
+            else:
+                rows = MetadataIndex._connect().execute(
+                    "SELECT * FROM files WHERE parent = ? AND trashed = 0", (parent_id,)
+                ).fetchall()
+        return [MetadataIndex._file_from_row(row) for row in rows]
+
+    @staticmethod
+    def iter_files():
+        """ Ленивый обход всех файлов индекса """
+        with MetadataIndex._lock:
+            cursor = MetadataIndex._connect().execute("SELECT * FROM files")
+
+        while True:
+            with MetadataIndex._lock:
+                rows = cursor.fetchmany(1000)
+            if not rows:
+                return
+            for row in rows:
+                yield MetadataIndex._file_from_row(row)
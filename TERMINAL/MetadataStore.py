@@ -0,0 +1,370 @@
+import threading
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class FileRecord:
+    """
+    Легкое представление одного файла MetadataStore.
+
+    Хранит только номер строки, сами данные лежат в колонках хранилища.
+    Поддерживает доступ как к словарю ответа Google Drive v3 (file['name'], file.get('size'),
+    'parents' in file.keys() ...), поэтому ls, tree и du работают с ним без изменений.
+    """
+    __slots__ = ('_row',)
+
+    KEYS = ('id', 'name', 'parents', 'mimeType', 'size', 'trashed')
+
+    def __init__(self, row):
+        self._row = row
+
+    def __getitem__(self, key):
+        value = MetadataStore._field(self._row, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = MetadataStore._field(self._row, key)
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return MetadataStore._field(self._row, key) is not None
+
+    def keys(self):
+        return [key for key in FileRecord.KEYS if key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def to_dict(self):
+        """ Обычный словарь в формате Google Drive v3 """
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"FileRecord({self.to_dict()})"
+
+
+class MetadataStore:
+    """
+    Компактная копия локального индекса (MetadataIndex) в памяти.
+
+    Вместо словаря на каждый файл данные лежат по колонкам:
+    родитель - номер строки в array('i'), размер - int64 в array('q'),
+    mimeType - номер в небольшой таблице различных mimeType (array('H')), trashed - bytearray.
+    Отдельными объектами остаются только идентификатор (str) и имя (bytes в UTF-8,
+    для кириллических имен это почти вдвое меньше str).
+    Для каждой папки хранится array('i') номеров дочерних строк, поэтому содержимое папки
+    получается без обхода всех файлов.
+    Строки не переиспользуются: удаленный файл помечается пустым именем.
+    По колонкам родителей и размеров разом считаются размеры всех папок (folder_size),
+    при наличии numpy - векторно.
+    Сюда попадают только поля, нужные командам просмотра (ls, tree, du ...),
+    полные метаданные остаются в SQLite.
+    """
+    NO_PARENT = -1
+    NO_SIZE = -1
+
+    _lock = threading.RLock()
+    loaded = False
+
+    # идентификатор -> номер строки
+    _rows = {}
+    # номер строки -> идентификатор
+    _ids = []
+    # номер строки -> имя в UTF-8; None - файл удален или строка только ссылка на родителя (корень, чужая папка)
+    _names = []
+    _parents = array('i')
+    _sizes = array('q')
+    _mimes = array('H')
+    _trashed = bytearray()
+    _mime_table = []
+    _mime_codes = {}
+    # номер строки папки -> array('i') номеров дочерних строк
+    _children = {}
+
+    # увеличивается при каждом изменении, по нему сбрасываются посчитанные размеры папок
+    _version = 0
+    _totals = None
+    _totals_version = -1
+
+    @staticmethod
+    def clear():
+        """ Очищает хранилище, до следующей загрузки оно считается не загруженным """
+        with MetadataStore._lock:
+            MetadataStore.loaded = False
+            MetadataStore._rows = {}
+            MetadataStore._ids = []
+            MetadataStore._names = []
+            MetadataStore._parents = array('i')
+            MetadataStore._sizes = array('q')
+            MetadataStore._mimes = array('H')
+            MetadataStore._trashed = bytearray()
+            MetadataStore._mime_table = []
+            MetadataStore._mime_codes = {}
+            MetadataStore._children = {}
+            MetadataStore._version += 1
+            MetadataStore._totals = None
+
+    @staticmethod
+    def load(files):
+        """
+        Заполняет хранилище заново.
+
+        Args:
+            files (iterable): Файлы в формате Google Drive v3, например MetadataIndex.iter_files().
+        """
+        with MetadataStore._lock:
+            MetadataStore.clear()
+            for file in files:
+                MetadataStore._put(file)
+            MetadataStore.loaded = True
+
+    @staticmethod
+    def _row_of(file_id):
+        """ Номер строки файла, при необходимости создается пустая строка-ссылка """
+        row = MetadataStore._rows.get(file_id)
+        if row is None:
+            row = len(MetadataStore._ids)
+            MetadataStore._rows[file_id] = row
+            MetadataStore._ids.append(file_id)
+            MetadataStore._names.append(None)
+            MetadataStore._parents.append(MetadataStore.NO_PARENT)
+            MetadataStore._sizes.append(MetadataStore.NO_SIZE)
+            MetadataStore._mimes.append(0)
+            MetadataStore._trashed.append(0)
+        return row
+
+    @staticmethod
+    def _mime_code(mime_type):
+        code = MetadataStore._mime_codes.get(mime_type)
+        if code is None:
+            code = len(MetadataStore._mime_table)
+            MetadataStore._mime_table.append(mime_type)
+            MetadataStore._mime_codes[mime_type] = code
+        return code
+
+    @staticmethod
+    def _detach(row):
+        """ Убирает строку из списка детей ее родителя """
+        parent = MetadataStore._parents[row]
+        if MetadataStore._names[row] is not None and parent != MetadataStore.NO_PARENT:
+            MetadataStore._children[parent].remove(row)
+
+    @staticmethod
+    def _put(file):
+        MetadataStore._version += 1
+        row = MetadataStore._row_of(file['id'])
+        MetadataStore._detach(row)
+
+        parents = file.get('parents')
+        size = file.get('size')
+
+        MetadataStore._names[row] = file['name'].encode()
+        MetadataStore._sizes[row] = int(size) if size is not None else MetadataStore.NO_SIZE
+        MetadataStore._mimes[row] = MetadataStore._mime_code(file.get('mimeType'))
+        MetadataStore._trashed[row] = 1 if file.get('trashed') else 0
+
+        if parents:
+            parent = MetadataStore._row_of(parents[0])
+            MetadataStore._parents[row] = parent
+            MetadataStore._children.setdefault(parent, array('i')).append(row)
+        else:
+            MetadataStore._parents[row] = MetadataStore.NO_PARENT
+
+    @staticmethod
+    def put(file):
+        """ Добавляет или обновляет файл (field объект google drive v3), если хранилище загружено """
+        if not file or 'id' not in file or 'name' not in file:
+            return
+        with MetadataStore._lock:
+            if MetadataStore.loaded:
+                MetadataStore._put(file)
+
+    @staticmethod
+    def remove(file_id, branch=True):
+        """
+        Удаляет файл из хранилища.
+
+        Args:
+            file_id (str): Идентификатор файла.
+            branch (bool): Удалять ли вместе с ним всю ветку под ним.
+                           Лента изменений присылает каждого потомка отдельно, ей ветка не нужна.
+        """
+        with MetadataStore._lock:
+            if not MetadataStore.loaded:
+                return
+            row = MetadataStore._rows.get(file_id)
+            if row is None:
+                return
+
+            MetadataStore._version += 1
+            MetadataStore._detach(row)
+            stack = [row]
+            while stack:
+                row = stack.pop()
+                MetadataStore._names[row] = None
+                MetadataStore._parents[row] = MetadataStore.NO_PARENT
+                MetadataStore._sizes[row] = MetadataStore.NO_SIZE
+                if branch:
+                    stack.extend(MetadataStore._children.pop(row, ()))
+
+    @staticmethod
+    def remove_trashed():
+        """ Удаляет все, что лежало в корзине (после emptyTrash) """
+        with MetadataStore._lock:
+            if not MetadataStore.loaded:
+                return
+            for row, trashed in enumerate(MetadataStore._trashed):
+                if trashed and MetadataStore._names[row] is not None:
+                    MetadataStore.remove(MetadataStore._ids[row])
+
+    @staticmethod
+    def _field(row, key):
+        """ Значение поля key строки row в формате Google Drive v3 или None, если поля нет """
+        if MetadataStore._names[row] is None:
+            return None
+        if key == 'id':
+            return MetadataStore._ids[row]
+        if key == 'name':
+            return MetadataStore._names[row].decode()
+        if key == 'parents':
+            parent = MetadataStore._parents[row]
+            return [MetadataStore._ids[parent]] if parent != MetadataStore.NO_PARENT else None
+        if key == 'mimeType':
+            return MetadataStore._mime_table[MetadataStore._mimes[row]]
+        if key == 'size':
+            size = MetadataStore._sizes[row]
+            # Drive отдает размер строкой
+            return str(size) if size != MetadataStore.NO_SIZE else None
+        if key == 'trashed':
+            return bool(MetadataStore._trashed[row])
+        return None
+
+    @staticmethod
+    def get(file_id):
+        """ FileRecord файла или None, если его нет в хранилище """
+        with MetadataStore._lock:
+            row = MetadataStore._rows.get(file_id)
+            if row is None or MetadataStore._names[row] is None:
+                return None
+            return FileRecord(row)
+
+    @staticmethod
+    def children(parent_id, with_trashed=True):
+        """ FileRecord всех файлов, лежащих непосредственно в parent_id """
+        with MetadataStore._lock:
+            parent = MetadataStore._rows.get(parent_id)
+            if parent is None:
+                return []
+            return [FileRecord(row) for row in MetadataStore._children.get(parent, ())
+                    if with_trashed or not MetadataStore._trashed[row]]
+
+    @staticmethod
+    def count():
+        """ Количество файлов в хранилище """
+        with MetadataStore._lock:
+            return sum(1 for name in MetadataStore._names if name is not None)
+
+    @staticmethod
+    def _own_sizes():
+        """ Собственные размеры строк и родители, по которым размер поднимается вверх.
+        Удаленные и лежащие в корзине файлы не учитываются и ничего не передают родителям """
+        parents = []
+        sizes = []
+        for row, name in enumerate(MetadataStore._names):
+            if name is None or MetadataStore._trashed[row]:
+                parents.append(MetadataStore.NO_PARENT)
+                sizes.append(0)
+            else:
+                parents.append(MetadataStore._parents[row])
+                sizes.append(max(MetadataStore._sizes[row], 0))
+        return parents, sizes
+
+    @staticmethod
+    def _totals_numpy():
+        """
+        Размеры всех веток одним проходом по колонкам.
+        Глубина каждой строки считается скачками по указателям на родителей (по проходу на уровень),
+        затем уровни обрабатываются от самого глубокого к корню: np.add.at прибавляет
+        итоги всех строк уровня к их родителям.
+        """
+        parents = np.frombuffer(MetadataStore._parents, dtype=np.int32).astype(np.int64)
+        sizes = np.frombuffer(MetadataStore._sizes, dtype=np.int64).clip(min=0)
+
+        alive = np.array([name is not None for name in MetadataStore._names], dtype=bool)
+        alive &= np.frombuffer(bytes(MetadataStore._trashed), dtype=np.uint8) == 0
+        parents = np.where(alive, parents, MetadataStore.NO_PARENT)
+        totals = np.where(alive, sizes, 0)
+
+        depth = np.zeros(len(parents), dtype=np.int64)
+        ancestors = parents.copy()
+        linked = ancestors != MetadataStore.NO_PARENT
+        while linked.any():
+            depth += linked
+            ancestors[linked] = parents[ancestors[linked]]
+            linked = ancestors != MetadataStore.NO_PARENT
+
+        order = np.argsort(-depth, kind='stable')
+        levels = np.flatnonzero(np.diff(depth[order])) + 1
+        for rows in np.split(order, levels):
+            if not len(rows) or depth[rows[0]] == 0:
+                break
+            np.add.at(totals, parents[rows], totals[rows])
+
+        return totals
+
+    @staticmethod
+    def _totals_python():
+        """ То же, что _totals_numpy, без numpy: обход в ширину от корней и сложение в обратном порядке """
+        parents, totals = MetadataStore._own_sizes()
+
+        children = {}
+        for row, parent in enumerate(parents):
+            if parent != MetadataStore.NO_PARENT:
+                children.setdefault(parent, []).append(row)
+
+        order = [row for row, parent in enumerate(parents) if parent == MetadataStore.NO_PARENT]
+        for row in order:
+            order.extend(children.get(row, ()))
+
+        for row in reversed(order):
+            parent = parents[row]
+            if parent != MetadataStore.NO_PARENT:
+                totals[parent] += totals[row]
+
+        return totals
+
+    @staticmethod
+    def folder_size(file_id):
+        """
+        Суммарный размер ветки под file_id (для файла - его собственный размер).
+        Размеры всех папок считаются разом при первом обращении после изменения хранилища,
+        дальше каждый запрос - просто чтение из массива.
+
+        Returns:
+            int: Размер в байтах или None, если файла нет в хранилище.
+        """
+        with MetadataStore._lock:
+            row = MetadataStore._rows.get(file_id)
+            if row is None:
+                return None
+
+            if MetadataStore._totals_version != MetadataStore._version:
+                if np is not None:
+                    MetadataStore._totals = MetadataStore._totals_numpy()
+                else:
+                    MetadataStore._totals = MetadataStore._totals_python()
+                MetadataStore._totals_version = MetadataStore._version
+
+            return int(MetadataStore._totals[row])
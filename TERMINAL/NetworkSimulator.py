@@ -0,0 +1,377 @@
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import http.client
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+
+class Link:
+    """
+    Канал с пропускной способностью rate байт/с, общий для всех соединений:
+    порции данных проходят по очереди, как через один узкий WAN-канал.
+    """
+    def __init__(self, rate):
+        self.rate = rate
+        self.free_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def transfer(self, size):
+        """ Ждет, пока по каналу пройдут size байт (без ограничения - сразу) """
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.free_at = max(self.free_at, now) + size / self.rate
+            wait = self.free_at - now
+        time.sleep(wait)
+
+
+class NetworkSimulator:
+    """
+    Прокси между терминалом и Drive API, имитирующий плохую сеть.
+
+    Пересылает запросы на upstream (настоящий Drive или LocalDrive) и по пути вносит:
+        задержку запроса из распределения (constant, uniform, normal, exponential, pareto);
+        ограничение полосы на прием и отдачу, общее для всех соединений;
+        всплески 429: в среднем раз в burst_every секунд все запросы burst_duration секунд получают 429;
+        случайные 500/502/503 с вероятностью error_rate;
+        обрыв соединения посреди тела запроса или ответа с вероятностью drop_rate (для каждого тела);
+        зависание посреди тела запроса или ответа на stall_ms с вероятностью stall_rate.
+    Оборванный посреди тела запрос до upstream не доходит, как загрузка, потерянная по дороге.
+    Location resumable-сессий переписывается на адрес прокси, так что куски загрузки тоже идут через него.
+
+    Запуск:   python NetworkSimulator.py --upstream http://127.0.0.1:8088 --profile remote-office
+    Терминал: GOOGLE_CLOUD_API_URL=http://127.0.0.1:8089 ./terminal.sh
+    Из тестов: server, url = NetworkSimulator.serve(upstream, drop_rate=0.1)
+    """
+    CHUNK_SIZE = 16 * 1024
+    # заголовки одного соединения, через прокси не передаются
+    HOP_HEADERS = ('connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'te', 'trailer', 'upgrade', 'host')
+    DEFAULTS = {
+        'latency_ms': 0,
+        'jitter_ms': 0,
+        'latency_dist': 'constant',
+        'down_kbps': 0,
+        'up_kbps': 0,
+        'burst_every': 0,
+        'burst_duration': 0,
+        'retry_after': 0,
+        'error_rate': 0,
+        'drop_rate': 0,
+        'stall_rate': 0,
+        'stall_ms': 0,
+    }
+    # готовые наборы условий, отдельные параметры переопределяют профиль
+    PROFILES = {
+        'lan': {'latency_ms': 1},
+        'wan': {'latency_ms': 60, 'jitter_ms': 15, 'latency_dist': 'normal', 'down_kbps': 20000, 'up_kbps': 5000},
+        'remote-office': {'latency_ms': 180, 'jitter_ms': 0, 'latency_dist': 'pareto', 'down_kbps': 4000,
+                          'up_kbps': 1000, 'burst_every': 60, 'burst_duration': 5, 'error_rate': 0.01,
+                          'drop_rate': 0.01, 'stall_rate': 0.02, 'stall_ms': 5000},
+        'flaky': {'latency_ms': 100, 'jitter_ms': 50, 'latency_dist': 'uniform', 'burst_every': 20,
+                  'burst_duration': 3, 'error_rate': 0.05, 'drop_rate': 0.05},
+    }
+    PARETO_SHAPE = 2.5
+
+    def __init__(self, upstream, seed=None, **conditions):
+        unknown = set(conditions) - set(NetworkSimulator.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown network conditions: {', '.join(sorted(unknown))}")
+
+        self.upstream = urlsplit(upstream.rstrip('/'))
+        self.conditions = dict(NetworkSimulator.DEFAULTS, **conditions)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.down = Link(self.conditions['down_kbps'] * 1000 / 8)
+        self.up = Link(self.conditions['up_kbps'] * 1000 / 8)
+
+        now = time.monotonic()
+        self.burst_until = now
+        self.next_burst = now + self._interval()
+        self.stats = {'requests': 0, 'rate_limited': 0, 'errors': 0, 'dropped': 0, 'stalled': 0}
+
+    @staticmethod
+    def serve(upstream, host='127.0.0.1', port=0, seed=None, **conditions):
+        """
+        Запускает прокси в фоновом потоке.
+
+        Returns:
+            tuple: (ThreadingHTTPServer, адрес прокси для GOOGLE_CLOUD_API_URL)
+        """
+        server = ThreadingHTTPServer((host, port), NetworkSimulatorHandler)
+        server.daemon_threads = True
+        server.simulator = NetworkSimulator(upstream, seed=seed, **conditions)
+        server.verbose = False
+        threading.Thread(target=server.serve_forever, name='NetworkSimulator', daemon=True).start()
+        return server, f'http://{host}:{server.server_address[1]}'
+
+    # ---------------------------------------------------------------- случайные события
+
+    def chance(self, probability):
+        """ Случилось ли событие с вероятностью probability """
+        with self.lock:
+            return probability > 0 and self.random.random() < probability
+
+    def offset(self, probability, size):
+        """ Случайная точка в теле из size байт, если событие с вероятностью probability случилось, иначе None """
+        if not self.chance(probability):
+            return None
+        with self.lock:
+            return self.random.randint(0, max(size - 1, 0))
+
+    def error_status(self):
+        with self.lock:
+            return self.random.choice((500, 502, 503))
+
+    def _interval(self):
+        """ Время до следующего всплеска 429 (экспоненциальное, в среднем burst_every) """
+        if not self.conditions['burst_every']:
+            return float('inf')
+        return self.random.expovariate(1 / self.conditions['burst_every'])
+
+    def latency(self):
+        """ Задержка запроса в секундах по выбранному распределению """
+        mean = self.conditions['latency_ms'] / 1000
+        jitter = self.conditions['jitter_ms'] / 1000
+        distribution = self.conditions['latency_dist']
+        with self.lock:
+            if distribution == 'uniform':
+                value = self.random.uniform(mean - jitter, mean + jitter)
+            elif distribution == 'normal':
+                value = self.random.gauss(mean, jitter)
+            elif distribution == 'exponential':
+                value = self.random.expovariate(1 / mean) if mean else 0
+            elif distribution == 'pareto':
+                # тяжелый хвост с тем же средним: редкие, но очень долгие ответы
+                shape = NetworkSimulator.PARETO_SHAPE
+                value = mean * (shape - 1) / shape * self.random.paretovariate(shape)
+            else:
+                value = mean
+        return max(value, 0)
+
+    def rate_limited(self):
+        """ Идет ли сейчас всплеск 429 """
+        with self.lock:
+            now = time.monotonic()
+            if now >= self.next_burst:
+                self.burst_until = now + self.conditions['burst_duration']
+                self.next_burst = self.burst_until + self._interval()
+            return now < self.burst_until
+
+    def count(self, event):
+        with self.lock:
+            self.stats[event] += 1
+
+    def connect(self):
+        """ Новое соединение с upstream """
+        if self.upstream.scheme == 'https':
+            return http.client.HTTPSConnection(self.upstream.netloc, timeout=300)
+        return http.client.HTTPConnection(self.upstream.netloc, timeout=300)
+
+    def report(self):
+        return ', '.join(f'{event}: {count}' for event, count in self.stats.items())
+
+
+class NetworkSimulatorHandler(BaseHTTPRequestHandler):
+    """ Одно клиентское соединение с прокси """
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        simulator = self.server.simulator
+        simulator.count('requests')
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self._receive(length)
+        if body is None:
+            return
+
+        time.sleep(simulator.latency())
+
+        if simulator.rate_limited():
+            simulator.count('rate_limited')
+            error = {'error': {'code': 429, 'message': 'Rate Limit Exceeded',
+                               'errors': [{'domain': 'usageLimits', 'reason': 'rateLimitExceeded',
+                                           'message': 'Rate Limit Exceeded'}]}}
+            headers = {'Retry-After': str(simulator.conditions['retry_after'])} if simulator.conditions['retry_after'] else {}
+            return self._reply(429, headers, json.dumps(error).encode())
+
+        if simulator.chance(simulator.conditions['error_rate']):
+            simulator.count('errors')
+            code = simulator.error_status()
+            error = {'error': {'code': code, 'message': 'Backend Error',
+                               'errors': [{'domain': 'global', 'reason': 'backendError', 'message': 'Backend Error'}]}}
+            return self._reply(code, {}, json.dumps(error).encode())
+
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() not in NetworkSimulator.HOP_HEADERS}
+        path = simulator.upstream.path + self.path
+
+        connection = simulator.connect()
+        try:
+            connection.request(self.command, path, body=body, headers=headers)
+            upstream = connection.getresponse()
+            self._forward(upstream)
+        except OSError as e:
+            error = {'error': {'code': 502, 'message': f'Upstream unavailable: {e}'}}
+            self._reply(502, {}, json.dumps(error).encode())
+        finally:
+            connection.close()
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            # клиент сам закрыл соединение (в том числе после обрыва, внесенного прокси)
+            pass
+
+    def _receive(self, length):
+        """
+        Тело запроса, прошедшее через канал отдачи, с возможным зависанием или обрывом посреди него.
+
+        Returns:
+            bytes: Тело запроса или None, если соединение оборвано.
+        """
+        simulator = self.server.simulator
+        drop_at = simulator.offset(simulator.conditions['drop_rate'], length) if length else None
+        stall_at = simulator.offset(simulator.conditions['stall_rate'], length) if length else None
+        parts = []
+        received = 0
+        while received < length:
+            chunk = self.rfile.read(min(length - received, NetworkSimulator.CHUNK_SIZE))
+            if not chunk:
+                break
+
+            if stall_at is not None and received + len(chunk) > stall_at:
+                simulator.count('stalled')
+                time.sleep(simulator.conditions['stall_ms'] / 1000)
+                stall_at = None
+
+            if drop_at is not None and received + len(chunk) > drop_at:
+                simulator.count('dropped')
+                self._drop()
+                return None
+
+            simulator.up.transfer(len(chunk))
+            parts.append(chunk)
+            received += len(chunk)
+        return b''.join(parts)
+
+    def _drop(self):
+        """ Обрыв: соединение закрывается без ответа или посреди него """
+        self.close_connection = True
+        self.connection.shutdown(socket.SHUT_RDWR)
+
+    def _reply(self, code, headers, body):
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _forward(self, upstream):
+        """ Ответ upstream клиенту: по каналу приема, с возможным зависанием или обрывом посреди тела """
+        simulator = self.server.simulator
+        proxy_url = f"http://{self.headers.get('Host')}"
+        upstream_url = f'{simulator.upstream.scheme}://{simulator.upstream.netloc}'
+
+        self.send_response(upstream.status)
+        length = upstream.getheader('Content-Length')
+        for name, value in upstream.getheaders():
+            if name.lower() in NetworkSimulator.HOP_HEADERS or name.lower() == 'content-length':
+                continue
+            if name.lower() == 'location':
+                value = value.replace(upstream_url, proxy_url, 1)
+            self.send_header(name, value)
+        # без Content-Length тело отдается по частям (chunked), как у настоящего Drive
+        chunked = length is None and self.command != 'HEAD' and upstream.status not in (204, 304)
+        self.send_header('Transfer-Encoding' if chunked else 'Content-Length', 'chunked' if chunked else length or '0')
+        self.end_headers()
+
+        # байт до обрыва/зависания: случайная точка в пределах тела (или первых 64 КиБ, если длина неизвестна)
+        size = int(length) if length else 64 * 1024
+        drop_at = simulator.offset(simulator.conditions['drop_rate'], size)
+        stall_at = simulator.offset(simulator.conditions['stall_rate'], size)
+        sent = 0
+
+        while True:
+            chunk = upstream.read(NetworkSimulator.CHUNK_SIZE)
+            if not chunk:
+                break
+
+            if stall_at is not None and sent + len(chunk) > stall_at:
+                simulator.count('stalled')
+                time.sleep(simulator.conditions['stall_ms'] / 1000)
+                stall_at = None
+
+            if drop_at is not None and sent + len(chunk) > drop_at:
+                simulator.count('dropped')
+                self._write(chunk[:drop_at - sent], chunked)
+                self.wfile.flush()
+                # клиент получает меньше байт, чем обещано, и закрытое соединение
+                self._drop()
+                return
+
+            simulator.down.transfer(len(chunk))
+            self._write(chunk, chunked)
+            sent += len(chunk)
+
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+
+    def _write(self, data, chunked):
+        if not data:
+            return
+        if chunked:
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        else:
+            self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            sys.stderr.write(f"{self.address_string()} - {format % args}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='HTTP proxy that simulates WAN conditions in front of the Drive API')
+    parser.add_argument('--upstream', default='https://www.googleapis.com', help='Drive API (or LocalDrive) address')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--profile', choices=NetworkSimulator.PROFILES, help='preset conditions')
+    parser.add_argument('--seed', type=int, help='random seed for reproducible runs')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    parser.add_argument('--latency-ms', type=float, help='mean request latency')
+    parser.add_argument('--jitter-ms', type=float, help='latency spread (uniform and normal distributions)')
+    parser.add_argument('--latency-dist', choices=('constant', 'uniform', 'normal', 'exponential', 'pareto'))
+    parser.add_argument('--down-kbps', type=float, help='download bandwidth cap, kbit/s (0 - unlimited)')
+    parser.add_argument('--up-kbps', type=float, help='upload bandwidth cap, kbit/s (0 - unlimited)')
+    parser.add_argument('--burst-every', type=float, help='mean seconds between 429 bursts (0 - none)')
+    parser.add_argument('--burst-duration', type=float, help='length of a 429 burst, seconds')
+    parser.add_argument('--retry-after', type=float, help='Retry-After sent with 429 (0 - header omitted)')
+    parser.add_argument('--error-rate', type=float, help='probability of a 500/502/503 response')
+    parser.add_argument('--drop-rate', type=float, help='probability of dropping the connection mid-body (request or response)')
+    parser.add_argument('--stall-rate', type=float, help='probability of a mid-body stall (request or response)')
+    parser.add_argument('--stall-ms', type=float, help='length of a mid-body stall')
+    args = parser.parse_args()
+
+    conditions = dict(NetworkSimulator.PROFILES.get(args.profile, {}))
+    conditions.update({name: value for name, value in vars(args).items()
+                       if name in NetworkSimulator.DEFAULTS and value is not None})
+
+    server = ThreadingHTTPServer((args.host, args.port), NetworkSimulatorHandler)
+    server.simulator = NetworkSimulator(args.upstream, seed=args.seed, **conditions)
+    server.verbose = args.verbose
+    print(f"NetworkSimulator: http://{args.host}:{server.server_address[1]} -> {args.upstream}")
+    print(f"Conditions: {server.simulator.conditions}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{server.simulator.report()}")
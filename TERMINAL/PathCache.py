@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+class PathCache:
+    """
+    Ограниченный по размеру кэш соответствий путь -> идентификатор и идентификатор -> путь.
+
+    Пути хранятся абсолютными от корня MyDrive, без ~ и без слешей по краям ("a/b/c", корень - "").
+    Путь -> идентификатор хранится вместе с видом поиска (только папки, файлы с mimeType ...),
+    так как от него зависит результат validate_path.
+    При изменении файла из кэша выбрасывается вся ветка под его путем, остальное остается.
+
+    Об изменениях, сделанных не в этом терминале, кэш узнает только из ленты изменений индекса.
+    Без индекса чтение передает max_age (обычно TTL, GOOGLE_CLOUD_PATH_CACHE_TTL секунд):
+    более старые записи считаются промахом и разбираются заново.
+    """
+    MAX_SIZE = 10000
+    TTL = float(os.getenv("GOOGLE_CLOUD_PATH_CACHE_TTL", "30"))
+
+    # (путь, вид поиска) -> (идентификатор, время записи)
+    _paths = OrderedDict()
+    # идентификатор -> (путь, время записи)
+    _ids = OrderedDict()
+    _lock = threading.RLock()
+
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def _in_subtree(path, root):
+        """ Лежит ли path в ветке root (включая сам root) """
+        return root == "" or path == root or path.startswith(root + "/")
+
+    @staticmethod
+    def _evict(mapping):
+        while len(mapping) > PathCache.MAX_SIZE:
+            mapping.popitem(last=False)
+
+    @staticmethod
+    def _fresh(mapping, key, max_age):
+        """ Значение записи key, если она есть и не старше max_age секунд (устаревшая удаляется) """
+        entry = mapping.get(key)
+        if entry is None:
+            return None
+        value, stored = entry
+        if max_age is not None and time.monotonic() - stored > max_age:
+            del mapping[key]
+            return None
+        mapping.move_to_end(key)
+        return value
+
+    @staticmethod
+    def get_id(path, kind, count=True, max_age=None):
+        """
+        Идентификатор по абсолютному пути.
+
+        Args:
+            path (str): Абсолютный путь.
+            kind (str): Вид поиска, с которым путь был разобран.
+            count (bool): Учитывать ли обращение в счетчиках попаданий/промахов.
+            max_age (float, optional): Не доверять записям старше max_age секунд.
+
+        Returns:
+            str: Идентификатор или None, если пути нет в кэше.
+        """
+        with PathCache._lock:
+            file_id = PathCache._fresh(PathCache._paths, (path, kind), max_age)
+            if count:
+                if file_id is not None:
+                    PathCache.hits += 1
+                else:
+                    PathCache.misses += 1
+            return file_id
+
+    @staticmethod
+    def get_path(file_id, count=True, max_age=None):
+        """ Абсолютный путь по идентификатору или None, если его нет в кэше (или запись старше max_age) """
+        with PathCache._lock:
+            path = PathCache._fresh(PathCache._ids, file_id, max_age)
+            if count:
+                if path is not None:
+                    PathCache.hits += 1
+                else:
+                    PathCache.misses += 1
+            return path
+
+    @staticmethod
+    def put(path, kind, file_id):
+        """ Запоминает соответствие в обе стороны """
+        with PathCache._lock:
+            now = time.monotonic()
+            PathCache._paths[(path, kind)] = (file_id, now)
+            PathCache._paths.move_to_end((path, kind))
+            PathCache._ids[file_id] = (path, now)
+            PathCache._ids.move_to_end(file_id)
+            PathCache._evict(PathCache._paths)
+            PathCache._evict(PathCache._ids)
+
+    @staticmethod
+    def put_path(file_id, path):
+        """ Запоминает только идентификатор -> путь (например, после pwd) """
+        with PathCache._lock:
+            PathCache._ids[file_id] = (path, time.monotonic())
+            PathCache._ids.move_to_end(file_id)
+            PathCache._evict(PathCache._ids)
+
+    @staticmethod
+    def invalidate_path(path):
+        """ Выбрасывает из кэша ветку под абсолютным путем path """
+        with PathCache._lock:
+            PathCache._drop_subtrees([path])
+
+    @staticmethod
+    def invalidate_ids(files_id):
+        """
+        Выбрасывает из кэша ветки под всеми известными путями файлов files_id.
+        Вызывается при любом изменении файла: переименование, перемещение, удаление, корзина ...
+
+        Args:
+            files_id (iterable): Идентификаторы измененных файлов.
+        """
+        files_id = set(files_id)
+        if not files_id:
+            return
+
+        with PathCache._lock:
+            roots = set()
+            for file_id in files_id:
+                entry = PathCache._ids.pop(file_id, None)
+                if entry is not None:
+                    roots.add(entry[0])
+            # путь мог остаться только в прямом отображении (второе вытеснено по размеру)
+            for (path, kind), (file_id, _) in PathCache._paths.items():
+                if file_id in files_id:
+                    roots.add(path)
+            PathCache._drop_subtrees(roots)
+
+    @staticmethod
+    def _drop_subtrees(roots):
+        if not roots:
+            return
+        if "" in roots:
+            PathCache.clear()
+            return
+
+        for key in [key for key in PathCache._paths
+                    if any(PathCache._in_subtree(key[0], root) for root in roots)]:
+            del PathCache._paths[key]
+        for file_id in [file_id for file_id, (path, _) in PathCache._ids.items()
+                        if any(PathCache._in_subtree(path, root) for root in roots)]:
+            del PathCache._ids[file_id]
+
+    @staticmethod
+    def clear():
+        with PathCache._lock:
+            PathCache._paths.clear()
+            PathCache._ids.clear()
+
+    @staticmethod
+    def stats():
+        """ Счетчики попаданий и промахов и текущий размер кэша """
+        with PathCache._lock:
+            return {
+                'hits': PathCache.hits,
+                'misses': PathCache.misses,
+                'paths': len(PathCache._paths),
+                'ids': len(PathCache._ids),
+            }
@@ -1,7 +1,10 @@
 import re
 import os
 import readline
+from Fields import Fields
 from FileManagerProxy import FileManagerProxy
+from MetadataIndex import MetadataIndex
+from PathCache import PathCache
 from UserInterface import UserInterface
 
 
@@ -15,147 +18,314 @@ class PathNavigator:
                 'rm', 'touch', 'mv', 'ren', 'trash',
                 'restore', 'mimeType', 'emptyTrash', 'tree', 'du',
                 'share', 'quota', 'export', 'export_format', 'ChangeMime',
-                'upload', 'sync'
+                'upload', 'sync', 'cache'
                 ]
     STRUCT = []
+    FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+    # События обхода ветки (walk_structure)
+    ENTER = "enter"
+    LEAVE = "leave"
+    FILE = "file"
+
+    # Текущее положение: стек (идентификатор, имя) папок от корня (сам корень не входит) до текущей папки.
+    # Поддерживается командой cd, по нему строится приглашение без единого запроса к Drive
+    LOCATION = []
 
     @staticmethod
-    def validate_path(path: str, current_path=os.getenv("GOOGLE_CLOUD_CURRENT_PATH"), check_file=False, mimeType=None):
+    def validate_path(path: str, current_path=os.getenv("GOOGLE_CLOUD_CURRENT_PATH"), check_file=False, mimeType=None,
+                      with_trashed=False):
         # ОПАСНО не указывать current_path напрямую, так как питон заполняет это поле,
         # базовым значением, которе мы указали в GCT.current_path = root
         """
         Проверяет и возвращает идентификатор каталога по указанному пути.
 
+        Путь приводится к абсолютному и сначала ищется в PathCache.
+        При промахе он разбирается сверху вниз: от самого длинного уже известного префикса
+        (или от корня) по одному компоненту ищутся дети с нужным именем.
+        Каждый разобранный префикс попадает в PathCache.
+
         Args:
             path (str): Путь для проверки.
             current_path (str): Текущий путь.
             check_file (bool): Включать файлы в зону поиска?
             mimeType (str): Сузить круг поиска до определенного mimeTyep.
+            with_trashed (bool): Искать и среди файлов в корзине (для restore). Такой путь разбирается без PathCache.
 
         Returns:
             str or None: Идентификатор папки, если путь существует, иначе None.
         """
-        import re
-
-        path = re.sub('\n',"", path)
+        path = re.sub('\n', "", path)
 
         path_parts = path.strip("/").split("/")
 
-        # ожидаемый конечный родитель
+        # откуда начинаем спуск
         if path_parts[0] == "~":
-            should_parents = os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID")
+            start_id = os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID")
+            base_parts = []
             path_parts.pop(0)
-            if not path_parts:
-                return should_parents
+        else:
+            start_id = current_path
+            base_parts = PathNavigator._abspath_parts(current_path)
+
+        if not path_parts:
+            return start_id
 
+        # ищем файл, только если последний компонент - имя, а не . или ..
+        if check_file and path_parts[-1] not in (".", ".."):
+            last_mime_type = mimeType
+            kind = f"file:{mimeType or ''}"
         else:
-            should_parents = current_path
+            last_mime_type = PathNavigator.FOLDER_MIME_TYPE
+            kind = "folder"
+
+        if base_parts is None or with_trashed:
+            # путь текущей папки неизвестен (например, она уже удалена) или ищем в корзине: разбираем без кэша
+            return PathNavigator._walk(start_id, path_parts, last_mime_type, with_trashed=with_trashed)
+
+        # . и .. разворачиваем прямо в тексте пути
+        abs_parts = list(base_parts)
+        for part in path_parts:
+            if part == ".":
+                continue
+            if part == "..":
+                if not abs_parts:
+                    # выше корня подняться нельзя
+                    return None
+                abs_parts.pop()
+                continue
+            abs_parts.append(part)
+
+        if not abs_parts:
+            return os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID")
+
+        abs_path = "/".join(abs_parts)
+
+        max_age = PathNavigator._cache_age()
+        file_id = PathCache.get_id(abs_path, kind, max_age=max_age)
+        if file_id:
+            return file_id
+
+        # начинаем с самого длинного известного префикса-папки
+        start = 0
+        start_id = os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID")
+        for index in range(len(abs_parts) - 1, 0, -1):
+            prefix_id = PathCache.get_id("/".join(abs_parts[:index]), "folder", count=False, max_age=max_age)
+            if prefix_id:
+                start, start_id = index, prefix_id
+                break
+
+        file_id = PathNavigator._walk(start_id, abs_parts[start:], last_mime_type, abs_parts[:start])
+        if not file_id and start:
+            # среди одноименных папок известный префикс мог оказаться не той веткой
+            file_id = PathNavigator._walk(os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID"), abs_parts, last_mime_type, [])
+
+        if file_id:
+            PathCache.put(abs_path, kind, file_id)
+        return file_id
 
-        def check_parents(parents_id, path_index):
-            """Рекурсивная функция для проверки каждого родителя до корневой папки"""
-            post_path = FileManagerProxy.get_file_metadata(parents_id)
+    @staticmethod
+    def _walk(start_id, path_parts, last_mime_type, prefix_parts=None, with_trashed=False):
+        """
+        Спуск по компонентам пути от папки start_id.
+        При одинаковых именах перебираются все кандидаты, .. берется из указателя на родителя.
 
-            # запрашиваем ид родителя
-            post_path_id = post_path["parents"][0]
+        Args:
+            start_id (str): Папка, от которой начинается спуск.
+            path_parts (list): Компоненты пути.
+            last_mime_type (str): mimeType последнего компонента (None - любой).
+            prefix_parts (list): Абсолютный путь start_id, если известен.
+                                 Тогда разобранные папки запоминаются в PathCache.
+            with_trashed (bool): Искать и среди файлов в корзине.
 
-            if len(path_parts) == path_index:
-                if post_path_id == should_parents:
-                    return True
-                else:
-                    return None
+        Returns:
+            str or None: Идентификатор найденного файла.
+        """
+        def walk(folder_id, index):
+            if index == len(path_parts):
+                return folder_id
 
-            name_post_path = FileManagerProxy.look_for_file(file_id=post_path_id)
+            part = path_parts[index]
 
-            # если именя родителя этого пути не совпал с ожидаемым, выходим из рекурсии
-            if name_post_path != path_parts[path_index]:
-                return None
+            if part == ".":
+                return walk(folder_id, index + 1)
 
-            return check_parents(post_path_id, path_index + 1)
+            if part == "..":
+                parent_id = FileManagerProxy.get_parent_id(folder_id)
+                # выше корня подняться нельзя
+                return walk(parent_id, index + 1) if parent_id else None
 
-        def handle_double_dots(current_path):
-            """обработка .. в пути"""
-            nonlocal should_parents
-            if path_parts and path_parts[0] == "..":
-                # получаем ид родителя и удаляем .. из пути
-                should_parents = FileManagerProxy.get_file_metadata(current_path)['parents'][0]
-                path_parts.pop(0)
-                return handle_double_dots(should_parents)
+            if index == len(path_parts) - 1:
+                mime_type = last_mime_type
+            else:
+                mime_type = PathNavigator.FOLDER_MIME_TYPE
 
-        handle_double_dots(current_path)
+            for child_id in FileManagerProxy.look_for_child(folder_id, part, mime_type, with_trashed):
+                found = walk(child_id, index + 1)
+                if found:
+                    if prefix_parts is not None and mime_type == PathNavigator.FOLDER_MIME_TYPE:
+                        PathCache.put("/".join(prefix_parts + path_parts[:index + 1]), "folder", child_id)
+                    return found
 
-        if not path_parts:
-            return should_parents
+            return None
 
-        if path_parts[0] == ".":
-            # если требуется начать с нынешней директории
-            should_parents = current_path
-            path_parts.pop(0)
-            if not path_parts:
-                return should_parents
+        return walk(start_id, 0)
 
-        path_parts = path_parts[::-1]
+    @staticmethod
+    def _ancestors(file_id):
+        """
+        Имена файла и всех его предков снизу вверх.
 
-        if not check_file:
-            list_id = FileManagerProxy.look_for_file(name=path_parts[0], mime_type="application/vnd.google-apps.folder")
-        else:
-            if mimeType:
-                list_id = FileManagerProxy.look_for_file(name=path_parts[0], mime_type=mimeType)
-            else:
-                list_id = FileManagerProxy.look_for_file(name=path_parts[0])
+        Returns:
+            tuple: (список имен от file_id к корню, дошли ли до корня MyDrive)
+        """
+        names = []
+        while True:
+            post_path = FileManagerProxy.get_file_metadata(file_id, Fields.file('parents'))
 
-        if not list_id:
-            return None
+            try:
+                # Выделяем идентификатор родительской папки
+                parent_id = post_path["parents"][0]
+            except (KeyError, IndexError, TypeError):
+                return names, file_id == os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID")
+
+            names.append(post_path['name'])
+            file_id = parent_id
+
+    @staticmethod
+    def _cache_age():
+        """
+        Сколько секунд доверять записям PathCache: с индексом - сколько угодно (кэш чистит лента изменений),
+        без него - PathCache.TTL, иначе изменения, сделанные вне терминала, не были бы видны до перезапуска.
+        """
+        return None if MetadataIndex.ready() else PathCache.TTL
+
+    @staticmethod
+    def _abspath_parts(file_id):
+        """
+        Абсолютный путь файла в виде списка имен (через PathCache).
+
+        Returns:
+            list or None: Имена от корня до file_id или None, если файл не лежит в MyDrive.
+        """
+        if file_id == os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID"):
+            return []
+
+        if PathNavigator.LOCATION and file_id == PathNavigator.LOCATION[-1][0]:
+            return [name for _, name in PathNavigator.LOCATION]
 
-        # проверяем все папки с именем куда мы должны переместиться
-        for parent_id in list_id:
-            if check_parents(parent_id, 1):
-                return parent_id
+        path = PathCache.get_path(file_id, max_age=PathNavigator._cache_age())
+        if path is None:
+            names, reached_root = PathNavigator._ancestors(file_id)
+            if not reached_root:
+                return None
+            path = "/".join(names[::-1])
+            PathCache.put_path(file_id, path)
 
-        return None
+        return path.split("/")
 
     @staticmethod
     def pwd(current_path_id: str):
         """
-        Возвращает текущий путь от корня до текущей папки.
+        Возвращает путь от корня до указанной папки.
 
         Args:
-            current_path_id (str): Идентификатор текущей папки.
+            current_path_id (str): Идентификатор папки.
+
+        Returns:
+            str: Полный путь от корня до папки.
+        """
+        new_path = PathNavigator._abspath_parts(current_path_id)
+
+        if new_path is None:
+            # Файл вне MyDrive: путь до самого верхнего известного предка
+            names, _ = PathNavigator._ancestors(current_path_id)
+            new_path = names[::-1]
+
+        return "MyDrive/" + "".join(f"{name}/" for name in new_path)
+
+    @staticmethod
+    def cwd():
+        """
+        Путь текущей папки для приглашения командной строки.
+        Строится только по стеку LOCATION, без запросов к Drive.
 
         Returns:
             str: Полный путь от корня до текущей папки.
         """
-        new_path = []
+        now_path = "".join(f"{name}/" for _, name in PathNavigator.LOCATION)
+        os.environ["GOOGLE_CLOUD_CURRENT_ABSPATH_STR"] = now_path
+        return "MyDrive/" + now_path
 
-        def check_parents(parents_id):
-            """Функция для заполнения пути начиная с последней директории вплоть до корня"""
-            # Получаем данные о родительской папке
-            post_path = FileManagerProxy.get_file_metadata(parents_id)
+    @staticmethod
+    def set_location(location):
+        """
+        Делает текущей последнюю папку стека location.
 
-            try:
-                # Выделяем идентификатор родительской папки для род. папки
-                post_path_id = post_path["parents"][0]
-            except (KeyError, IndexError):
-                return
-
-            # Выделяем имя и записываем
-            name_post_path = FileManagerProxy.look_for_file(file_id=parents_id)
-            new_path.append(name_post_path)
-
-            # Рекурсивно вызываем функцию для родительской папки
-            check_parents(parents_id=post_path_id)
-
-        check_parents(current_path_id)
-
-        if new_path:
-            # Обратный порядок, так как мы шли от текущей папки к корневой
-            new_path.reverse()
-            now_path = "/".join(new_path) + "/"
-            # Соединяем элементы списка в строку
-            os.environ["GOOGLE_CLOUD_CURRENT_ABSPATH_STR"] = now_path
-            return "MyDrive/" + now_path
+        Args:
+            location (list): Стек (идентификатор, имя) от корня до новой текущей папки, [] - корень.
+        """
+        PathNavigator.LOCATION = location
+        if location:
+            os.environ["GOOGLE_CLOUD_CURRENT_PATH"] = location[-1][0]
         else:
-            os.environ["GOOGLE_CLOUD_CURRENT_ABSPATH_STR"] = ""
-            return "MyDrive/"
+            os.environ["GOOGLE_CLOUD_CURRENT_PATH"] = os.getenv("GOOGLE_CLOUD_MY_DRIVE_ID")
+        os.environ["GOOGLE_CLOUD_CURRENT_ABSPATH_STR"] = "".join(f"{name}/" for _, name in location)
+
+    @staticmethod
+    def _location_of(file_id):
+        """ Стек (идентификатор, имя) от корня до file_id по указателям на родителей """
+        location = []
+        while True:
+            file = FileManagerProxy.get_file_metadata(file_id, Fields.file('parents'))
+            if not file or not file.get('parents'):
+                return location[::-1]
+            location.append((file_id, file['name']))
+            file_id = file['parents'][0]
+
+    @staticmethod
+    def change_directory(path: str):
+        """
+        Переход в папку path (команда cd) с обновлением стека LOCATION.
+
+        Args:
+            path (str): Путь к новой текущей папке.
+
+        Returns:
+            str or None: Идентификатор новой текущей папки или None, если путь некорректен.
+        """
+        new_path = PathNavigator.validate_path(path=path, current_path=os.getenv("GOOGLE_CLOUD_CURRENT_PATH"))
+        if not new_path:
+            return None
+
+        PathNavigator.set_location(PathNavigator._location_of(new_path))
+        return new_path
+
+    @staticmethod
+    def refresh_location():
+        """
+        Сверяет стек LOCATION с локальным индексом после команды:
+        текущую папку или ее предков могли переименовать, переместить, удалить или убрать в корзину.
+        Пока индекс не построен, стек не трогаем, чтобы не ходить в сеть.
+        """
+        if not PathNavigator.LOCATION or not MetadataIndex.ready():
+            return
+
+        current_id = PathNavigator.LOCATION[-1][0]
+
+        file = MetadataIndex.get(current_id)
+        gone = file is None
+        # текущая папка или любой ее предок в корзине (trash ., trash ..): тоже возвращаемся в корень
+        while file is not None and not gone:
+            gone = file.get('trashed', False)
+            file = MetadataIndex.get(file['parents'][0]) if file.get('parents') else None
+
+        if gone:
+            UserInterface.show_error("Current folder was deleted or moved to trash, returning to MyDrive/")
+            PathNavigator.set_location([])
+            return
+
+        PathNavigator.set_location(PathNavigator._location_of(current_id))
 
     @staticmethod
     def gather_needed_paths(path: str):
@@ -197,55 +367,111 @@ class PathNavigator:
         return {"start_path": start_path, "path_to_create": path_to_create[::-1]}
 
     @staticmethod
-    def gather_structure(source_id: str):
+    def _children_lookup(fields=None):
         """
-        Выделяет всю ветку начная с файла source и заканчивая всеми путями исходящими из него.
+        Функция папка -> ее файлы (без корзины) для обхода веток.
+        С индексом дети берутся из MetadataStore, без него карта родитель -> дети
+        строится один раз одним обходом диска, а не запросом на каждую папку.
 
         Args:
-            source_id (str): Файл, с которого начнается выделяемая ветка.
+            fields (str, optional): Поля files.list для обхода без индекса (Fields.files(...)).
+        """
+        if MetadataIndex.ready():
+            store = MetadataIndex.store()
 
-        Returns:
-            lisе: список файлов в СТРОГОЙ послдеовательности для копирования.
-                    "?" - сигнал о заврешении ветки в пути. Надо сделать шаг назад:
-                            присваиваем destination_id ид папки, сразу после "?"
-                    "!" - сигнал о начале ветки в пути. Надо сделать шаг вперед:
-                            присваиваем destination_id ид родительской папки текщуей папки.
+            def children_of(folder_id):
+                return store.children(folder_id, with_trashed=False)
+
+            return children_of
+
+        children = {}
+        for file in FileManagerProxy.iter_list_of_files(q="trashed = false", fields=fields):
+            if file.get('parents'):
+                children.setdefault(file['parents'][0], []).append(file)
+
+        def children_of(folder_id):
+            return children.get(folder_id, [])
+
+        return children_of
+
+    @staticmethod
+    def walk_structure(source_id: str, dirs_only=False, fields=None):
         """
+        Обходит всю ветку начиная с source_id в глубину, без рекурсии.
+        События отдаются лениво, по мере обхода, поэтому глубина дерева не ограничена стеком Python.
 
-        all_files = FileManagerProxy.get_list_of_files(called_directly=False)
+        Args:
+            source_id (str): Папка, с которой начинается ветка (сама она в обход не входит).
+            dirs_only (bool): Обходить только папки.
+            fields (str, optional): Какие поля нужны операции (Fields.files(...)), если индекса нет.
+                                    По умолчанию Fields.files('children').
+
+        Yields:
+            tuple: (событие, field объект google drive v3), где событие:
+                    ENTER - вход в папку, дальше идет ее содержимое;
+                    LEAVE - все содержимое папки пройдено (та же папка, что и в ENTER);
+                    FILE - файл (не папка).
+        """
+        children_of = PathNavigator._children_lookup(fields)
 
-        subfiles = []
+        # стек: (папка, итератор по еще не пройденным детям)
+        stack = [(None, iter(children_of(source_id)))]
 
-        for file in all_files:
-            if 'parents' in file and file['parents'][0] == source_id:
-                if file['mimeType'] == 'application/vnd.google-apps.folder':
-                    # ОЧень похоже на поиск в глубину (алгоритм DFS) !->?
-                    subfiles = (subfiles + ["!"] + [file] +
-                                PathNavigator.gather_structure(file['id']) + ["?"])
-                else:
-                    subfiles.append(file)
+        while stack:
+            folder, children = stack[-1]
+            file = next(children, None)
 
-        return subfiles
+            if file is None:
+                stack.pop()
+                if folder is not None:
+                    yield PathNavigator.LEAVE, folder
+                continue
+
+            if file['mimeType'] == PathNavigator.FOLDER_MIME_TYPE:
+                yield PathNavigator.ENTER, file
+                stack.append((file, iter(children_of(file['id']))))
+            elif not dirs_only:
+                yield PathNavigator.FILE, file
 
     @staticmethod
-    def get_child_files(source_id: str):
+    def get_child_files(source_id: str, with_trashed=False):
         """
-        Выделяет все файлы лежащие в source_id
+        Выделяет все файлы лежащие в source_id.
+        Без индекса фильтр по родителю выполняется на стороне Drive: один небольшой запрос вместо обхода диска.
 
         Args:
             source_id (str): Родительская папка.
+            with_trashed (bool): Учитывать ли файлы, лежащие в корзине.
 
         Returns:
             list_child: список файлов находящихся в каталоге source_id.
         """
-        all_files = FileManagerProxy.get_list_of_files(called_directly=False)
-        list_child = []
+        if MetadataIndex.ready():
+            return MetadataIndex.store().children(source_id, with_trashed)
+
+        q = f"'{source_id}' in parents"
+        if not with_trashed:
+            q += " and trashed = false"
+
+        return list(FileManagerProxy.iter_list_of_files(q=q))
+
+    @staticmethod
+    def get_child_names(source_id: str):
+        """
+        Имена файлов, лежащих в source_id, для проверки коллизий имен (mkdir, touch, cp ...).
+        Множество получается одним запросом и переиспользуется при подборе свободного имени.
 
-        for file in all_files:
-            if 'parents' in file and file['parents'][0] == source_id:
-                list_child.append(file)
+        Args:
+            source_id (str): Родительская папка.
 
-        return list_child
+        Returns:
+            set: Имена дочерних файлов.
+        """
+        if MetadataIndex.ready():
+            return {child['name'] for child in MetadataIndex.store().children(source_id, with_trashed=False)}
+
+        q = f"'{source_id}' in parents and trashed = false"
+        return {child['name'] for child in FileManagerProxy.iter_list_of_files(q=q, fields=Fields.files('names'))}
 
     @staticmethod
     def get_mime_description():
@@ -374,35 +600,18 @@ class PathNavigator:
             indent = PathNavigator.pwd(source_id)[8:]
             PathNavigator.STRUCT.append("~/" + indent[:-1])
 
-        files = PathNavigator.gather_structure(source_id)
-
-        iterator = iter(files)
-
-        # использую стандартный итератор для фикса проблемы с извлечением следующего элемента при "?"
-        for file in iterator:
+        for event, file in PathNavigator.walk_structure(source_id):
 
-            if file == "!":
-                next_file = next(iterator, None)
-                if not next_file:
-                    break
-                elif next_file == "?":
-                    file = "?"
-                else:
-                    PathNavigator.STRUCT.append(f"~/{indent}{next_file['name']}/")
-                    # улиняем путь так как поднялись на одну папку вверх
-                    if next_file["mimeType"] == 'application/vnd.google-apps.folder':
-                        indent = indent + next_file['name'] + "/"
-                    continue
+            if event == PathNavigator.ENTER:
+                PathNavigator.STRUCT.append(f"~/{indent}{file['name']}/")
+                # улиняем путь так как поднялись на одну папку вверх
+                indent = indent + file['name'] + "/"
 
-            if file == "?":
+            elif event == PathNavigator.LEAVE:
                 # урезаем путь так как опустились на одну папку вверх
-                indent = indent[:-1]
-                i = len(indent) - 1
-                while i >= 0 and indent[i] != "/":
-                    indent = indent[:-1]
-                    i -= 1
+                indent = indent[:-len(file['name']) - 1]
 
-            if file != '!' and file != '?':
+            else:
                 PathNavigator.STRUCT.append(f"~/{indent}{file['name']}")
         stop_loading()
 
@@ -0,0 +1,73 @@
+import os
+import time
+import threading
+
+
+class RateLimiter:
+    """
+    Клиентский ограничитель частоты запросов (token bucket), общий для всех потоков.
+
+    Корзина пополняется со скоростью RATE токенов в секунду и вмещает до BURST токенов,
+    каждый запрос к Drive забирает токен (пакетный запрос - по токену на каждую часть).
+    Квота Drive по умолчанию - 12 000 запросов в минуту на пользователя (200 в секунду), по умолчанию
+    берем половину: 100 запросов в секунду с запасом на всплеск 200, чтобы оставить место другим клиентам
+    того же аккаунта. Настраивается через GOOGLE_CLOUD_QPS и GOOGLE_CLOUD_BURST (QPS 0 - без ограничения).
+    Когда Drive все же отвечает превышением лимита, корзина опустошается (penalize),
+    и притормаживают все потоки, а не только тот, что получил ошибку.
+    """
+    RATE = float(os.getenv("GOOGLE_CLOUD_QPS", "100"))
+    BURST = float(os.getenv("GOOGLE_CLOUD_BURST", "200"))
+
+    _tokens = BURST
+    _updated = time.monotonic()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _refill():
+        now = time.monotonic()
+        RateLimiter._tokens = min(RateLimiter.BURST,
+                                  RateLimiter._tokens + (now - RateLimiter._updated) * RateLimiter.RATE)
+        RateLimiter._updated = now
+
+    @staticmethod
+    def acquire(cost=1):
+        """
+        Ждет, пока в корзине наберется cost токенов, и забирает их.
+        Запрос дороже BURST ждет полную корзину и уводит ее в минус, следующие запросы подождут.
+
+        Args:
+            cost (int): Сколько запросов к квоте Drive стоит вызов.
+        """
+        while True:
+            wait = RateLimiter.reserve(cost)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    @staticmethod
+    def reserve(cost=1):
+        """
+        Неблокирующий вариант acquire (для asyncio): забирает токены, если они есть.
+
+        Returns:
+            float: 0, если токены взяты, иначе сколько секунд подождать перед новой попыткой.
+        """
+        if RateLimiter.RATE <= 0:
+            return 0
+
+        with RateLimiter._lock:
+            RateLimiter._refill()
+            need = min(cost, RateLimiter.BURST)
+            if RateLimiter._tokens >= need:
+                RateLimiter._tokens -= cost
+                return 0
+            return (need - RateLimiter._tokens) / RateLimiter.RATE
+
+    @staticmethod
+    def penalize(seconds):
+        """ Drive сообщил о превышении лимита: ближайшие seconds секунд токенов не будет ни у кого """
+        if RateLimiter.RATE <= 0:
+            return
+        with RateLimiter._lock:
+            RateLimiter._refill()
+            RateLimiter._tokens = min(RateLimiter._tokens, -seconds * RateLimiter.RATE)
@@ -0,0 +1,116 @@
+import asyncio
+import random
+import requests
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+
+class RetryPolicy:
+    """
+    Политика повторов для одного запроса к Drive (создается на каждый запрос).
+
+    Ошибки делятся на классы, у каждого свой бюджет повторов (BUDGETS):
+        rate_limit - 429 и 403 с причиной rateLimitExceeded / userRateLimitExceeded;
+        server - 500, 502, 503, 504;
+        network - обрыв соединения или таймаут.
+    Пауза перед повтором - заголовок Retry-After, если сервер его прислал, иначе
+    decorrelated jitter: случайное число между BASE_DELAY и утроенной прошлой паузой.
+    В обоих случаях пауза не больше MAX_DELAY.
+    Неидемпотентный запрос (retry_network=False) после обрыва связи не повторяется:
+    он мог дойти до сервера, и повтор выполнил бы его второй раз.
+    """
+    BASE_DELAY = 1.0
+    MAX_DELAY = 64.0
+    BUDGETS = {
+        'rate_limit': 8,
+        'server': 5,
+        'network': 4,
+    }
+    SERVER_STATUS = (500, 502, 503, 504)
+    RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+    # обрывы связи (в том числе посреди тела ответа) и таймауты requests и, если установлен, aiohttp (AsyncDrive)
+    NETWORK_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                      requests.exceptions.Timeout, asyncio.TimeoutError)
+    if aiohttp is not None:
+        NETWORK_ERRORS += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+    def __init__(self, retry_network=True):
+        """
+        Args:
+            retry_network (bool, optional): Повторять ли запрос после обрыва связи или таймаута.
+        """
+        self.retry_network = retry_network
+        self.attempts = {error_class: 0 for error_class in RetryPolicy.BUDGETS}
+        self.delay = RetryPolicy.BASE_DELAY
+
+    @staticmethod
+    def classify(response=None, error=None):
+        """
+        Класс ошибки для ответа или исключения.
+
+        Returns:
+            str: Класс из BUDGETS или None, если повторять бессмысленно.
+        """
+        if error is not None:
+            if isinstance(error, RetryPolicy.NETWORK_ERRORS):
+                return 'network'
+            return None
+
+        if response.status_code == 429:
+            return 'rate_limit'
+        if response.status_code == 403 and any(reason in response.text for reason in RetryPolicy.RATE_LIMIT_REASONS):
+            return 'rate_limit'
+        if response.status_code in RetryPolicy.SERVER_STATUS:
+            return 'server'
+        return None
+
+    @staticmethod
+    def retry_after(response):
+        """ Значение заголовка Retry-After в секундах (число или HTTP-дата) или None """
+        value = response.headers.get('Retry-After') if response is not None else None
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def next_delay(self):
+        """ Следующая пауза по схеме decorrelated jitter """
+        self.delay = min(RetryPolicy.MAX_DELAY, random.uniform(RetryPolicy.BASE_DELAY, self.delay * 3))
+        return self.delay
+
+    def should_retry(self, response=None, error=None):
+        """
+        Решает, повторять ли запрос.
+
+        Args:
+            response: Ответ сервера (requests.Response или BatchResponse), если он есть.
+            error (Exception): Исключение requests или aiohttp, если ответа нет.
+
+        Returns:
+            tuple: (класс ошибки, пауза в секундах) или (None, None), если повторять не нужно
+                   или бюджет этого класса исчерпан.
+        """
+        error_class = RetryPolicy.classify(response, error)
+        if error_class == 'network' and not self.retry_network:
+            return None, None
+        if error_class is None or self.attempts[error_class] >= RetryPolicy.BUDGETS[error_class]:
+            return None, None
+
+        self.attempts[error_class] += 1
+
+        delay = self.next_delay()
+        retry_after = RetryPolicy.retry_after(response)
+        if retry_after is not None:
+            delay = min(retry_after, RetryPolicy.MAX_DELAY)
+
+        return error_class, delay
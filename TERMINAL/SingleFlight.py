@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+
+class _Call:
+    """ Запрос в полете: ждущие получают его результат или исключение """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Склейка одинаковых одновременных запросов.
+
+    Пока запрос с ключом key выполняется, тот же запрос из других потоков (или корутин)
+    не уходит в сеть, а ждет и получает тот же ответ. Так параллельные задачи, разбирающие
+    одни и те же папки (check_parents, completer вместе с командой), делают один HTTP вызов вместо десятков.
+    Ответы не кэшируются: запрос, начатый после завершения предыдущего, снова идет в сеть.
+    """
+    _calls = {}
+    _lock = threading.Lock()
+    # то же для корутин AsyncDrive: живет только в его цикле событий, блокировка не нужна
+    _futures = {}
+
+    @staticmethod
+    def do(key, func):
+        """
+        Выполняет func() один раз на все одновременные вызовы с ключом key.
+
+        Returns:
+            Результат func() (общий для всех ждущих).
+        """
+        with SingleFlight._lock:
+            call = SingleFlight._calls.get(key)
+            leader = call is None
+            if leader:
+                call = SingleFlight._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with SingleFlight._lock:
+                del SingleFlight._calls[key]
+            call.done.set()
+        return call.result
+
+    @staticmethod
+    async def do_async(key, func):
+        """ То же, что do, для корутин: func() возвращает корутину """
+        future = SingleFlight._futures.get(key)
+        if future is not None:
+            # shield: отмена одного ждущего не отменяет запрос для остальных
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(func())
+        SingleFlight._futures[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                del SingleFlight._futures[key]
+            else:
+                future.add_done_callback(lambda _: SingleFlight._futures.pop(key, None))
@@ -0,0 +1,254 @@
+import os
+import json
+import logging
+import time
+import threading
+import requests
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+from google.auth.exceptions import GoogleAuthError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from Concurrency import Concurrency
+from RateLimiter import RateLimiter
+from RetryPolicy import RetryPolicy
+from SingleFlight import SingleFlight
+
+
+class Transport:
+    """
+    Единый HTTP-транспорт для всех запросов к Google Drive API.
+
+    Все запросы идут через один requests.Session с пулом соединений:
+    TCP и TLS соединения переиспользуются (keep-alive), а не устанавливаются заново на каждый запрос.
+    Ответы запрашиваются в gzip, заголовок Authorization подставляется только здесь.
+    Размер пула можно задать через GOOGLE_CLOUD_POOL_SIZE.
+
+    Объект Credentials один на сессию. Токен обновляется в фоне по таймеру за REFRESH_MARGIN
+    секунд до истечения, а на ответ 401 - сразу, после чего запрос повторяется один раз.
+    Поэтому долгие загрузки и sync не обрываются, когда часовой токен истекает.
+
+    Перед отправкой запрос ждет токен RateLimiter, временные ошибки (429, лимиты, 5xx, обрывы связи)
+    повторяются по RetryPolicy (POST после обрыва связи - только если вызывающий разрешил retry_network:
+    запрос мог дойти до сервера, и повтор создал бы второй файл). У каждого запроса есть таймауты
+    на соединение и на ожидание данных (GOOGLE_CLOUD_CONNECT_TIMEOUT, GOOGLE_CLOUD_READ_TIMEOUT),
+    так что зависшее соединение обрывается и повторяется, а не держит команду. Задержка и исход каждого запроса передаются регулятору Concurrency.
+    Одинаковые одновременные GET (без stream) склеиваются через SingleFlight в один HTTP вызов.
+    """
+    # Адрес Drive API. GOOGLE_CLOUD_API_URL подменяет его, например, на локальный LocalDrive
+    # или на прокси; все адреса запросов строятся от BASE_URL
+    DEFAULT_BASE_URL = 'https://www.googleapis.com'
+    BASE_URL = os.getenv("GOOGLE_CLOUD_API_URL", DEFAULT_BASE_URL).rstrip('/')
+    # GOOGLE_CLOUD_OFFLINE=1 - работа с LocalDrive без авторизации Google: вместо token.json
+    # используются учетные данные-заглушка (LocalDrive токен не проверяет, обновлять его не нужно)
+    OFFLINE = os.getenv("GOOGLE_CLOUD_OFFLINE") == '1'
+    OFFLINE_CREDS = {
+        'token': 'offline',
+        'refresh_token': 'offline',
+        'client_id': 'offline',
+        'client_secret': 'offline',
+    }
+    POOL_SIZE = int(os.getenv("GOOGLE_CLOUD_POOL_SIZE", "16"))
+    # секунды на установку соединения и на ожидание очередной порции данных (не на весь запрос)
+    CONNECT_TIMEOUT = float(os.getenv("GOOGLE_CLOUD_CONNECT_TIMEOUT", "10"))
+    READ_TIMEOUT = float(os.getenv("GOOGLE_CLOUD_READ_TIMEOUT", "60"))
+    REFRESH_MARGIN = 300
+
+    _session = None
+    _lock = threading.Lock()
+
+    _creds = None
+    # GOOGLE_CLOUD_CREDS, из которого построен _creds: если его заменили (новая авторизация), строим заново
+    _creds_source = None
+    _creds_lock = threading.RLock()
+    _refresh_timer = None
+
+    @staticmethod
+    def session():
+        """ Общий requests.Session, создается при первом запросе """
+        with Transport._lock:
+            if Transport._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Transport.POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                # Google отдает сжатые ответы, только если и в User-Agent есть gzip
+                session.headers.update({
+                    'Accept-Encoding': 'gzip',
+                    'User-Agent': 'GoogleCloudTerminal (gzip)',
+                    'Connection': 'keep-alive',
+                })
+                Transport._session = session
+            return Transport._session
+
+    @staticmethod
+    def creds():
+        """ Общий объект Credentials, восстанавливается из GOOGLE_CLOUD_CREDS один раз """
+        with Transport._creds_lock:
+            source = os.getenv("GOOGLE_CLOUD_CREDS")
+            if Transport._creds is None or source != Transport._creds_source:
+                Transport._creds = Credentials.from_authorized_user_info(json.loads(source))
+                Transport._creds_source = source
+                Transport._schedule_refresh()
+            return Transport._creds
+
+    @staticmethod
+    def refresh():
+        """
+        Обновляет токен и сохраняет новые учетные данные в GOOGLE_CLOUD_CREDS.
+
+        Returns:
+            Credentials: Обновленный объект.
+        """
+        with Transport._creds_lock:
+            creds = Transport.creds()
+            creds.refresh(Request())
+            Transport._creds_source = creds.to_json()
+            os.environ["GOOGLE_CLOUD_CREDS"] = Transport._creds_source
+            Transport._schedule_refresh()
+            return creds
+
+    @staticmethod
+    def refresh_expired(token):
+        """ Обновляет токен после 401, если параллельный запрос еще не обновил его """
+        with Transport._creds_lock:
+            if Transport.creds().token == token:
+                Transport.refresh()
+
+    @staticmethod
+    def can_refresh():
+        """ Можно ли обновить токен. В режиме OFFLINE нельзя: refresh_token заглушки Google не примет """
+        return not Transport.OFFLINE and bool(Transport.creds().refresh_token)
+
+    @staticmethod
+    def _schedule_refresh():
+        """ Заводит таймер на обновление токена за REFRESH_MARGIN секунд до истечения """
+        if Transport._refresh_timer is not None:
+            Transport._refresh_timer.cancel()
+            Transport._refresh_timer = None
+
+        creds = Transport._creds
+        if Transport.OFFLINE or creds.expiry is None or not creds.refresh_token:
+            return
+
+        # google-auth хранит expiry как наивное время в UTC
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        delay = (creds.expiry - now).total_seconds() - Transport.REFRESH_MARGIN
+
+        timer = threading.Timer(max(delay, 0), Transport._background_refresh)
+        timer.daemon = True
+        timer.start()
+        Transport._refresh_timer = timer
+
+    @staticmethod
+    def _background_refresh():
+        try:
+            Transport.refresh()
+        except Exception as e:
+            # не мешаем вводу в терминале: пишем только в лог (если он настроен),
+            # токен обновится по первому 401
+            logger = logging.getLogger('error_logger')
+            if logger.handlers:
+                logger.error(f"Background token refresh failed: {e}")
+
+    @staticmethod
+    def request(method, url, headers=None, cost=1, retry_network=None, **kwargs):
+        """
+        Выполняет авторизованный запрос через общий пул соединений.
+
+        Args:
+            method (str): HTTP метод.
+            url (str): Адрес запроса.
+            headers (dict, optional): Дополнительные заголовки, Authorization добавляется автоматически.
+            cost (int, optional): Сколько запросов к квоте Drive стоит вызов (для пакетного - число частей).
+            retry_network (bool, optional): Повторять ли запрос после обрыва связи или таймаута.
+                                            По умолчанию да для всех методов, кроме POST.
+            **kwargs: Остальные аргументы requests (params, json, data, stream, timeout ...).
+
+        Returns:
+            requests.Response: Ответ сервера (для склеенных GET - общий для всех ждущих).
+        """
+        if retry_network is None:
+            retry_network = method != 'POST'
+        if method == 'GET' and not kwargs.get('stream'):
+            key = Transport.flight_key(method, url, headers, kwargs.get('params'))
+            return SingleFlight.do(key, lambda: Transport._request(method, url, headers, cost, retry_network, **kwargs))
+        return Transport._request(method, url, headers, cost, retry_network, **kwargs)
+
+    @staticmethod
+    def flight_key(method, url, headers, params):
+        """ Ключ SingleFlight: запросы с одинаковым ключом взаимозаменяемы """
+        return (method, url,
+                json.dumps(headers or {}, sort_keys=True),
+                json.dumps(params or {}, sort_keys=True, default=str))
+
+    @staticmethod
+    def _request(method, url, headers, cost, retry_network, **kwargs):
+        """ Сам запрос с ожиданием RateLimiter, обновлением токена и повторами (см. request) """
+        headers = dict(headers) if headers else {}
+        policy = RetryPolicy(retry_network)
+        kwargs.setdefault('timeout', (Transport.CONNECT_TIMEOUT, Transport.READ_TIMEOUT))
+        refreshed = False
+
+        while True:
+            RateLimiter.acquire(cost)
+
+            # тело-файл (FileSlice) после неудачной попытки прочитано частично: отправляем его с начала
+            if hasattr(kwargs.get('data'), 'seek'):
+                kwargs['data'].seek(0)
+
+            token = Transport.creds().token
+            headers['Authorization'] = f'Bearer {token}'
+
+            started = time.monotonic()
+            try:
+                response = Transport.session().request(method, url, headers=headers, **kwargs)
+            except requests.exceptions.RequestException as e:
+                Concurrency.observe(time.monotonic() - started, 'network')
+                error_class, delay = policy.should_retry(error=e)
+                if error_class is None:
+                    raise
+                time.sleep(delay)
+                continue
+
+            if response.status_code == 401 and not refreshed and Transport.can_refresh():
+                # токен истек раньше таймера (сон ноутбука, сбитые часы): обновляем и повторяем один раз.
+                # Не удалось (токен отозван, нет сети до Google) - отдаем сам 401
+                refreshed = True
+                try:
+                    Transport.refresh_expired(token)
+                except GoogleAuthError:
+                    return response
+                response.close()
+                continue
+
+            Concurrency.observe(time.monotonic() - started, RetryPolicy.classify(response=response))
+
+            error_class, delay = policy.should_retry(response=response)
+            if error_class is None:
+                return response
+
+            if error_class == 'rate_limit':
+                RateLimiter.penalize(delay)
+            response.close()
+            time.sleep(delay)
+
+    @staticmethod
+    def get(url, **kwargs):
+        return Transport.request('GET', url, **kwargs)
+
+    @staticmethod
+    def post(url, **kwargs):
+        return Transport.request('POST', url, **kwargs)
+
+    @staticmethod
+    def patch(url, **kwargs):
+        return Transport.request('PATCH', url, **kwargs)
+
+    @staticmethod
+    def put(url, **kwargs):
+        return Transport.request('PUT', url, **kwargs)
+
+    @staticmethod
+    def delete(url, **kwargs):
+        return Transport.request('DELETE', url, **kwargs)
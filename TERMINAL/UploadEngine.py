@@ -0,0 +1,415 @@
+import os
+import re
+import json
+import uuid
+import time
+import requests
+from ChunkSizer import ChunkSizer
+from FileManagerProxy import FileManagerProxy
+from FileSlice import FileSlice
+from MetadataIndex import MetadataIndex
+from Transport import Transport
+from UploadJournal import UploadJournal
+from UserInterface import UserInterface
+from WorkerPool import WorkerPool, Progress
+
+
+class UploadEngine:
+    """
+    Загрузка файлов на диск: протоколы загрузки и параллельная загрузка многих файлов.
+
+    Способ загрузки выбирается по размеру файла (strategy):
+        simple - пустой файл: хватает одного запроса с метаданными;
+        multipart - до MULTIPART_LIMIT: метаданные и содержимое одним запросом multipart/related;
+        resumable - крупнее: по кускам, с журналом (UploadJournal) и подстройкой куска (ChunkSizer).
+    upload_files получает уже найденные id папок назначения, поэтому на каждый файл не тратится
+    ни разбор пути, ни анимация загрузки: файлы идут через WorkerPool с общей строкой прогресса,
+    а в конце выводится итог в файлах/с и МБ/с. upload_tree переносит локальную папку целиком.
+    """
+    MULTIPART_LIMIT = 5 * 1024 * 1024
+    # сколько раз подряд resumable-загрузка сверяется с сервером после неотправленного куска, прежде чем сдаться
+    UPLOAD_RECOVERIES = 5
+    FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+    URL = f'{Transport.BASE_URL}/drive/v3/files'
+    UPLOAD_URL = f'{Transport.BASE_URL}/upload/drive/v3/files'
+
+    @staticmethod
+    def strategy(size):
+        """
+        Способ загрузки файла размера size.
+
+        Returns:
+            str: 'simple', 'multipart' или 'resumable'.
+        """
+        if size == 0:
+            return 'simple'
+        if size <= UploadEngine.MULTIPART_LIMIT:
+            return 'multipart'
+        return 'resumable'
+
+    @staticmethod
+    def create(parents_id, name, mimeType=None):
+        """
+        Создает файл без содержимого (или папку) одним запросом.
+
+        Returns:
+            dict: Метаданные созданного файла или None.
+        """
+        metadata = {'name': name, 'parents': [parents_id]}
+        if mimeType:
+            metadata['mimeType'] = mimeType
+
+        response = Transport.post(UploadEngine.URL, json=metadata, params={'fields': MetadataIndex.FIELDS})
+        if response.status_code != 200:
+            UserInterface.show_error(f"Failed to create {name}. Status code: {response.status_code}: {response.text}")
+            return None
+
+        MetadataIndex.put(response.json())
+        return response.json()
+
+    @staticmethod
+    def simple(parents_id, local_path, name, mimeType=None):
+        """
+        Создает метаданные файла и, если файл не пустой, записывает содержимое отдельным запросом (uploadType=media).
+
+        Returns:
+            dict: Метаданные загруженного файла или None.
+        """
+        file = UploadEngine.create(parents_id, name, mimeType)
+        if file is None or os.path.getsize(local_path) == 0:
+            return file
+
+        # Файл не читается в память целиком: FileSlice отдает его с диска по мере отправки
+        with FileSlice(local_path) as body:
+            response = Transport.patch(f"{UploadEngine.UPLOAD_URL}/{file['id']}",
+                                       headers={'Content-Type': mimeType or 'application/octet-stream'}, data=body,
+                                       params={'uploadType': 'media', 'fields': MetadataIndex.FIELDS})
+
+        if response.status_code != 200:
+            UserInterface.show_error(f"Failed to upload {local_path}. Status code: {response.status_code}: {response.text}")
+            return None
+
+        MetadataIndex.put(response.json())
+        return response.json()
+
+    @staticmethod
+    def multipart(parents_id, local_path, name, mimeType=None):
+        """
+        Загружает метаданные и содержимое одним запросом (uploadType=multipart).
+        Тело multipart/related: часть JSON с метаданными и часть с содержимым файла,
+        которое FileSlice читает с диска по мере отправки.
+
+        Returns:
+            dict: Метаданные загруженного файла или None.
+        """
+        metadata = {'name': name, 'parents': [parents_id]}
+        if mimeType:
+            metadata['mimeType'] = mimeType
+
+        boundary = uuid.uuid4().hex
+        prefix = (f'--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n'
+                  f'{json.dumps(metadata)}\r\n'
+                  f'--{boundary}\r\nContent-Type: {mimeType or "application/octet-stream"}\r\n\r\n').encode()
+        suffix = f'\r\n--{boundary}--\r\n'.encode()
+
+        with FileSlice(local_path, prefix=prefix, suffix=suffix) as body:
+            response = Transport.post(UploadEngine.UPLOAD_URL,
+                                      headers={'Content-Type': f'multipart/related; boundary={boundary}'}, data=body,
+                                      params={'uploadType': 'multipart', 'fields': MetadataIndex.FIELDS})
+
+        if response.status_code != 200:
+            UserInterface.show_error(f"Failed to upload {local_path}. Status code: {response.status_code}: {response.text}")
+            return None
+
+        MetadataIndex.put(response.json())
+        return response.json()
+
+    @staticmethod
+    def upload_file(parents_id, local_path, name=None, mimeType=None):
+        """
+        Загружает один файл в папку parents_id способом, подходящим по размеру, без своих сообщений.
+
+        Returns:
+            dict: Метаданные загруженного файла или None.
+        """
+        name = name or os.path.basename(local_path)
+        strategy = UploadEngine.strategy(os.path.getsize(local_path))
+        if strategy == 'simple':
+            return UploadEngine.simple(parents_id, local_path, name, mimeType)
+        if strategy == 'multipart':
+            return UploadEngine.multipart(parents_id, local_path, name, mimeType)
+        return UploadEngine.resumable(parents_id, UploadJournal.identity(local_path), name, mimeType, quiet=True)
+
+    @staticmethod
+    def upload_files(files, label='upload'):
+        """
+        Загружает много файлов параллельно (WorkerPool) с общей строкой прогресса.
+
+        Args:
+            files (list): Кортежи (local_path, parents_id, name, mimeType), name и mimeType могут быть None.
+            label (str, optional): Подпись строки прогресса.
+
+        Returns:
+            list: Метаданные загруженных файлов в порядке files, None для незагруженных.
+        """
+        sizes = [os.path.getsize(local_path) for local_path, _, _, _ in files]
+        progress = Progress(label, len(files), total_bytes=sum(sizes))
+
+        def upload_one(index):
+            local_path, parents_id, name, mimeType = files[index]
+            try:
+                result = UploadEngine.upload_file(parents_id, local_path, name, mimeType)
+            except (OSError, requests.exceptions.RequestException) as e:
+                UserInterface.show_error(f"Failed to upload {local_path}: {e}")
+                result = None
+            progress.advance(1, sizes[index] if result else 0)
+            return result
+
+        # крупные файлы первыми: иначе в конце пул ждал бы одну большую загрузку
+        order = sorted(range(len(files)), key=lambda index: -sizes[index])
+        try:
+            uploaded = WorkerPool.map(upload_one, order)
+        finally:
+            progress.close()
+
+        results = [None] * len(files)
+        for index, result in zip(order, uploaded):
+            results[index] = result
+
+        failed = results.count(None)
+        UserInterface.show_success(f"Uploaded {len(files) - failed} of {len(files)} files: {progress.summary()}")
+        if failed:
+            UserInterface.show_error(f"{failed} files were not uploaded")
+        return results
+
+    @staticmethod
+    def folder(parents_id, name):
+        """
+        Папка name внутри parents_id: существующая или новая.
+
+        Returns:
+            str: Идентификатор папки или None.
+        """
+        if parents_id is None:
+            return None
+        existing = FileManagerProxy.look_for_child(parents_id, name, UploadEngine.FOLDER_MIME_TYPE)
+        if existing:
+            return existing[0]
+        created = UploadEngine.create(parents_id, name, UploadEngine.FOLDER_MIME_TYPE)
+        return created['id'] if created else None
+
+    @staticmethod
+    def upload_tree(local_path, folder_id):
+        """
+        Загружает содержимое локальной папки local_path в папку folder_id.
+        Папки находятся или создаются по уровням (уровень целиком параллельно),
+        затем все файлы загружаются одним upload_files.
+
+        Returns:
+            list: Результат upload_files.
+        """
+        folders = {'.': folder_id}
+        levels = {}
+        files = []
+        for directory, dirs, names in os.walk(local_path):
+            relative = os.path.relpath(directory, local_path)
+            depth = 0 if relative == '.' else relative.count(os.sep) + 1
+            for item in dirs:
+                levels.setdefault(depth, []).append((relative, item))
+            for item in names:
+                files.append((os.path.join(directory, item), relative, item))
+
+        for depth in sorted(levels):
+            level = levels[depth]
+            ids = WorkerPool.map(lambda item: UploadEngine.folder(folders.get(item[0]), item[1]), level)
+            for (relative, item), created in zip(level, ids):
+                folders[os.path.normpath(os.path.join(relative, item))] = created
+
+        uploads = [(path, folders[relative], name, None) for path, relative, name in files if folders.get(relative)]
+        if len(uploads) < len(files):
+            UserInterface.show_error(f"{len(files) - len(uploads)} files skipped: their folders could not be created")
+        return UploadEngine.upload_files(uploads)
+
+    @staticmethod
+    def resumable(parents_id, identity, name, mimeType=None, stop_loading=None, quiet=False):
+        """
+        Resumable-загрузка файла identity['local_path'] в parents_id.
+
+        Если в журнале есть сессия этого файла, сервер спрашивают, сколько байт он уже принял,
+        и продолжают с этого места. Смещение после каждого куска тоже берется из ответа сервера (Range),
+        а не из размера отправленного: Drive может сохранить меньше. Если кусок не ушел даже после
+        повторов Transport, загрузка сверяется с сервером и продолжается; после UPLOAD_RECOVERIES таких
+        сбоев подряд без продвижения команда завершается, а сессия остается в журнале для upload --resume.
+
+        Args:
+            parents_id (str): Папка назначения.
+            identity (dict): Отпечаток файла (UploadJournal.identity).
+            name (str): Имя файла на диске.
+            mimeType (str, optional): MIME-тип.
+            stop_loading (callable, optional): Остановить анимацию загрузки, когда начнется передача.
+            quiet (bool, optional): Без своей полосы прогресса и сообщений об успехе (для upload_files).
+
+        Returns:
+            dict: Метаданные загруженного файла или None.
+        """
+        stop_loading = stop_loading or (lambda: None)
+        local_path = identity['local_path']
+        file_size = identity['size']
+
+        entry = UploadJournal.find(identity, parents_id, name)
+        offset = 0
+        # время запроса без тела (старт сессии или ее состояние) - оценка RTT для ChunkSizer
+        started = time.monotonic()
+        if entry:
+            status = UploadEngine._upload_status(entry['session'], file_size)
+            if status is not None and status.status_code == 308:
+                offset = UploadEngine._confirmed_offset(status)
+                UploadJournal.update(entry, offset)
+                if not quiet:
+                    UserInterface.show_message(f"Resuming upload of {local_path} from byte {offset} of {file_size}")
+            elif status is not None and status.status_code in (200, 201):
+                offset = file_size
+            else:
+                # сессия истекла (Drive хранит их около недели) или неизвестна: начинаем заново
+                UploadJournal.remove(entry)
+                entry = None
+
+        if entry is None:
+            # Создаем метаданные файла
+            metadata = {
+                'name': name,
+                'parents': [parents_id],
+            }
+            if mimeType:
+                metadata['mimeType'] = mimeType
+
+            headers = {
+                'Content-Type': 'application/json; charset=UTF-8',
+                'X-Upload-Content-Type': mimeType if mimeType else 'application/octet-stream',
+                'X-Upload-Content-Length': str(file_size),
+            }
+
+            url_resumable_upload = f'{UploadEngine.UPLOAD_URL}?uploadType=resumable'
+
+            #  Действуем строго согласно документации: https://developers.google.com/drive/api/guides/manage-uploads
+            # Отправляем первоначальный запрос и получаем URI возобновляемого сеанса.
+            started = time.monotonic()
+            # повтор старта после обрыва безопасен: незавершенная сессия файла не создает
+            start_response = Transport.post(url_resumable_upload, headers=headers, json=metadata,
+                                           params={'fields': MetadataIndex.FIELDS}, retry_network=True)
+            if start_response.status_code != 200:
+                UserInterface.show_error(f'Failed to start resumable upload. Status code: {start_response.status_code}: {start_response.text}')
+                stop_loading()
+                return None
+
+            # Если все ок, извлекаем Location из заголовков
+            location = start_response.headers.get('Location')
+
+            if not location:
+                UserInterface.show_error(
+                    f'No Location header in response. Status code: {start_response.status_code}: {start_response.text}')
+                stop_loading()
+                return None
+
+            entry = UploadJournal.start(identity, parents_id, name, mimeType, location)
+
+        # Загрузаем данные и отслеживаем состояние загрузки.
+        # Размер куска подбирается по измеренной скорости каждого куска (ChunkSizer)
+        sizer = ChunkSizer(file_size, time.monotonic() - started)
+        if quiet:
+            uploading_update, stop_uploading = (lambda percent: None), (lambda: None)
+        else:
+            uploading_update, stop_uploading = UserInterface.show_upload_process_message()
+        stop_loading()
+
+        failures = 0
+        while True:
+            length = min(sizer.size, file_size - offset)
+            sent_at = time.monotonic()
+            if length > 0:
+                # кусок не читается в память: FileSlice отдает его с диска блоками по мере отправки,
+                # так что память не зависит ни от размера файла, ни от размера куска.
+                # Следующий кусок тем временем читается с диска в page cache (prefetch)
+                with FileSlice(local_path, offset, length) as chunk:
+                    chunk.prefetch(min(sizer.size, file_size - offset - length))
+                    headers = {'Content-Range': f'bytes {offset}-{offset + length - 1}/{file_size}'}
+                    try:
+                        upload_response = Transport.put(entry['session'], headers=headers, data=chunk)
+                    except requests.exceptions.RequestException:
+                        upload_response = None
+            else:
+                # все байты отправлены (или файл пустой): запрос состояния завершает загрузку
+                upload_response = UploadEngine._upload_status(entry['session'], file_size)
+
+            if upload_response is not None and upload_response.status_code in (200, 201):
+                break
+
+            confirmed = UploadEngine._confirmed_offset(upload_response) \
+                if upload_response is not None and upload_response.status_code == 308 else None
+            if confirmed is None or confirmed <= offset:
+                # кусок не принят или 308 не сдвинул Range (заголовка нет или он прежний) - это тоже сбой,
+                # иначе тот же кусок (или запрос состояния в конце файла) повторялся бы без конца
+                failures += 1
+                sizer.failed()
+                if failures > UploadEngine.UPLOAD_RECOVERIES:
+                    stop_uploading()
+                    if upload_response is None:
+                        details = 'network error'
+                    elif confirmed is not None:
+                        details = f'server confirmed {confirmed} bytes again'
+                    else:
+                        details = f'{upload_response.status_code}: {upload_response.text}'
+                    UserInterface.show_error(
+                        f'Failed to upload chunk ({details}). {offset} of {file_size} bytes are saved, '
+                        f'continue with: upload --resume {local_path}')
+                    return None
+                if confirmed is None:
+                    # спрашиваем сервер, сколько у него есть
+                    upload_response = UploadEngine._upload_status(entry['session'], file_size)
+                    if upload_response is not None and upload_response.status_code in (200, 201):
+                        break
+                    if upload_response is None or upload_response.status_code != 308:
+                        if upload_response is not None and upload_response.status_code in (404, 410):
+                            stop_uploading()
+                            UploadJournal.remove(entry)
+                            UserInterface.show_error('Upload session has expired, start the upload again.')
+                            return None
+                        continue
+                    confirmed = UploadEngine._confirmed_offset(upload_response)
+            elif failures == 0:
+                sizer.record(confirmed - offset, time.monotonic() - sent_at)
+
+            if confirmed > offset:
+                failures = 0
+            offset = confirmed
+            UploadJournal.update(entry, offset)
+            uploading_update((offset / file_size) * 100 if file_size else 100)
+
+        stop_uploading()
+        UploadJournal.remove(entry)
+        sizer.save()
+        MetadataIndex.put(upload_response.json())
+        if not quiet:
+            UserInterface.show_success("Resumable uploading file complete!")
+        return upload_response.json()
+
+    @staticmethod
+    def _upload_status(session, file_size):
+        """
+        Состояние resumable-сессии: PUT без тела с Content-Range: bytes */size.
+
+        Returns:
+            Ответ (308 с Range - сколько принято, 200/201 - загрузка завершена, 404/410 - сессии нет)
+            или None, если сервер недоступен.
+        """
+        try:
+            return Transport.put(session, headers={'Content-Range': f'bytes */{file_size}'}, data=b'')
+        except requests.exceptions.RequestException:
+            return None
+
+    @staticmethod
+    def _confirmed_offset(response):
+        """ Сколько байт сервер подтвердил в ответе 308 (заголовок Range: bytes=0-N) """
+        match = re.match(r'bytes=0-(\d+)', response.headers.get('Range', ''))
+        return int(match.group(1)) + 1 if match else 0
+
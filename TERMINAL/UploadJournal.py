@@ -0,0 +1,164 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+class UploadJournal:
+    """
+    Журнал незавершенных resumable-загрузок на диске (SQLite).
+
+    Для каждой загрузки хранится URI сессии, куда и под каким именем загружается файл,
+    отпечаток локального файла (путь, размер, mtime, sha256 первых HEAD_SIZE байт)
+    и последнее смещение, подтвержденное сервером. Запись обновляется после каждого принятого куска
+    и удаляется, когда загрузка завершена, поэтому после падения процесса или обрыва VPN
+    загрузку можно продолжить с подтвержденного места (upload --resume), а не с нуля.
+    Если файл с тех пор изменился (отпечаток не совпал), сессия не используется.
+
+    Там же хранится лучший размер куска для каждой сети (см. ChunkSizer).
+    """
+    HEAD_SIZE = 1024 * 1024
+
+    _connection = None
+    _lock = threading.RLock()
+
+    @staticmethod
+    def path():
+        """ Путь к журналу, можно переопределить через GOOGLE_CLOUD_UPLOAD_JOURNAL """
+        return os.getenv("GOOGLE_CLOUD_UPLOAD_JOURNAL") or os.path.join(
+            os.path.expanduser("~"), ".google_cloud_uploads.sqlite")
+
+    @staticmethod
+    def _connect():
+        with UploadJournal._lock:
+            if UploadJournal._connection is None:
+                connection = sqlite3.connect(UploadJournal.path(), check_same_thread=False)
+                # synchronous = FULL: подтвержденное смещение переживает и падение системы
+                connection.executescript("""
+                    PRAGMA journal_mode = WAL;
+                    PRAGMA synchronous = FULL;
+                    CREATE TABLE IF NOT EXISTS uploads (
+                        local_path TEXT NOT NULL,
+                        parent_id TEXT NOT NULL,
+                        name TEXT NOT NULL,
+                        mimeType TEXT,
+                        session TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        mtime INTEGER NOT NULL,
+                        head TEXT NOT NULL,
+                        offset INTEGER NOT NULL DEFAULT 0,
+                        started REAL NOT NULL,
+                        PRIMARY KEY (local_path, parent_id, name)
+                    );
+                    CREATE TABLE IF NOT EXISTS chunk_sizes (
+                        network TEXT PRIMARY KEY,
+                        size INTEGER NOT NULL,
+                        throughput REAL,
+                        updated REAL NOT NULL
+                    );
+                """)
+                UploadJournal._connection = connection
+            return UploadJournal._connection
+
+    @staticmethod
+    def identity(local_path):
+        """
+        Отпечаток локального файла.
+
+        Returns:
+            dict: local_path (абсолютный), size, mtime (нс), head (sha256 первых HEAD_SIZE байт).
+        """
+        local_path = os.path.abspath(local_path)
+        stat = os.stat(local_path)
+        with open(local_path, 'rb') as f:
+            head = hashlib.sha256(f.read(UploadJournal.HEAD_SIZE)).hexdigest()
+        return {'local_path': local_path, 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'head': head}
+
+    @staticmethod
+    def find(identity, parent_id, name):
+        """
+        Незавершенная загрузка этого файла в parent_id под именем name.
+
+        Returns:
+            dict: Запись журнала или None. Запись для изменившегося файла удаляется и не возвращается.
+        """
+        with UploadJournal._lock:
+            cursor = UploadJournal._connect().execute(
+                "SELECT * FROM uploads WHERE local_path = ? AND parent_id = ? AND name = ?",
+                (identity['local_path'], parent_id, name))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            entry = dict(zip([column[0] for column in cursor.description], row))
+            if any(entry[key] != identity[key] for key in ('size', 'mtime', 'head')):
+                UploadJournal.remove(entry)
+                return None
+            return entry
+
+    @staticmethod
+    def start(identity, parent_id, name, mimeType, session):
+        """ Записывает новую сессию (заменяя прежнюю для того же файла и места) """
+        entry = dict(identity, parent_id=parent_id, name=name, mimeType=mimeType, session=session,
+                     offset=0, started=time.time())
+        with UploadJournal._lock:
+            connection = UploadJournal._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO uploads (local_path, parent_id, name, mimeType, session, size, mtime, head, "
+                "offset, started) VALUES (:local_path, :parent_id, :name, :mimeType, :session, :size, :mtime, :head, "
+                ":offset, :started)", entry)
+            connection.commit()
+        return entry
+
+    @staticmethod
+    def update(entry, offset):
+        """ Запоминает смещение, подтвержденное сервером """
+        entry['offset'] = offset
+        with UploadJournal._lock:
+            connection = UploadJournal._connect()
+            connection.execute("UPDATE uploads SET offset = ? WHERE local_path = ? AND parent_id = ? AND name = ?",
+                               (offset, entry['local_path'], entry['parent_id'], entry['name']))
+            connection.commit()
+
+    @staticmethod
+    def remove(entry):
+        """ Удаляет запись: загрузка завершена или сессия больше недействительна """
+        with UploadJournal._lock:
+            connection = UploadJournal._connect()
+            connection.execute("DELETE FROM uploads WHERE local_path = ? AND parent_id = ? AND name = ?",
+                               (entry['local_path'], entry['parent_id'], entry['name']))
+            connection.commit()
+
+    @staticmethod
+    def pending(local_path=None):
+        """
+        Все незавершенные загрузки (или только файла local_path), старые первыми.
+
+        Returns:
+            list: Записи журнала.
+        """
+        query = "SELECT * FROM uploads"
+        params = ()
+        if local_path:
+            query += " WHERE local_path = ?"
+            params = (os.path.abspath(local_path),)
+        with UploadJournal._lock:
+            cursor = UploadJournal._connect().execute(query + " ORDER BY started", params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def chunk_size(network):
+        """ Запомненный размер куска для сети network или None """
+        with UploadJournal._lock:
+            row = UploadJournal._connect().execute(
+                "SELECT size FROM chunk_sizes WHERE network = ?", (network,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def remember_chunk_size(network, size, throughput):
+        with UploadJournal._lock:
+            connection = UploadJournal._connect()
+            connection.execute("INSERT OR REPLACE INTO chunk_sizes (network, size, throughput, updated) VALUES (?, ?, ?, ?)",
+                               (network, size, throughput, time.time()))
+            connection.commit()
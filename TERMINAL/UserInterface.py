@@ -111,6 +111,35 @@ class UserInterface:
 
         return animation_process, stop
 
+    @staticmethod
+    def show_progress_message(render):
+        """
+        Строка прогресса, перерисовывается раз в полсекунды.
+
+        Args:
+            render (callable): Возвращает текст строки.
+
+        Returns:
+            callable: Остановка вывода (строка стирается).
+        """
+        stop_progress = threading.Event()
+
+        def progress():
+            while not stop_progress.wait(0.5):
+                sys.stdout.write(f"\r\033[K{render()}")
+                sys.stdout.flush()
+            sys.stdout.write("\r\033[K")
+            sys.stdout.flush()
+
+        t = threading.Thread(target=progress, daemon=True)
+        t.start()
+
+        def stop():
+            stop_progress.set()
+            t.join()
+
+        return stop
+
     @staticmethod
     def stop_uploading_animation():
         """ Для экстренной остановки анимации """
@@ -139,7 +168,7 @@ class UserInterface:
         if isinstance(message, list):
             formatted_message = UserInterface.format_message(message)
         else:
-            formatted_message = "\r" + message
+            formatted_message = "\r\033[K" + message
         sys.stdout.write(formatted_message + end)
 
     @staticmethod
@@ -147,7 +176,7 @@ class UserInterface:
         if isinstance(error_message, list):
             formatted_message = UserInterface.format_message(error_message)
         else:
-            formatted_message = "\r" + error_message
+            formatted_message = "\r\033[K" + error_message
         sys.stdout.write("\r" + UserInterface.COLORS['red'] + formatted_message + UserInterface.COLORS['reset'] + '\n')
 
     @staticmethod
@@ -155,7 +184,7 @@ class UserInterface:
         if isinstance(success_message, list):
             formatted_message = UserInterface.format_message(success_message)
         else:
-            formatted_message = "\r" + success_message
+            formatted_message = "\r\033[K" + success_message
         sys.stdout.write(UserInterface.COLORS['green'] + formatted_message + UserInterface.COLORS['reset'] + '\n')
 
 
@@ -0,0 +1,122 @@
+import time
+import threading
+from Concurrency import Concurrency
+from UserInterface import UserInterface
+
+
+class Progress:
+    """
+    Строка прогресса массовой операции: сделано из скольких, текущая параллельность и пропускная способность.
+    Одна на команду, даже если команда запускает WorkerPool несколько раз (по уровням дерева).
+    Если задан total_bytes, показываются и переданные мегабайты со скоростью в МБ/с.
+    """
+    def __init__(self, label, total, unit='files', parallel=None, total_bytes=None):
+        self.label = label
+        self.total = total
+        self.unit = unit
+        self.total_bytes = total_bytes
+        # сколько задач идет одновременно: по умолчанию limit регулятора, для AsyncDrive - запросы в сети
+        self.parallel = parallel or Concurrency.limit
+        self.done = 0
+        self.done_bytes = 0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.stop = UserInterface.show_progress_message(self.render)
+
+    def advance(self, count=1, size=0):
+        with self.lock:
+            self.done += count
+            self.done_bytes += size
+
+    def render(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        line = (f"{self.label}: {self.done}/{self.total} {self.unit} | "
+                f"{self.parallel()} parallel | {self.done / elapsed:.1f} {self.unit}/s")
+        if self.total_bytes is not None:
+            line += (f" | {self.done_bytes / 1024 ** 2:.1f}/{self.total_bytes / 1024 ** 2:.1f} MB, "
+                     f"{self.done_bytes / 1024 ** 2 / elapsed:.1f} MB/s")
+        return line
+
+    def summary(self):
+        """ Итог для сообщения после close: сколько сделано, за какое время и с какой скоростью """
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        line = f"{self.done} {self.unit} in {elapsed:.1f} s ({self.done / elapsed:.1f} {self.unit}/s"
+        if self.total_bytes is not None:
+            line += f", {self.done_bytes / 1024 ** 2:.1f} MB at {self.done_bytes / 1024 ** 2 / elapsed:.1f} MB/s"
+        return line + ")"
+
+    def close(self):
+        self.stop()
+
+
+class WorkerPool:
+    """
+    Выполнение однотипных задач в нескольких потоках.
+    Сколько задач идет одновременно, решает общий регулятор Concurrency:
+    потоков заводится до Concurrency.MAX_LIMIT, но работают из них только занявшие слот.
+    """
+
+    @staticmethod
+    def map(func, items, progress=None, weight=None):
+        """
+        Применяет func к каждому элементу items.
+
+        Args:
+            func (callable): Задача, принимает один элемент.
+            items (iterable): Элементы.
+            progress (Progress, optional): Строка прогресса, которую двигать по мере выполнения.
+            weight (callable, optional): Сколько единиц прогресса дает элемент (по умолчанию 1).
+
+        Returns:
+            list: Результаты в порядке items. Если задача упала, первое исключение
+                  пробрасывается после завершения остальных.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        weight = weight or (lambda item: 1)
+
+        # одна задача или вызов из задачи другого пула: потоки не нужны
+        if len(items) <= 1 or Concurrency.in_slot():
+            for index, item in enumerate(items):
+                with Concurrency.slot():
+                    results[index] = func(item)
+                if progress:
+                    progress.advance(weight(item))
+            return results
+
+        indexes = iter(range(len(items)))
+        lock = threading.Lock()
+        errors = []
+        cancelled = threading.Event()
+
+        def worker():
+            while not cancelled.is_set():
+                with lock:
+                    index = next(indexes, None)
+                if index is None:
+                    return
+                with Concurrency.slot():
+                    try:
+                        results[index] = func(items[index])
+                    except Exception as e:
+                        errors.append(e)
+                if progress:
+                    progress.advance(weight(items[index]))
+
+        threads = [threading.Thread(target=worker, daemon=True)
+                   for _ in range(min(len(items), Concurrency.MAX_LIMIT))]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                # join с таймаутом, чтобы Ctrl+C доходил до главного потока
+                while thread.is_alive():
+                    thread.join(0.2)
+        except KeyboardInterrupt:
+            cancelled.set()
+            raise
+
+        if errors:
+            raise errors[0]
+        return results